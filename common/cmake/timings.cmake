@@ -31,6 +31,7 @@ function(UPDATE_ARCH_TIMINGS)
         ${PYTHON3} ${update_arch_timings}
           --sdf_dir ${SDF_TIMING_DIRECTORY}
           --bels_map ${BELS_MAP}
+          --cache_dir ${PRJXRAY_DB_CACHE_DIR}
           --input_arch ${input}
           --out_arch ${output}
     )
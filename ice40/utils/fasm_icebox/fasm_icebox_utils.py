@@ -59,15 +59,22 @@ def _bits_to_nibbles(arr):
     return "".join(res)
 
 
+def _tiles_to_array(tiles):
+    """Convert list of equally sized text icedb tiles to a 3D numpy array"""
+
+    chars = np.frombuffer(
+        "".join("".join(tile) for tile in tiles).encode(), dtype=np.uint8
+    )
+    return chars.reshape(len(tiles), len(tiles[0]), -1) == ord("1")
+
+
 def _tile_to_array(tile, is_hex=False):
     """Convert text icedb tile to a numpy array"""
 
     if is_hex:
         array = np.array([_nibbles_to_bits(line) for line in tile], dtype=bool)
     else:
-        array = np.array(
-            [[int(xx) for xx in line] for line in tile], dtype=bool
-        )
+        array = _tiles_to_array([tile])[0]
     return array
 
 
@@ -80,8 +87,10 @@ def _array_to_tile(tile_bits, tile, is_hex=False):
         for ii, xx in enumerate(tile_bits):
             tile[ii] = _bits_to_nibbles(xx)
     else:
-        for ii, xx in enumerate(tile_bits):
-            tile[ii] = tile_bits.shape[1] * "%d" % tuple(xx)
+        chars = (tile_bits.astype(np.uint8) + ord("0")).tobytes().decode()
+        width = tile_bits.shape[1]
+        for ii in range(tile_bits.shape[0]):
+            tile[ii] = chars[ii * width:(ii + 1) * width]
 
 
 def _lut_to_lc(lut, ctrl):
@@ -103,26 +112,17 @@ def _lc_to_lut(lc):
     return lut, ctrl
 
 
-def _get_feature_bits(tile, cond):
-    """Get bitmask and values for the tile from an icebox db entry"""
+def _set_bit_tuples(tile_bits, bit_tuples):
+    """Set bits of a tile array from Feature bit tuples"""
 
-    bm = np.zeros(tile.shape, dtype=bool)
-    bp = np.zeros(tile.shape, dtype=bool)
-    for ii in cond:
-        neg, x, y = ii
-        bm[x][y] = True
-        bp[x][y] = neg != "!"
-    return bm, bp
+    for neg, x, y in bit_tuples:
+        tile_bits[x, y] = neg != "!"
 
 
-def _set_feature_bits(ic, loc, bits):
-    """Set bits for a specifc location in an iceconfig"""
+def _set_feature_bits(device_bits, loc, bits):
+    """Set bits for a specifc location in a DeviceBits"""
 
-    tile = ic.tile(*loc)
-    tile_bits = _tile_to_array(tile)
-    bm, bv = _get_feature_bits(tile_bits, bits)
-    tile_bits[bm] = bv[bm]
-    _array_to_tile(tile_bits, tile)
+    _set_bit_tuples(device_bits.tile_bits(loc), bits)
 
 
 def _get_iceconfig_bits(tile, cond):
@@ -146,6 +146,131 @@ def _check_iceconfig_entry(tile, entry):
     return np.all(bp[bm] == tile[bm])
 
 
+class TileGroup(object):
+    """Tiles of an iceconfig sharing a tile type and tile db.
+
+    bits is a (tiles, rows, columns) array with the bits of the tiles in locs.
+    """
+
+    def __init__(self, tile_type, db, locs, bits):
+        self.tile_type = tile_type
+        self.db = db
+        self.locs = locs
+        self.bits = bits
+
+
+class DeviceBits(object):
+    """Bits of all tiles of an iceconfig, converted to numpy at once.
+
+    Tiles are grouped by tile type and tile db, so each group can be
+    matched against its tile db in one operation, see TileDbMatrix.
+    Modified tiles are only converted back to text by write_tiles.
+    """
+
+    def __init__(self, ic):
+        self.ic = ic
+
+        tiles = {}
+        for x in range(ic.max_x + 1):
+            for y in range(ic.max_y + 1):
+                tile = ic.tile(x, y)
+                if tile is None:
+                    continue
+
+                db = ic.tile_db(x, y)
+                key = (ic.tile_type(x, y), id(db))
+                if key not in tiles:
+                    tiles[key] = (db, [], [])
+
+                tiles[key][1].append((x, y))
+                tiles[key][2].append(tile)
+
+        self.groups = []
+        self.tile_index = {}
+        for (tile_type, _), (db, locs, group_tiles) in tiles.items():
+            group = TileGroup(
+                tile_type, db, locs, _tiles_to_array(group_tiles)
+            )
+            for idx, loc in enumerate(locs):
+                self.tile_index[loc] = (group, idx)
+            self.groups.append(group)
+
+        self.modified = set()
+
+    def tile_bits(self, loc):
+        """Returns writable view of the bits of the tile at loc"""
+
+        group, idx = self.tile_index[tuple(loc)]
+        self.modified.add(tuple(loc))
+        return group.bits[idx]
+
+    def write_tiles(self):
+        """Write modified tiles back to the iceconfig"""
+
+        for loc in sorted(self.modified):
+            group, idx = self.tile_index[loc]
+            _array_to_tile(group.bits[idx], self.ic.tile(*loc))
+
+        self.modified = set()
+
+
+class TileDbMatrix(object):
+    """Bits of every entry of an icebox tile db as matrices.
+
+    set_bits and clear_bits are (tile bits, entries) matrices of the bits
+    each entry requires to be set or cleared, so the entries matching many
+    tiles are found with two matrix products instead of one comparison per
+    tile and entry.
+    """
+
+    # Compiled tile dbs, by id of the tile db.
+    cache = {}
+
+    def __init__(self, db, shape):
+        num_bits = shape[0] * shape[1]
+        self.set_bits = np.zeros((num_bits, len(db)), dtype=np.float32)
+        self.clear_bits = np.zeros((num_bits, len(db)), dtype=np.float32)
+
+        # Flat index of the bits of each entry, in tile order.
+        self.bit_index = []
+
+        tile = np.zeros(shape, dtype=bool)
+        for idx, entry in enumerate(db):
+            bm, bp = _get_iceconfig_bits(tile, entry[0])
+            bm = bm.reshape(-1)
+            bp = bp.reshape(-1)
+            self.set_bits[bm & bp, idx] = 1
+            self.clear_bits[bm & ~bp, idx] = 1
+            self.bit_index.append(np.flatnonzero(bm))
+
+        self.num_entry_bits = self.set_bits.sum(axis=0) + self.clear_bits.sum(
+            axis=0
+        )
+
+    @classmethod
+    def get(cls, db, shape):
+        """Returns TileDbMatrix of tile db, compiled once per tile db"""
+
+        key = (id(db), tuple(shape))
+        cached = cls.cache.get(key)
+        if cached is None or cached[0] is not db:
+            # Keep db alive, so its id is not reused.
+            cached = (db, cls(db, shape))
+            cls.cache[key] = cached
+
+        return cached[1]
+
+    def match(self, tile_bits):
+        """Returns (tiles, entries) array of which entries are set in tiles
+
+        tile_bits is a (tiles, tile bits) bool array.
+        """
+
+        bits = tile_bits.astype(np.float32)
+        num_matching = bits @ self.set_bits + (1 - bits) @ self.clear_bits
+        return num_matching == self.num_entry_bits
+
+
 def _inv_bit_tuple(bit_tuple):
     if bit_tuple[0] == "":
         neg = "!"
@@ -288,6 +413,19 @@ def read_ice_db(ic):
     return accum
 
 
+# read_ice_db of empty iceconfigs, by device.
+_EMPTY_ICE_DBS = {}
+
+
+def _read_empty_ice_db(ic):
+    """read_ice_db of an empty iceconfig, read once per device"""
+
+    if ic.device not in _EMPTY_ICE_DBS:
+        _EMPTY_ICE_DBS[ic.device] = read_ice_db(ic)
+
+    return _EMPTY_ICE_DBS[ic.device]
+
+
 def _iceboxdb_to_fasmdb(ic, outf=StringIO()):
     """Read in an icebox config and output the exhaustive list of bits with fasm compatible names
 
@@ -331,21 +469,19 @@ def iceconfig_to_fasm(ic, outf=StringIO()):
 
     accum = FeatureAccumulator()
 
-    locs = [(x, y) for x in range(ic.max_x + 1) for y in range(ic.max_y + 1)]
-    for tile_loc in locs:
-        bits = ic.tile(*tile_loc)
-        if bits is None:
-            continue
-        tile_bits = _tile_to_array(bits)
-        tile_type = ic.tile_type(*tile_loc)
+    for group in DeviceBits(ic).groups:
+        tile_type = group.tile_type
+        tile_bits = group.bits.reshape(len(group.locs), -1)
+        matrix = TileDbMatrix.get(group.db, group.bits.shape[1:])
+        is_set = matrix.match(tile_bits)
 
-        for entry in ic.tile_db(*tile_loc):
+        for entry_idx, entry in enumerate(group.db):
             # LC_ entries are treated differently as it's not a match, but a pattern
             if entry[1].startswith("LC_"):
-                bm, _ = _get_iceconfig_bits(tile_bits, entry[0])
-                bits = tile_bits[bm]
-                if np.any(bits):
-                    lut, ctrl = _lc_to_lut(bits)
+                lc_bits = tile_bits[:, matrix.bit_index[entry_idx]]
+                for tile_idx in np.flatnonzero(np.any(lc_bits, axis=1)):
+                    tile_loc = group.locs[tile_idx]
+                    lut, ctrl = _lc_to_lut(lc_bits[tile_idx])
                     for ii, bit in enumerate(lut):
                         if bit:
                             names = entry[1:] + ["INIT"]
@@ -363,23 +499,25 @@ def iceconfig_to_fasm(ic, outf=StringIO()):
             elif (
                     tile_type == "IO" and device_1k and
                 (entry[-1].startswith("IE_") or entry[-1].startswith("REN_"))):
-                accum.append_ice_entry(
-                    tile_type,
-                    tile_loc,
-                    entry[0],
-                    entry[1:],
-                    None,
-                    negate=True
-                )
+                for tile_loc in group.locs:
+                    accum.append_ice_entry(
+                        tile_type,
+                        tile_loc,
+                        entry[0],
+                        entry[1:],
+                        None,
+                        negate=True
+                    )
             elif device_1k and tile_type == "RAMB" and entry[-1] == "PowerUp":
-                accum.append_ice_entry(
-                    tile_type,
-                    tile_loc,
-                    entry[0],
-                    entry[1:],
-                    None,
-                    negate=True
-                )
+                for tile_loc in group.locs:
+                    accum.append_ice_entry(
+                        tile_type,
+                        tile_loc,
+                        entry[0],
+                        entry[1:],
+                        None,
+                        negate=True
+                    )
             elif tile_type == "RAMT" and entry[-1].startswith("CBIT"):
                 matches = re.match(r"CBIT_([0-9]+)", entry[-1])
                 assert matches is not None, "Expected 'CBIT_n' received {}".format(
@@ -394,20 +532,22 @@ def iceconfig_to_fasm(ic, outf=StringIO()):
                     "3": ("READ_MODE", 1),
                 }
                 val = cbit_translation.get(cbit_offset)
-                if val is not None:
-                    ramb_tile_loc = (tile_loc[0], tile_loc[1] - 1)
-                    accum.append_ice_entry(
-                        "RAMB", ramb_tile_loc, entry[0], [val[0]], val[1]
-                    )
-                else:
-                    accum.append_ice_entry(
-                        tile_type, tile_loc, entry[0], entry[1:], None
-                    )
+                for tile_loc in group.locs:
+                    if val is not None:
+                        ramb_tile_loc = (tile_loc[0], tile_loc[1] - 1)
+                        accum.append_ice_entry(
+                            "RAMB", ramb_tile_loc, entry[0], [val[0]], val[1]
+                        )
+                    else:
+                        accum.append_ice_entry(
+                            tile_type, tile_loc, entry[0], entry[1:], None
+                        )
 
             else:
-                if _check_iceconfig_entry(tile_bits, entry):
+                for tile_idx in np.flatnonzero(is_set[:, entry_idx]):
                     accum.append_ice_entry(
-                        tile_type, tile_loc, entry[0], entry[1:], None
+                        tile_type, group.locs[tile_idx], entry[0], entry[1:],
+                        None
                     )
 
     # ram data
@@ -445,25 +585,21 @@ def fasm_to_asc(in_fasm, outf, device):
 
     device_1k = ic.device == "1k"
 
-    fasmdb = read_ice_db(ic)
+    fasmdb = _read_empty_ice_db(ic)
+    device_bits = DeviceBits(ic)
+    ram_bits = {}
+
     # TODO: upstream init "default" bitstream
-    locs = [(x, y) for x in range(ic.max_x + 1) for y in range(ic.max_y + 1)]
-    for tile_loc in locs:
-        tile = ic.tile(*tile_loc)
-        if tile is None:
-            continue
-        db = ic.tile_db(*tile_loc)
-        tile_type = ic.tile_type(*tile_loc)
-        for entry in db:
+    for group in device_bits.groups:
+        tile_type = group.tile_type
+        for entry in group.db:
             if (device_1k and
                 ((tile_type == "IO" and entry[-1] in ["IE_0", "IE_1"]) or
                  (tile_type == "RAMB" and entry[-1] == "PowerUp"))
                     or (entry[-2] == "ColBufCtrl")):
-                tile_bits = _tile_to_array(tile)
-                tile_type = ic.tile_type(*tile_loc)
-                bm, bv = _get_iceconfig_bits(tile_bits, entry[0])
-                tile_bits[bm] = bv[bm]
-                _array_to_tile(tile_bits, tile)
+                bm, bv = _get_iceconfig_bits(group.bits[0], entry[0])
+                group.bits[:, bm] = bv[bm]
+                device_bits.modified.update(group.locs)
 
     missing_features = []
     for line in fasm.parse_fasm_string(in_fasm.read()):
@@ -488,7 +624,7 @@ def fasm_to_asc(in_fasm, outf, device):
             )
 
             if len(tmap) == 0:
-                print("no ieren found for {}".format((tile_loc + (iob, ))))
+                print("no ieren found for {}".format((tuple(loc) + (iob, ))))
                 return
             return tmap[0]
 
@@ -499,16 +635,16 @@ def fasm_to_asc(in_fasm, outf, device):
 
             feature.parts[-1] = "PINTYPE_0"
             db_entry = fasmdb[feature.to_fasm_entry().feature]
-            _set_feature_bits(ic, db_entry.loc, db_entry.bit_tuples)
+            _set_feature_bits(device_bits, db_entry.loc, db_entry.bit_tuples)
 
             feature.loc = new_ieren[:2]
             feature.parts[-2] = "IoCtrl"
             feature.parts[-1] = "IE_{}".format(new_ieren[2])
             db_entry = fasmdb[feature.to_fasm_entry().feature]
-            _set_feature_bits(ic, db_entry.loc, db_entry.bit_tuples)
+            _set_feature_bits(device_bits, db_entry.loc, db_entry.bit_tuples)
             feature.parts[-1] = "REN_{}".format(new_ieren[2])
             db_entry = fasmdb[feature.to_fasm_entry().feature]
-            _set_feature_bits(ic, db_entry.loc, db_entry.bit_tuples)
+            _set_feature_bits(device_bits, db_entry.loc, db_entry.bit_tuples)
             continue
 
         if feature.parts[-1] == "SimpleOutput":
@@ -517,16 +653,16 @@ def fasm_to_asc(in_fasm, outf, device):
 
             feature.parts[-1] = "PINTYPE_3"
             db_entry = fasmdb[feature.to_fasm_entry().feature]
-            _set_feature_bits(ic, db_entry.loc, db_entry.bit_tuples)
+            _set_feature_bits(device_bits, db_entry.loc, db_entry.bit_tuples)
             feature.parts[-1] = "PINTYPE_4"
             db_entry = fasmdb[feature.to_fasm_entry().feature]
-            _set_feature_bits(ic, db_entry.loc, db_entry.bit_tuples)
+            _set_feature_bits(device_bits, db_entry.loc, db_entry.bit_tuples)
 
             feature.loc = new_ieren[:2]
             feature.parts[-2] = "IoCtrl"
             feature.parts[-1] = "REN_{}".format(new_ieren[2])
             db_entry = fasmdb[feature.to_fasm_entry().feature]
-            _set_feature_bits(ic, db_entry.loc, db_entry.bit_tuples)
+            _set_feature_bits(device_bits, db_entry.loc, db_entry.bit_tuples)
             continue
 
         ## special case for RAM INIT values
@@ -535,28 +671,25 @@ def fasm_to_asc(in_fasm, outf, device):
             tloc = tuple(loc)
             if tloc not in ic.ram_data:
                 ic.ram_data[tloc] = [64 * "0" for _ in range(16)]
-            tile = ic.ram_data[tloc]
-            tile_bits = _tile_to_array(tile, is_hex=True)
+            if tloc not in ram_bits:
+                ram_bits[tloc] = _tile_to_array(ic.ram_data[tloc], is_hex=True)
+            tile_bits = ram_bits[tloc]
         elif tile_type == "RAMB" and feature.parts[-1].endswith("_MODE"):
             # hack to force modes to the RAMT
-            tile = ic.tile(loc[0], loc[1] + 1)
-            tile_bits = _tile_to_array(tile)
+            tile_bits = device_bits.tile_bits((loc[0], loc[1] + 1))
         else:
-            tile = ic.tile(*loc)
-            tile_bits = _tile_to_array(tile)
+            tile_bits = device_bits.tile_bits(loc)
 
         # lookup feature and convert
         for canonical_feature in fasm.canonical_features(line.set_feature):
             key = fasm.set_feature_to_str(canonical_feature)
             feature = fasmdb[key]
-            bm, bv = _get_feature_bits(tile_bits, feature.bit_tuples)
-
-            tile_bits[bm] = bv[bm]
+            _set_bit_tuples(tile_bits, feature.bit_tuples)
 
-        if tile_type == "RAMB" and feature.parts[-1].startswith("INIT"):
-            _array_to_tile(tile_bits, tile, is_hex=True)
-        else:
-            _array_to_tile(tile_bits, tile)
+    # Tiles are only converted back to text once all features are set.
+    device_bits.write_tiles()
+    for tloc, tile_bits in ram_bits.items():
+        _array_to_tile(tile_bits, ic.ram_data[tloc], is_hex=True)
 
     # TODO: would be nice to upstream a way to write to non-files
     ic.write_file(outf.name)
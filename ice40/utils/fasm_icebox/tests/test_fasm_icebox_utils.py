@@ -25,6 +25,45 @@ class TestConversion(unittest.TestCase):
         nibbles = fasm_icebox_utils._bits_to_nibbles(bits)
         self.assertEqual(nibbles, test_vec)
 
+    def test_tile_x_array(self):
+        tile = ["0110", "1000", "0011"]
+        tile_bits = fasm_icebox_utils._tile_to_array(tile)
+        self.assertEqual(tile_bits.shape, (3, 4))
+        self.assertTrue(tile_bits[0][1])
+        self.assertFalse(tile_bits[1][1])
+
+        tile_bits[1][1] = True
+        fasm_icebox_utils._array_to_tile(tile_bits, tile)
+        self.assertEqual(tile, ["0110", "1100", "0011"])
+
+    def test_tile_db_matrix(self):
+        db = [
+            [["B0[1]", "!B1[0]"], "buffer", "a"],
+            [["!B0[1]"], "buffer", "b"],
+            [["B2[3]", "B2[2]"], "buffer", "c"],
+        ]
+        tiles = [
+            ["0100", "0000", "0011"],
+            ["0000", "1000", "0010"],
+        ]
+        tile_bits = fasm_icebox_utils._tiles_to_array(tiles)
+
+        matrix = fasm_icebox_utils.TileDbMatrix(db, tile_bits.shape[1:])
+        is_set = matrix.match(tile_bits.reshape(len(tiles), -1))
+        self.assertEqual(
+            is_set.tolist(), [[True, False, True], [False, True, False]]
+        )
+
+        # Bits of an entry are in tile order, not db order.
+        self.assertEqual(matrix.bit_index[2].tolist(), [10, 11])
+
+        for tile, matches in zip(tile_bits, is_set):
+            for entry, entry_is_set in zip(db, matches):
+                self.assertEqual(
+                    fasm_icebox_utils._check_iceconfig_entry(tile, entry),
+                    entry_is_set
+                )
+
     def test_ram(self):
 
         self.helper(
@@ -1,141 +1,460 @@
 #!/usr/bin/env python3
+""" Checks that all SOURCE nodes of a capnp rr graph connect to all SINK nodes.
+
+Instead of a search from every SOURCE node, the graph is condensed into its
+strongly connected components.  All nodes of a component reach the same SINK
+nodes, and the condensed graph is acyclic, so the set of reachable SINK nodes
+is computed once per component, in reverse topological order, from the sets of
+its successors.
+
+Sets of SINK nodes are bitsets split in chunks of CHUNK_BITS nodes, and only
+chunks with nodes in the set are stored, so the many sets of a single SINK
+node stay small.  Identical sets are stored once, most components of a
+routing graph share a handful of sets.
+
+Unreachable (SOURCE, SINK) pairs are reported grouped by the tile types of the
+SOURCE and SINK nodes.
+"""
 
 import argparse
+import gc
+import os.path
 import re
-from lib.rr_graph import graph
+import sys
+from collections import defaultdict
+
+import capnp
+import numpy as np
+import scipy.sparse
+from scipy.sparse.csgraph import connected_components
+
+from lib.rr_graph import graph2
+from lib.rr_graph_capnp.graph2 import cleanup_capnp_leak, \
+    graph_arrays_from_capnp, read_block_type, read_grid_loc
+
+capnp.remove_import_hook()
+
+# Number of SINK nodes in each chunk of a set of SINK nodes.
+CHUNK_BITS = 4096
+
+
+def load_grid(rr_graph_schema, rr_graph_file):
+    """ Returns (block_types, grid) of a capnp rr graph.
+
+    block_types maps block type ids to graph2.BlockType, grid maps (x, y) to
+    graph2.GridLoc.
+
+    """
+    with open(rr_graph_file, 'rb') as f:
+        rr_graph = rr_graph_schema.RrGraph.read(
+            f, traversal_limit_in_words=2**63 - 1
+        )
+
+        block_types = {}
+        for block_type in rr_graph.blockTypes.blockTypes:
+            block_type = read_block_type(block_type)
+            block_types[block_type.id] = block_type
 
+        grid = {}
+        for grid_loc in rr_graph.grid.gridLocs:
+            grid_loc = read_grid_loc(grid_loc)
+            grid[grid_loc.x, grid_loc.y] = grid_loc
+
+        # File back capnp objects cannot outlive their input file.
+        del rr_graph
+        gc.collect()
+        cleanup_capnp_leak(f)
+
+    return block_types, grid
+
+
+def condense_graph(num_nodes, src_nodes, sink_nodes):
+    """ Condenses graph into its strongly connected components.
+
+    Arguments
+    ---------
+    num_nodes : int
+        Number of nodes, node ids are 0 to num_nodes - 1.
+    src_nodes, sink_nodes : numpy arrays
+        Nodes of each edge.
+
+    Returns
+    -------
+    labels : numpy array
+        Component of each node.
+    components : scipy.sparse.csr_matrix
+        Adjacency matrix of the acyclic graph of components.
+
+    >>> labels, components = condense_graph(
+    ...     4, np.array([0, 1, 2, 1]), np.array([1, 0, 3, 2]))
+    >>> bool(labels[0] == labels[1]), len(set(labels))
+    (True, 3)
+    >>> components.nnz
+    2
 
-def inaccessible_node_ids(forward_connections, node_id, target_node_ids):
     """
-    Takes a mapping of forward connectionso from nodes, a starting `node_id` and
-    a set of all the target node ids for which we want to check routability.
-    Returns a set of all the target node ids that are not accessible from `node_id`.
+    edges = scipy.sparse.csr_matrix(
+        (
+            np.ones(len(src_nodes), dtype=np.int8),
+            (src_nodes, sink_nodes),
+        ),
+        shape=(num_nodes, num_nodes),
+    )
+    num_components, labels = connected_components(
+        edges, directed=True, connection='strong'
+    )
+
+    src_components = labels[src_nodes]
+    sink_components = labels[sink_nodes]
+    between = src_components != sink_components
+
+    components = scipy.sparse.csr_matrix(
+        (
+            np.ones(np.count_nonzero(between), dtype=np.int8),
+            (src_components[between], sink_components[between]),
+        ),
+        shape=(num_components, num_components),
+    )
+    # Duplicate edges are summed, only the structure is used.
+    components.sum_duplicates()
+
+    return labels, components
+
+
+def reverse_topological_order(components):
+    """ Returns components of an acyclic graph, each after all its successors.
+
+    >>> components = scipy.sparse.csr_matrix(
+    ...     np.array([[0, 0, 1], [1, 0, 0], [0, 0, 0]], dtype=np.int8))
+    >>> reverse_topological_order(components).tolist()
+    [2, 0, 1]
+
+    """
+    num_components = components.shape[0]
+    predecessors = components.transpose().tocsr()
+
+    out_degree = np.diff(components.indptr)
+    levels = []
+
+    level = np.flatnonzero(out_degree == 0)
+    while len(level) > 0:
+        levels.append(level)
+
+        level_predecessors = predecessors[level].indices
+        out_degree = out_degree - np.bincount(
+            level_predecessors, minlength=num_components
+        )
+
+        level = np.unique(level_predecessors)
+        level = level[out_degree[level] == 0]
+
+    order = np.concatenate(levels) if levels else np.zeros(0, dtype=np.int64)
+    assert len(order) == num_components, "Component graph is not acyclic"
+
+    return order
+
+
+def union_sink_sets(sink_sets):
+    """ Returns union of sets of SINK nodes.
+
+    A set is a tuple of (chunk, bits) pairs, sorted by chunk, with a pair for
+    each chunk of CHUNK_BITS nodes that has nodes in the set.  Bit i of bits
+    is node chunk * CHUNK_BITS + i.
+
+    >>> union_sink_sets([((0, 0b01), (2, 0b1)), ((0, 0b10), )])
+    ((0, 3), (2, 1))
+
+    """
+    union = {}
+    for sink_set in sink_sets:
+        for chunk, bits in sink_set:
+            union[chunk] = union.get(chunk, 0) | bits
+
+    return tuple(sorted(union.items()))
+
+
+def missing_sinks(sink_set, num_sinks):
+    """ Returns indices of the SINK nodes missing from a set.
+
+    >>> missing_sinks(((0, 0b101), ), 5)
+    [1, 3, 4]
+
+    """
+    present = np.zeros(num_sinks + (-num_sinks % CHUNK_BITS), dtype=np.uint8)
+    for chunk, bits in sink_set:
+        data = np.frombuffer(
+            bits.to_bytes(CHUNK_BITS // 8, 'little'), dtype=np.uint8
+        )
+        present[chunk * CHUNK_BITS:(chunk + 1) * CHUNK_BITS] = np.unpackbits(
+            data, bitorder='little'
+        )
+
+    return np.flatnonzero(present[:num_sinks] == 0).tolist()
+
+
+def reachable_sink_sets(labels, components, sink_nodes):
+    """ Computes which SINK nodes each component reaches.
+
+    Arguments
+    ---------
+    labels : numpy array
+        Component of each node, see condense_graph.
+    components : scipy.sparse.csr_matrix
+        Acyclic graph of components, see condense_graph.
+    sink_nodes : list of int
+        SINK nodes to check, bit i of the sets is sink_nodes[i].
+
+    Returns
+    -------
+    reach : list of int
+        Index into sink_sets of the set reached by each component.
+    sink_sets : list of tuple
+        Distinct sets of SINK nodes, see union_sink_sets.
+
+    >>> labels, components = condense_graph(
+    ...     4, np.array([0, 1, 2, 1]), np.array([1, 0, 3, 2]))
+    >>> reach, sink_sets = reachable_sink_sets(labels, components, [3, 2])
+    >>> [sink_sets[reach[labels[node]]] for node in range(4)]
+    [((0, 3),), ((0, 3),), ((0, 3),), ((0, 1),)]
+
     """
-    layer = [node_id]
-    visited = set()
-    layer_index = 0
-    while layer:
-        layer_index += 1
-        new_layer = set()
-        for this_node_id in layer:
-            new_layer |= forward_connections[this_node_id]
-        new_layer -= visited
-        visited |= new_layer
-        layer = new_layer
-    return target_node_ids - visited
-
-
-def routing_graph_to_dictionary(routing_graph):
-    edge_map = routing_graph._ids_map(graph.RoutingEdge)
-    edges_by_node = routing_graph.edges_for_allnodes()
-    dict_graph = {}
-    for node in routing_graph._xml_parent(graph.RoutingNode):
-        node_id = int(node.get('id'))
-        dest_ids = set()
-        for edge_id in edges_by_node[node_id]:
-            edge = edge_map[edge_id]
-            if int(edge.get('src_node')) == node_id:
-                dest_ids.add(int(edge.get('sink_node')))
-        dict_graph[node_id] = dest_ids
-    return dict_graph
-
-
-def filter_nodes(all_node_ids, g, f):
-    node_map = g.routing._ids_map(graph.RoutingNode)
+    own_sinks = defaultdict(list)
+    for idx, node in enumerate(sink_nodes):
+        chunk, bit = divmod(idx, CHUNK_BITS)
+        own_sinks[int(labels[node])].append(((chunk, 1 << bit), ))
+
+    sink_sets = [()]
+    sink_set_ids = {(): 0}
+
+    indptr = components.indptr.tolist()
+    indices = components.indices.tolist()
+    reach = [0] * components.shape[0]
+
+    for component in reverse_topological_order(components).tolist():
+        set_ids = set(
+            reach[successor]
+            for successor in indices[indptr[component]:indptr[component + 1]]
+        )
+        set_ids.discard(0)
+
+        sinks = own_sinks.pop(component, [])
+        if not sinks and len(set_ids) == 1:
+            reach[component] = set_ids.pop()
+            continue
+
+        sink_set = union_sink_sets(
+            sinks + [sink_sets[set_id] for set_id in set_ids]
+        )
+
+        set_id = sink_set_ids.get(sink_set)
+        if set_id is None:
+            set_id = len(sink_sets)
+            sink_sets.append(sink_set)
+            sink_set_ids[sink_set] = set_id
+
+        reach[component] = set_id
+
+    return reach, sink_sets
+
+
+class NodeNames(object):
+    """ Names and tile types of SOURCE and SINK nodes. """
+
+    def __init__(self, nodes, block_types, grid):
+        self.node_type = nodes.column('type')
+        self.x_low = nodes.column('x_low')
+        self.y_low = nodes.column('y_low')
+        self.ptc = nodes.column('ptc')
+
+        # Position of each node id in the node columns.
+        node_ids = nodes.column('id')
+        self.node_index = np.zeros(int(node_ids.max()) + 1, dtype=np.int64)
+        self.node_index[node_ids] = np.arange(len(node_ids))
+
+        self.block_types = block_types
+        self.grid = grid
+
+    def tile_type(self, node_id):
+        """ Returns name of the tile type of node. """
+        idx = self.node_index[node_id]
+        grid_loc = self.grid.get((int(self.x_low[idx]), int(self.y_low[idx])))
+        if grid_loc is None:
+            return '<no tile>'
+
+        return self.block_types[grid_loc.block_type_id].name
+
+    def name(self, node_id):
+        """ Returns unique name of node, like RoutingGraphPrinter.node. """
+        idx = self.node_index[node_id]
+        node_type = graph2.NodeType(int(self.node_type[idx]))
+
+        return '{} X{:03d}Y{:03d}_{}[{:02d}].{}'.format(
+            node_id,
+            int(self.x_low[idx]),
+            int(self.y_low[idx]),
+            self.tile_type(node_id),
+            int(self.ptc[idx]),
+            {
+                graph2.NodeType.SOURCE: 'SRC-->',
+                graph2.NodeType.SINK: 'SINK-<',
+            }.get(node_type, node_type.name),
+        )
+
+
+def filter_nodes(node_ids, names, f):
+    """ Returns node ids whose names do not match regular expression f. """
+    if not f:
+        return node_ids
+
     f = re.compile(f)
-    node_ids = set()
-    for nid in all_node_ids:
-        node = node_map[nid]
-        n = graph.RoutingGraphPrinter.node(node, g.block_grid)
-        if f.search(n):
-            print("Filtering out ", n)
+    filtered_node_ids = []
+    for node_id in node_ids:
+        name = names.name(node_id)
+        if f.search(name):
+            print("Filtering out ", name)
             continue
-        node_ids.add(nid)
-    return node_ids
+        filtered_node_ids.append(node_id)
+    return filtered_node_ids
 
 
-def inaccessible_sink_node_ids_by_source_node_id(g, filter=""):
+def inaccessible_sink_node_ids_by_source_node_id(
+        num_nodes, nodes, edges, names, filter=""
+):
     """
-    Returns a dictionary that maps source node ids to sets of sink node ids
+    Returns a dictionary that maps source node ids to lists of sink node ids
     which are inaccessible to them.
     If a source node id can access all sink nodes it is not present in the
     returned dictionary.
     """
-    routing_graph = g.routing
-
-    # First convert the graph to a dictionary.
-    cyclic_graph = routing_graph_to_dictionary(routing_graph)
+    node_ids = nodes.column('id')
+    node_type = nodes.column('type')
 
-    all_source_node_ids = set(
-        [
-            int(node.get('id'))
-            for node in routing_graph._xml_parent(graph.RoutingNode)
-            if node.get('type') == 'SOURCE'
-        ]
+    source_node_ids = filter_nodes(
+        node_ids[node_type == graph2.NodeType.SOURCE.value].tolist(), names,
+        filter
     )
-    source_node_ids = filter_nodes(all_source_node_ids, g, filter)
-
-    all_sink_node_ids = set(
-        [
-            int(node.get('id'))
-            for node in routing_graph._xml_parent(graph.RoutingNode)
-            if node.get('type') == 'SINK'
-        ]
+    sink_node_ids = filter_nodes(
+        node_ids[node_type == graph2.NodeType.SINK.value].tolist(), names,
+        filter
+    )
+
+    print('Condensing strongly connected components')
+    labels, components = condense_graph(
+        num_nodes, edges.src_nodes(), edges.sink_nodes()
     )
-    sink_node_ids = filter_nodes(all_sink_node_ids, g, filter)
+    print('{} nodes in {} components'.format(num_nodes, components.shape[0]))
+
+    print('Computing SINK nodes reachable from each component')
+    reach, sink_sets = reachable_sink_sets(labels, components, sink_node_ids)
+    print('{} distinct sets of SINK nodes'.format(len(sink_sets)))
+
+    # Sources reaching the same set miss the same sinks, decode each set once.
+    inaccessible_by_set = {}
 
     inaccessible_by_source_node = {}
-    total = len(source_node_ids)
-    for index, source_node_id in enumerate(source_node_ids):
-        inaccessible_ids = inaccessible_node_ids(
-            cyclic_graph, source_node_id, target_node_ids=sink_node_ids
-        )
+    for source_node_id in source_node_ids:
+        set_id = reach[labels[source_node_id]]
+        if set_id not in inaccessible_by_set:
+            inaccessible_by_set[set_id] = [
+                sink_node_ids[idx] for idx in
+                missing_sinks(sink_sets[set_id], len(sink_node_ids))
+            ]
+
+        inaccessible_ids = inaccessible_by_set[set_id]
         if inaccessible_ids:
             inaccessible_by_source_node[source_node_id] = inaccessible_ids
-        if index % 100 == 0:
-            print('Checked {}/{} source nodes'.format(index, total))
+
     return inaccessible_by_source_node
 
 
-def check_graph(rr_graph_file, filter):
+def check_graph(rr_graph_schema, rr_graph_file, filter, max_pairs):
     '''
     Check that the rr_graph has connections from all SOURCE nodes to all SINK nodes.
+
+    Returns True if it has.
     '''
     print('Loading the routing graph file')
-    g = graph.Graph(rr_graph_file, verbose=True, clear_fabric=False)
-    routing_graph = g.routing
+    nodes, edges = graph_arrays_from_capnp(rr_graph_schema, rr_graph_file)
+    block_types, grid = load_grid(rr_graph_schema, rr_graph_file)
+    names = NodeNames(nodes, block_types, grid)
+
+    num_nodes = int(nodes.column('id').max()) + 1
+    if len(edges) > 0:
+        num_nodes = max(
+            num_nodes,
+            int(edges.src_nodes().max()) + 1,
+            int(edges.sink_nodes().max()) + 1,
+        )
+
     print('Checking if all source nodes connect to all sink nodes.')
     inaccessible_nodes = inaccessible_sink_node_ids_by_source_node_id(
-        g, filter
+        num_nodes, nodes, edges, names, filter
     )
-    if inaccessible_nodes:
-        print('FAIL')
-        node_map = routing_graph._ids_map(graph.RoutingNode)
-        for source_id, sink_ids in inaccessible_nodes.items():
-            source_node = graph.RoutingGraphPrinter.node(
-                node_map[source_id], g.block_grid
+    if not inaccessible_nodes:
+        print('SUCCESS')
+        return True
+
+    print('FAIL')
+
+    pairs_by_tile_types = defaultdict(list)
+    for source_id, sink_ids in inaccessible_nodes.items():
+        source_tile_type = names.tile_type(source_id)
+        for sink_id in sink_ids:
+            key = (source_tile_type, names.tile_type(sink_id))
+            pairs_by_tile_types[key].append((source_id, sink_id))
+
+    for (source_tile_type,
+         sink_tile_type), pairs in sorted(pairs_by_tile_types.items()):
+        print(
+            'SOURCE nodes of {} do not connect to SINK nodes of {}: '
+            '{} pairs'.format(source_tile_type, sink_tile_type, len(pairs))
+        )
+        for source_id, sink_id in pairs[:max_pairs]:
+            print(
+                '    {} -> {}'.format(
+                    names.name(source_id), names.name(sink_id)
+                )
             )
-            sink_nodes = [
-                graph.RoutingGraphPrinter.node(node_map[i], g.block_grid)
-                for i in sink_ids
-            ]
+        if len(pairs) > max_pairs:
+            print('    ...')
+        print()
 
-            print('Node {} does not connect to nodes:.'.format(source_node))
-            for n in sink_nodes:
-                print('    ', n)
-            print()
-        import pdb
-        pdb.set_trace()
-    else:
-        print('SUCCESS')
+    return False
 
 
 def main():
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('rr_graph_file', type=str)
-    parser.add_argument('filter', type=str)
+    parser.add_argument(
+        'filter',
+        type=str,
+        nargs='?',
+        default='',
+        help='SOURCE and SINK nodes with names matching this regular '
+        'expression are not checked.'
+    )
+    parser.add_argument(
+        '--vpr_capnp_schema_dir',
+        required=True,
+        help='Directory container VPR schema files',
+    )
+    parser.add_argument(
+        '--max_pairs',
+        type=int,
+        default=10,
+        help='Maximum number of unreachable pairs printed per pair of tile '
+        'types.'
+    )
     args = parser.parse_args()
-    check_graph(args.rr_graph_file, args.filter)
+
+    rr_graph_schema = capnp.load(
+        os.path.join(args.vpr_capnp_schema_dir, 'rr_graph_uxsdcxx.capnp'),
+        imports=[os.path.dirname(os.path.dirname(capnp.__file__))]
+    )
+
+    if not check_graph(rr_graph_schema, args.rr_graph_file, args.filter,
+                       args.max_pairs):
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -1,24 +1,29 @@
 #!/usr/bin/env python3
 """ Tool for sanity checking rrgraph CHAN PTC's.
+
+Reads XML rr graphs, or capnp rr graphs when --vpr_capnp_schema_dir is given.
 """
 import lxml.etree as ET
 import argparse
+import os.path
 
+import numpy as np
 
-def check_ptc(xml):
-    """ Checks ptc values used on CHANX and CHANY rr graph nodes are valid.
+from lib.rr_graph import graph2
+from lib.rr_graph.ptc import chan_intervals, find_ptc_overlaps, \
+    find_ptc_gaps
 
-    CHAN ptc numbers are an index per x/y coordinate and channel type (CHANX or
-    CHANY).  ptc's at a particular coordinate/type must start at 0, and fill
-    to the max value.
 
+def xml_chan_nodes(xml):
+    """ Returns (ids, types, x_low, y_low, x_high, y_high, ptc) arrays of
+    CHANX and CHANY nodes of a XML rr graph.
     """
-    chan_ptcs = {}
-    nodes = {}
+    node_ids = set()
+    columns = [[] for _ in range(7)]
 
     for node in xml.find('rr_nodes').iter('node'):
-        assert node.attrib['id'] not in nodes
-        nodes[node.attrib['id']] = node
+        assert node.attrib['id'] not in node_ids
+        node_ids.add(node.attrib['id'])
 
         node_type = node.attrib['type']
 
@@ -26,67 +31,147 @@ def check_ptc(xml):
             loc_xml = node.find('loc')
             assert loc_xml is not None
 
-            for x in range(int(loc_xml.attrib['xlow']),
-                           int(loc_xml.attrib['xhigh']) + 1):
-                for y in range(int(loc_xml.attrib['ylow']),
-                               int(loc_xml.attrib['yhigh']) + 1):
-                    key = (node_type, x, y)
-
-                    if key not in chan_ptcs:
-                        chan_ptcs[key] = []
-
-                    chan_ptcs[key].append(
-                        (node.attrib['id'], int(loc_xml.attrib['ptc']))
-                    )
-
-    for (node_type, x, y), node_ptcs in chan_ptcs.items():
-        nodes, ptcs = zip(*node_ptcs)
-        starts_at_zero = min(ptcs) == 0
-        ends_at_max_val = max(ptcs) == len(ptcs) - 1
-        all_values_present = len(ptcs) == len(set(ptcs))
-
-        if not all((starts_at_zero, ends_at_max_val, all_values_present)):
-            sorted_nodes = sorted(zip(ptcs, nodes), key=lambda x: x[0])
-            for idx, (ptc, node) in enumerate(sorted_nodes):
-                if idx == ptc:
-                    continue
-
-                if idx > 1:
-                    raise ValueError(
-                        """\
+            for column, value in zip(columns, (
+                    node.attrib['id'],
+                    graph2.NodeType[node_type].value,
+                    loc_xml.attrib['xlow'],
+                    loc_xml.attrib['ylow'],
+                    loc_xml.attrib['xhigh'],
+                    loc_xml.attrib['yhigh'],
+                    loc_xml.attrib['ptc'],
+            )):
+                column.append(int(value))
+
+    return [np.array(column, dtype=np.int64) for column in columns]
+
+
+def capnp_chan_nodes(rr_graph_schema, input_file):
+    """ Returns (ids, types, x_low, y_low, x_high, y_high, ptc) arrays of
+    CHANX and CHANY nodes of a capnp rr graph.
+    """
+    from lib.rr_graph_capnp.graph2 import graph_arrays_from_capnp
+
+    nodes, _ = graph_arrays_from_capnp(rr_graph_schema, input_file)
+
+    node_ids = nodes.column('id')
+    assert len(np.unique(node_ids)) == len(node_ids)
+
+    node_type = nodes.column('type')
+    is_chan = (node_type == graph2.NodeType.CHANX.value) | (
+        node_type == graph2.NodeType.CHANY.value
+    )
+
+    return [
+        nodes.column(name)[is_chan].astype(np.int64) for name in
+        ('id', 'type', 'x_low', 'y_low', 'x_high', 'y_high', 'ptc')
+    ]
+
+
+def check_ptc(node_ids, node_type, x_low, y_low, x_high, y_high, ptc):
+    """ Checks ptc values used on CHANX and CHANY rr graph nodes are valid.
+
+    CHAN ptc numbers are an index per x/y coordinate and channel type (CHANX or
+    CHANY).  ptc's at a particular coordinate/type must start at 0, and fill
+    to the max value.
+
+    Arguments are arrays with the ids, graph2.NodeType values, locations and
+    ptc's of the CHANX and CHANY nodes.
+
+    """
+    channel, low, high = chan_intervals(
+        node_type, x_low, y_low, x_high, y_high
+    )
+    nodes = (node_type, channel, low, high, ptc)
+
+    overlaps = find_ptc_overlaps(*nodes)
+    if overlaps:
+        a, b = overlaps[0]
+        raise ValueError(
+            """\
+Duplicate ptc {ptc} for type = {node_type} in channel {channel}
+Nodes id = {a} and id = {b} overlap""".format(
+                ptc=ptc[a],
+                node_type=graph2.NodeType(node_type[a]).name,
+                channel=channel[a],
+                a=node_ids[a],
+                b=node_ids[b],
+            )
+        )
+
+    gaps = find_ptc_gaps(*nodes)
+    if not gaps:
+        return
+
+    # Report the first coordinate with a bad ptc.
+    gap_type, gap_channel, coord, _ = gaps[0]
+    if gap_type == graph2.NodeType.CHANX.value:
+        x, y = coord, gap_channel
+    else:
+        x, y = gap_channel, coord
+
+    at_coord = (node_type == gap_type) & (channel == gap_channel)
+    at_coord &= (low <= coord) & (high >= coord)
+    sorted_nodes = sorted(
+        zip(ptc[at_coord].tolist(), node_ids[at_coord].tolist())
+    )
+    node_type = graph2.NodeType(gap_type).name
+
+    for idx, (ptc, node) in enumerate(sorted_nodes):
+        if idx == ptc:
+            continue
+
+        if idx > 0:
+            raise ValueError(
+                """\
 Gap in ptc value for type = {node_type} @ ({x}, {y})
 Expect PTC = {idx}, found {ptc}
 Current node is id = {cur_node}
 Previous node is id = {prev_node}""".format(
-                            x=x,
-                            y=y,
-                            node_type=node_type,
-                            idx=idx,
-                            ptc=ptc,
-                            cur_node=node,
-                            prev_node=sorted_nodes[idx - 1][1],
-                        )
-                    )
-                else:
-                    raise ValueError(
-                        "Lowest ptc is {ptc} for type = {node_type} @ ({x}, {y})"
-                        .format(
-                            x=x,
-                            y=y,
-                            node_type=node_type,
-                            ptc=ptc,
-                        )
-                    )
+                    x=x,
+                    y=y,
+                    node_type=node_type,
+                    idx=idx,
+                    ptc=ptc,
+                    cur_node=node,
+                    prev_node=sorted_nodes[idx - 1][1],
+                )
+            )
+        else:
+            raise ValueError(
+                "Lowest ptc is {ptc} for type = {node_type} @ ({x}, {y})".
+                format(
+                    x=x,
+                    y=y,
+                    node_type=node_type,
+                    ptc=ptc,
+                )
+            )
 
 
 def main():
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('input_xml')
+    parser.add_argument(
+        '--vpr_capnp_schema_dir',
+        help='Directory container VPR schema files. When given, input_xml '
+        'is read as a capnp rr graph.',
+    )
 
     args = parser.parse_args()
 
-    xml = ET.parse(args.input_xml, ET.XMLParser(remove_blank_text=True))
-    check_ptc(xml)
+    if args.vpr_capnp_schema_dir:
+        import capnp
+        capnp.remove_import_hook()
+        rr_graph_schema = capnp.load(
+            os.path.join(args.vpr_capnp_schema_dir, 'rr_graph_uxsdcxx.capnp'),
+            imports=[os.path.dirname(os.path.dirname(capnp.__file__))]
+        )
+        nodes = capnp_chan_nodes(rr_graph_schema, args.input_xml)
+    else:
+        xml = ET.parse(args.input_xml, ET.XMLParser(remove_blank_text=True))
+        nodes = xml_chan_nodes(xml)
+
+    check_ptc(*nodes)
 
 
 if __name__ == "__main__":
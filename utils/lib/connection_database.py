@@ -1,8 +1,16 @@
 import enum
+import glob
+import hashlib
 import os
+import sqlite3
+import sys
 from lib.rr_graph import graph2
 from lib.rr_graph import tracks
 
+CONNECTION_DATABASE_SQL_FILE = os.path.join(
+    os.path.dirname(__file__), "connection_database.sql"
+)
+
 
 class NodeClassification(enum.Enum):
     NULL = 1
@@ -13,10 +21,7 @@ class NodeClassification(enum.Enum):
 
 def create_tables(conn):
     """ Create connection database scheme. """
-    connection_database_sql_file = os.path.join(
-        os.path.dirname(__file__), "connection_database.sql"
-    )
-    with open(connection_database_sql_file, 'r') as f:
+    with open(CONNECTION_DATABASE_SQL_FILE, 'r') as f:
         c = conn.cursor()
         c.executescript(f.read())
         conn.commit()
@@ -34,6 +39,126 @@ VALUES
     conn.commit()
 
 
+def fingerprint_inputs(paths, values=()):
+    """ Returns a fingerprint of the content of files and other input values.
+
+    Arguments
+    ---------
+    paths : iterable of str
+        Input files.  Missing files are fingerprinted as missing rather than
+        raising an error.
+    values : iterable of str
+        Other inputs, e.g. command line arguments or fingerprints of earlier
+        stages.
+
+    """
+    h = hashlib.sha256()
+
+    for path in sorted(paths):
+        h.update(b'file\0')
+        h.update(os.path.basename(path).encode('utf-8'))
+        h.update(b'\0')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(block)
+        else:
+            h.update(b'missing')
+        h.update(b'\0')
+
+    for value in values:
+        h.update(b'value\0')
+        h.update(str(value).encode('utf-8'))
+        h.update(b'\0')
+
+    return h.hexdigest()
+
+
+def get_code_sources(root_dir):
+    """ Returns python files of the code a build stage runs.
+
+    These are the files of all imported modules under root_dir, and all files
+    of the lib package, as some lib modules are only imported when used.
+
+    Arguments
+    ---------
+    root_dir : str
+        Directory containing the code of the stage, e.g. the repository root.
+
+    """
+    root_dir = os.path.join(os.path.abspath(root_dir), '')
+    lib_dir = os.path.dirname(os.path.abspath(__file__))
+
+    paths = set(glob.glob(os.path.join(lib_dir, '**', '*.py'), recursive=True))
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path is None or not path.endswith('.py'):
+            continue
+
+        path = os.path.abspath(path)
+        if path.startswith(root_dir):
+            paths.add(path)
+
+    return sorted(paths)
+
+
+def get_stage_fingerprint(conn, stage):
+    """ Returns the fingerprint recorded for stage, or None.
+
+    Databases created before the stage_fingerprint table existed have no
+    fingerprints.
+
+    """
+    c = conn.cursor()
+    try:
+        c.execute(
+            "SELECT fingerprint FROM stage_fingerprint WHERE stage = ?",
+            (stage, )
+        )
+    except sqlite3.OperationalError:
+        return None
+
+    result = c.fetchone()
+    if result is None:
+        return None
+
+    return result[0]
+
+
+def set_stage_fingerprint(conn, stage, fingerprint):
+    """ Records the fingerprint of the inputs of stage. """
+    c = conn.cursor()
+    c.execute(
+        """
+CREATE TABLE IF NOT EXISTS stage_fingerprint(
+    stage TEXT PRIMARY KEY,
+    fingerprint TEXT
+);"""
+    )
+    c.execute(
+        """
+INSERT OR REPLACE INTO stage_fingerprint(stage, fingerprint) VALUES (?, ?)""",
+        (stage, fingerprint)
+    )
+    conn.commit()
+
+
+def read_stage_fingerprint(database, stage):
+    """ Returns the fingerprint recorded for stage in database file, or None.
+
+    Returns None if the database file does not exist.
+
+    """
+    if not os.path.exists(database):
+        return None
+
+    conn = sqlite3.connect('file:{}?mode=ro'.format(database), uri=True)
+    try:
+        return get_stage_fingerprint(conn, stage)
+    finally:
+        conn.close()
+
+
 def get_wire_pkey(conn, tile_name, wire):
     c = conn.cursor()
     c.execute(
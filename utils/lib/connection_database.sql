@@ -410,3 +410,11 @@ CREATE TABLE constant_sources(
     FOREIGN KEY(vcc_track_pkey) REFERENCES track(pkey),
     FOREIGN KEY(gnd_track_pkey) REFERENCES track(pkey)
 );
+
+-- Fingerprints of the inputs of each build stage that wrote this database.
+-- A stage whose inputs have the same fingerprint as the recorded one does not
+-- need to be rerun.
+CREATE TABLE stage_fingerprint(
+    stage TEXT PRIMARY KEY,
+    fingerprint TEXT
+);
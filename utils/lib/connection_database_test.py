@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import os.path
+import sqlite3
+import tempfile
+import unittest
+
+from .connection_database import (
+    create_tables, fingerprint_inputs, get_code_sources, get_stage_fingerprint,
+    read_stage_fingerprint, set_stage_fingerprint
+)
+
+
+class TestStageFingerprint(unittest.TestCase):
+    def test_fingerprint_inputs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            a = os.path.join(tmp_dir, 'a.json')
+            b = os.path.join(tmp_dir, 'b.json')
+            with open(a, 'w') as f:
+                f.write('a')
+            with open(b, 'w') as f:
+                f.write('b')
+
+            fingerprint = fingerprint_inputs([a, b], values=('part', ))
+            self.assertEqual(
+                fingerprint_inputs([b, a], values=('part', )), fingerprint
+            )
+            self.assertNotEqual(
+                fingerprint_inputs([a, b], values=('other_part', )),
+                fingerprint
+            )
+
+            with open(b, 'w') as f:
+                f.write('c')
+            self.assertNotEqual(
+                fingerprint_inputs([a, b], values=('part', )), fingerprint
+            )
+
+            os.remove(b)
+            self.assertNotEqual(
+                fingerprint_inputs([a, b], values=('part', )), fingerprint
+            )
+
+    def test_get_code_sources(self):
+        lib_dir = os.path.dirname(os.path.abspath(__file__))
+        utils_dir = os.path.dirname(lib_dir)
+
+        paths = get_code_sources(utils_dir)
+        self.assertEqual(paths, sorted(set(paths)))
+
+        # Lib modules are included even when not imported.
+        for name in ('connection_database.py', 'prjxray_database.py',
+                     os.path.join('rr_graph', 'ptc.py'), os.path.join(
+                         'rr_graph_capnp', 'graph2.py')):
+            self.assertIn(os.path.join(lib_dir, name), paths)
+
+        # Imported modules outside of the root are not.
+        self.assertNotIn(os.path.abspath(unittest.__file__), paths)
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = os.path.join(tmp_dir, 'channels.db')
+            self.assertIsNone(read_stage_fingerprint(fname, 'form_channels'))
+
+            with sqlite3.connect(fname) as conn:
+                create_tables(conn)
+                self.assertIsNone(get_stage_fingerprint(conn, 'form_channels'))
+                set_stage_fingerprint(conn, 'form_channels', '1234')
+                set_stage_fingerprint(conn, 'form_channels', '5678')
+            conn.close()
+
+            self.assertEqual(
+                read_stage_fingerprint(fname, 'form_channels'), '5678'
+            )
+            self.assertIsNone(read_stage_fingerprint(fname, 'create_edges'))
+
+    def test_old_database(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE node(pkey INTEGER PRIMARY KEY);')
+        self.assertIsNone(get_stage_fingerprint(conn, 'form_channels'))
+
+        set_stage_fingerprint(conn, 'form_channels', '1234')
+        self.assertEqual(get_stage_fingerprint(conn, 'form_channels'), '1234')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+Persistent cache of parsed prjxray databases.
+
+Most xc utilities construct a prjxray.db.Database for the same part and parse
+the same tilegrid, tileconn and tile type JSON files again.  load_database
+returns a database with the grid, connections and all tile types already
+parsed, and pickles it to a cache file the first time, so later steps of the
+build only unpickle it.
+
+Cache files are keyed by a fingerprint of the database JSON files, the
+prjxray library and CACHE_VERSION, so a change to any of them invalidates the
+cache.  The cache directory is PRJXRAY_DB_CACHE_DIR, which the build sets
+to a directory in the build tree.  If PRJXRAY_DB_CACHE_DIR is unset or empty,
+nothing is cached.
+
+The build also passes this directory to update_arch_timings.py --cache_dir,
+which caches the timings parsed from the database SDF files.
+"""
+import glob
+import os
+import os.path
+import pickle
+import sys
+import tempfile
+
+from lib.connection_database import fingerprint_inputs
+
+# Increment when the content of the cached database changes.
+CACHE_VERSION = 1
+
+CACHE_DIR_ENV = 'PRJXRAY_DB_CACHE_DIR'
+
+
+def get_cache_dir():
+    """ Returns directory to store cached databases in, or None. """
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    return cache_dir if cache_dir else None
+
+
+def get_database_fingerprint(db_root, part, prjxray_dir):
+    """ Returns fingerprint of the database files of part.
+
+    Arguments
+    ---------
+    db_root : str
+        Project X-Ray database root.
+    part : str
+        FPGA part.
+    prjxray_dir : str
+        Directory of the prjxray python library.
+
+    """
+    paths = glob.glob(os.path.join(db_root, '*.json'))
+    paths += glob.glob(os.path.join(db_root, part, '*.json'))
+    paths += glob.glob(os.path.join(prjxray_dir, '*.py'))
+
+    return fingerprint_inputs(
+        paths,
+        values=(
+            os.path.abspath(db_root),
+            part,
+            CACHE_VERSION,
+            '{}.{}'.format(*sys.version_info[:2]),
+        )
+    )
+
+
+def get_cache_file_name(cache_dir, part, fingerprint):
+    """ Returns name of the cache file of part with given fingerprint.
+
+    >>> get_cache_file_name('cache', 'xc7a35tcsg324-1', 'abcd')
+    'cache/xc7a35tcsg324-1.abcd.pickle'
+    """
+    return os.path.join(cache_dir, '{}.{}.pickle'.format(part, fingerprint))
+
+
+def load_cached(cache_file_name, load):
+    """ Returns object unpickled from cache file, or returned by load.
+
+    If the cache file does not exist, the object returned by load is pickled
+    to it.  The cache file is written atomically, so concurrent build steps
+    never read a partial file.  Failing to write the cache is not an error.
+    Diagnostics go to stderr, as callers may write their output to stdout.
+
+    """
+    if os.path.exists(cache_file_name):
+        try:
+            with open(cache_file_name, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, ImportError, AttributeError,
+                pickle.UnpicklingError) as e:
+            print(
+                "Ignoring unreadable cache '{}': {}".format(
+                    cache_file_name, e
+                ),
+                file=sys.stderr
+            )
+
+    obj = load()
+
+    cache_dir = os.path.dirname(cache_file_name)
+    tmp_file_name = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file_name = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file_name, cache_file_name)
+        tmp_file_name = None
+    except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+        print(
+            "Not caching to '{}': {}".format(cache_file_name, e),
+            file=sys.stderr
+        )
+        return obj
+    finally:
+        if tmp_file_name is not None and os.path.exists(tmp_file_name):
+            os.remove(tmp_file_name)
+
+    return obj
+
+
+def remove_stale_cache_files(cache_dir, part, cache_file_name):
+    """ Removes cache files of part other than cache_file_name. """
+    for stale_file_name in glob.glob(get_cache_file_name(cache_dir, part,
+                                                         '*')):
+        if stale_file_name != cache_file_name:
+            try:
+                os.remove(stale_file_name)
+            except OSError:
+                pass
+
+
+def parse_database(db):
+    """ Parses all lazily parsed parts of a prjxray.db.Database. """
+    db.grid()
+    db.connections()
+    for tile_type in db.get_tile_types():
+        db.get_tile_type(tile_type)
+
+    return db
+
+
+def load_database(db_root, part):
+    """ Returns prjxray.db.Database of part, loaded from the cache if possible.
+
+    If caching is disabled, see get_cache_dir, the database is returned
+    without parsing anything, as prjxray.db.Database parses on use.
+
+    Arguments
+    ---------
+    db_root : str
+        Project X-Ray database root.
+    part : str
+        FPGA part.
+
+    """
+    # prjxray is only needed by the xc utilities, import it on use.
+    import prjxray.db
+
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        # Nothing to cache, keep the database lazily parsed.
+        return prjxray.db.Database(db_root, part)
+
+    def load():
+        return parse_database(prjxray.db.Database(db_root, part))
+
+    fingerprint = get_database_fingerprint(
+        db_root, part, os.path.dirname(prjxray.db.__file__)
+    )
+
+    cache_file_name = get_cache_file_name(cache_dir, part, fingerprint)
+    if not os.path.exists(cache_file_name):
+        remove_stale_cache_files(cache_dir, part, cache_file_name)
+
+    return load_cached(cache_file_name, load)
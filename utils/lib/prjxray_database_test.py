@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import os
+import os.path
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from .prjxray_database import (
+    CACHE_DIR_ENV, get_cache_dir, get_cache_file_name,
+    get_database_fingerprint, load_cached, load_database,
+    remove_stale_cache_files
+)
+
+
+class FakeDatabase(object):
+    """ Records which parts of the database were parsed. """
+
+    def __init__(self, db_root, part):
+        self.parsed = []
+
+    def grid(self):
+        self.parsed.append('grid')
+
+    def connections(self):
+        self.parsed.append('connections')
+
+    def get_tile_types(self):
+        return ['INT_L', 'INT_R']
+
+    def get_tile_type(self, tile_type):
+        self.parsed.append(tile_type)
+
+
+def fake_prjxray():
+    """ Returns sys.modules entries of a prjxray package with FakeDatabase. """
+    prjxray = types.ModuleType('prjxray')
+    prjxray_db = types.ModuleType('prjxray.db')
+    prjxray_db.Database = FakeDatabase
+    prjxray_db.__file__ = __file__
+    prjxray.db = prjxray_db
+
+    return {'prjxray': prjxray, 'prjxray.db': prjxray_db}
+
+
+class TestPrjxrayDatabaseCache(unittest.TestCase):
+    def test_load_cached(self):
+        loads = []
+
+        def load():
+            loads.append(None)
+            return {'tile_types': ['CLBLL_L', 'INT_L']}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = get_cache_file_name(
+                os.path.join(tmp_dir, 'cache'), 'part', '1234'
+            )
+
+            self.assertEqual(load_cached(fname, load), load())
+            self.assertEqual(len(loads), 2)
+            self.assertTrue(os.path.exists(fname))
+
+            self.assertEqual(load_cached(fname, load), load())
+            self.assertEqual(len(loads), 3)
+
+            # Unreadable cache files are replaced.
+            with open(fname, 'wb') as f:
+                f.write(b'garbage')
+            self.assertEqual(load_cached(fname, load), load())
+            self.assertEqual(len(loads), 5)
+            self.assertEqual(load_cached(fname, load), load())
+            self.assertEqual(len(loads), 6)
+
+            self.assertEqual(
+                os.listdir(os.path.dirname(fname)), [os.path.basename(fname)]
+            )
+
+    def test_load_cached_diagnostics(self):
+        def load():
+            return [1, 2, 3]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # A cache directory below a regular file cannot be created.
+            not_a_dir = os.path.join(tmp_dir, 'file')
+            with open(not_a_dir, 'w'):
+                pass
+            unwritable = get_cache_file_name(not_a_dir, 'part', '1234')
+
+            unreadable = get_cache_file_name(tmp_dir, 'part', '1234')
+            with open(unreadable, 'wb') as f:
+                f.write(b'garbage')
+
+            for fname in (unwritable, unreadable):
+                stdout = io.StringIO()
+                stderr = io.StringIO()
+                with contextlib.redirect_stdout(stdout), \
+                        contextlib.redirect_stderr(stderr):
+                    self.assertEqual(load_cached(fname, load), load())
+
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertIn(fname, stderr.getvalue())
+
+    def test_remove_stale_cache_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            names = [
+                get_cache_file_name(tmp_dir, part, fingerprint)
+                for part, fingerprint in (
+                    ('part', '1234'),
+                    ('part', '5678'),
+                    ('other_part', '1234'),
+                )
+            ]
+            for name in names:
+                with open(name, 'wb'):
+                    pass
+
+            remove_stale_cache_files(tmp_dir, 'part', names[1])
+            self.assertEqual(
+                sorted(os.listdir(tmp_dir)),
+                sorted(os.path.basename(name) for name in names[1:])
+            )
+
+    def test_fingerprint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.mkdir(os.path.join(tmp_dir, 'part'))
+            tilegrid = os.path.join(tmp_dir, 'part', 'tilegrid.json')
+            with open(tilegrid, 'w') as f:
+                f.write('{}')
+
+            fingerprint = get_database_fingerprint(tmp_dir, 'part', tmp_dir)
+            self.assertEqual(
+                get_database_fingerprint(tmp_dir, 'part', tmp_dir), fingerprint
+            )
+
+            with open(tilegrid, 'w') as f:
+                f.write('{"TILE": {}}')
+            self.assertNotEqual(
+                get_database_fingerprint(tmp_dir, 'part', tmp_dir), fingerprint
+            )
+
+    def test_cache_dir(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop(CACHE_DIR_ENV, None)
+            self.assertIsNone(get_cache_dir())
+
+        with mock.patch.dict(os.environ, {CACHE_DIR_ENV: ''}):
+            self.assertIsNone(get_cache_dir())
+
+        with mock.patch.dict(os.environ, {CACHE_DIR_ENV: 'cache'}):
+            self.assertEqual(get_cache_dir(), 'cache')
+
+    def test_load_database(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.dict(sys.modules, fake_prjxray()), \
+                mock.patch.dict(os.environ):
+            # Without a cache, the database is parsed on use.
+            os.environ.pop(CACHE_DIR_ENV, None)
+            db = load_database(tmp_dir, 'part')
+            self.assertEqual(db.parsed, [])
+
+            # A cached database is parsed before it is written.
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            os.environ[CACHE_DIR_ENV] = cache_dir
+            db = load_database(tmp_dir, 'part')
+            self.assertEqual(
+                db.parsed, ['grid', 'connections', 'INT_L', 'INT_R']
+            )
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
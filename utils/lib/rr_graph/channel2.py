@@ -5,6 +5,7 @@ an excessive number of dummy tracks to fill empty space (channel.Channel = >2M
 versus channel2.Channel ~70k).
 
 """
+import bisect
 
 
 class Channel(object):
@@ -72,58 +73,70 @@ class Channel(object):
             of python lists is O(1).
          2. Create stack for each starting values, inserting in length order.
          3. Starting with the lowest starting value, greedly pack tracks
-            Algorithm weaknesses:
-             - Linear scan for lowest starting value
-             - Linear scan for packing
-
-            Both weaknesses are O(Number grid dim * Number of tracks) in
-            pathological case, however grid dimensions tend to be fairly small,
-            (e.g. 50T is 150), so scans are practically fast.
-
-            If the grid dimension size grows large, revisit how to find the
-            lowest starting value and next bucket pack.  Relevant operation is
-            given coordinate, find next largest non-empty bucket.
          3a. Pop largest track from smallest starting value, creating a new
              channel
          3b. Pop largest track starting from end of previous track until no
              tracks can follow.
          3c. Repeat 3 until everything is packed.
 
+        Finding the next non-empty starting value at or after a coordinate is
+        a binary search over the sorted starting values, followed by a lookup
+        in a disjoint set forest that skips over emptied stacks.  Packing is
+        O(N log N) in the number of tracks, independent of the grid
+        dimension.
+
         """
 
         by_low = {}
-
-        def pop(low):
-            track = by_low[low].pop()
-
-            if len(by_low[low]) == 0:
-                del by_low[low]
-
-            return track
-
         for low, high, key in self.tracks:
             if low not in by_low:
                 by_low[low] = []
 
             by_low[low].append((high, key))
 
-        if len(by_low) > 0:
-            high = max(by_low)
+        lows = sorted(by_low)
+        stacks = [by_low[low] for low in lows]
+
+        # next_stack[idx] == idx if stacks[idx] is not empty, otherwise it
+        # points towards the next non-empty stack.  len(lows) is a sentinel
+        # for no more stacks.
+        next_stack = list(range(len(lows) + 1))
+
+        def find(idx):
+            """ Returns index of the first non-empty stack at or after idx. """
+            root = idx
+            while next_stack[root] != root:
+                root = next_stack[root]
+
+            while next_stack[idx] != root:
+                next_idx = next_stack[idx]
+                next_stack[idx] = root
+                idx = next_idx
+
+            return root
+
+        def pop(idx):
+            track = stacks[idx].pop()
+
+            if len(stacks[idx]) == 0:
+                next_stack[idx] = idx + 1
+
+            return track
+
+        idx = find(0)
+        while idx < len(lows):
+            track_high, key = pop(idx)
+            self._start_track((lows[idx], track_high, key))
 
-        while len(by_low) > 0:
-            track_low = min(by_low)
-            track_high, key = pop(track_low)
+            while True:
+                idx = find(bisect.bisect_left(lows, track_high + 1))
+                if idx == len(lows):
+                    break
 
-            self._start_track((track_low, track_high, key))
+                track_high, key = pop(idx)
+                self._add_track_to_tree((lows[idx], track_high, key))
 
-            while track_high is not None:
-                start = track_high + 1
-                track_high = None
-                for track_low in range(start, high + 1):
-                    if track_low in by_low:
-                        track_high, key = pop(track_low)
-                        self._add_track_to_tree((track_low, track_high, key))
-                        break
+            idx = find(0)
 
         self._verify_trees()
 
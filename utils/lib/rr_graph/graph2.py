@@ -3,9 +3,11 @@ and provides simple fast lookup required to build real FPGA rr graph fabrics.
 """
 
 from __future__ import print_function
+import array
 from collections import namedtuple
 from enum import Enum
-from .tracks import Track
+import numpy as np
+from .tracks import Track, Direction
 from lib.rr_graph import channel2
 from lib import progressbar_utils
 
@@ -154,6 +156,266 @@ class Edge(namedtuple('Edge', 'src_node sink_node switch_id metadata')):
     """
 
 
+class EdgeArrays(object):
+    """ Compact columnar storage for a large list of edges.
+
+    Edges are stored as parallel integer arrays of source node, sink node and
+    switch id, plus an index into a table of unique metadata tuples.  Iterating
+    yields the (src_node, sink_node, switch_id, metadata) tuples accepted by
+    the serialization classes.
+
+    The numpy views returned by src_nodes() etc share memory with the
+    underlying arrays, so edges cannot be appended while a view is alive.
+
+    >>> edges = EdgeArrays()
+    >>> edges.append(0, 1, 2)
+    >>> edges.append(1, 2, 2, (('fasm_features', 'A.B'), ))
+    >>> len(edges)
+    2
+    >>> list(edges)
+    [(0, 1, 2, ()), (1, 2, 2, (('fasm_features', 'A.B'),))]
+    >>> edges.sink_nodes().tolist()
+    [1, 2]
+
+    """
+
+    def __init__(self):
+        self.src_node = array.array('i')
+        self.sink_node = array.array('i')
+        self.switch_id = array.array('i')
+        self.metadata_id = array.array('i')
+
+        # Metadata index 0 is always "no metadata".
+        self.metadata = [()]
+        self.metadata_map = {(): 0}
+
+    def append(self, src_node, sink_node, switch_id, metadata=()):
+        """ Append edge.  metadata is a tuple of (name, value) tuples. """
+        if metadata is None:
+            metadata = ()
+
+        metadata_id = self.metadata_map.get(metadata)
+        if metadata_id is None:
+            metadata_id = len(self.metadata)
+            self.metadata.append(metadata)
+            self.metadata_map[metadata] = metadata_id
+
+        self.src_node.append(src_node)
+        self.sink_node.append(sink_node)
+        self.switch_id.append(switch_id)
+        self.metadata_id.append(metadata_id)
+
+    def __len__(self):
+        return len(self.src_node)
+
+    def __iter__(self):
+        metadata = self.metadata
+        for src_node, sink_node, switch_id, metadata_id in zip(
+                self.src_node, self.sink_node, self.switch_id,
+                self.metadata_id):
+            yield src_node, sink_node, switch_id, metadata[metadata_id]
+
+    def src_nodes(self):
+        """ Returns source nodes as a numpy array, without copying. """
+        return np.frombuffer(self.src_node, dtype=np.int32)
+
+    def sink_nodes(self):
+        """ Returns sink nodes as a numpy array, without copying. """
+        return np.frombuffer(self.sink_node, dtype=np.int32)
+
+    def switch_ids(self):
+        """ Returns switch ids as a numpy array, without copying. """
+        return np.frombuffer(self.switch_id, dtype=np.int32)
+
+    def metadata_ids(self):
+        """ Returns indices into self.metadata as a numpy array, without copying. """
+        return np.frombuffer(self.metadata_id, dtype=np.int32)
+
+
+class NodeArrays(object):
+    """ Compact columnar storage for a large list of nodes.
+
+    Each field of Node is stored as a parallel array, with node metadata as an
+    index into a table of unique metadata tuples.  Indexing and iterating
+    yield Node tuples, so NodeArrays can be used in place of a list of Node
+    for reading, appending and replacing nodes.  set_ptc updates a node in
+    place.
+
+    Enum fields store the enum value, or -1 for None.  ptc and segment_id
+    store NONE for None.  Nodes without timing store NaN as r and c.
+
+    The numpy views returned by column() share memory with the underlying
+    arrays, so nodes cannot be appended while a view is alive.
+
+    >>> nodes = NodeArrays()
+    >>> nodes.append(Node(
+    ...     id=0, type=NodeType.CHANX, direction=NodeDirection.INC_DIR,
+    ...     capacity=1,
+    ...     loc=NodeLoc(x_low=1, y_low=2, x_high=3, y_high=2, side=None,
+    ...                 ptc=None),
+    ...     timing=NodeTiming(r=1.0, c=2.0), metadata=None,
+    ...     segment=NodeSegment(segment_id=0)))
+    >>> nodes.set_ptc(0, 4)
+    >>> nodes[0].loc
+    NodeLoc(x_low=1, y_low=2, x_high=3, y_high=2, side=None, ptc=4)
+    >>> nodes.column('x_high').tolist()
+    [3]
+
+    """
+
+    # Value of ptc and segment_id columns for None.
+    NONE = -2**31
+
+    INT_COLUMNS = (
+        'id', 'capacity', 'x_low', 'y_low', 'x_high', 'y_high', 'ptc',
+        'segment_id', 'metadata_id'
+    )
+    ENUM_COLUMNS = ('type', 'direction', 'side')
+    FLOAT_COLUMNS = ('r', 'c')
+
+    def __init__(self, nodes=()):
+        self.columns = {}
+        for name in self.INT_COLUMNS:
+            self.columns[name] = array.array('i')
+        for name in self.ENUM_COLUMNS:
+            self.columns[name] = array.array('b')
+        for name in self.FLOAT_COLUMNS:
+            self.columns[name] = array.array('d')
+
+        # Metadata index 0 is always "no metadata".
+        self.metadata = [None]
+        self.metadata_map = {None: 0}
+
+        for node in nodes:
+            self.append(node)
+
+    def _encode(self, node):
+        """ Returns dictionary of column values of node. """
+        if node.metadata is None:
+            metadata = None
+        else:
+            metadata = tuple(node.metadata)
+
+        metadata_id = self.metadata_map.get(metadata)
+        if metadata_id is None:
+            metadata_id = len(self.metadata)
+            self.metadata.append(metadata)
+            self.metadata_map[metadata] = metadata_id
+
+        loc = node.loc
+        timing = node.timing
+
+        return {
+            'id':
+                node.id,
+            'type':
+                node.type.value,
+            'direction':
+                node.direction.value if node.direction is not None else -1,
+            'capacity':
+                node.capacity,
+            'x_low':
+                loc.x_low,
+            'y_low':
+                loc.y_low,
+            'x_high':
+                loc.x_high,
+            'y_high':
+                loc.y_high,
+            'side':
+                loc.side.value if loc.side is not None else -1,
+            'ptc':
+                loc.ptc if loc.ptc is not None else self.NONE,
+            'r':
+                timing.r if timing is not None else float('nan'),
+            'c':
+                timing.c if timing is not None else float('nan'),
+            'segment_id':
+                node.segment.segment_id
+                if node.segment is not None else self.NONE,
+            'metadata_id':
+                metadata_id,
+        }
+
+    def append(self, node):
+        """ Append Node. """
+        for name, value in self._encode(node).items():
+            self.columns[name].append(value)
+
+    def extend(self, nodes):
+        """ Append iterable of Node. """
+        for node in nodes:
+            self.append(node)
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, idx):
+        """ Returns Node at idx.  Slices are not supported. """
+        c = self.columns
+
+        direction = c['direction'][idx]
+        side = c['side'][idx]
+        ptc = c['ptc'][idx]
+        r = c['r'][idx]
+        segment_id = c['segment_id'][idx]
+        metadata = self.metadata[c['metadata_id'][idx]]
+
+        return Node(
+            id=c['id'][idx],
+            type=NodeType(c['type'][idx]),
+            direction=NodeDirection(direction) if direction != -1 else None,
+            capacity=c['capacity'][idx],
+            loc=NodeLoc(
+                x_low=c['x_low'][idx],
+                y_low=c['y_low'][idx],
+                x_high=c['x_high'][idx],
+                y_high=c['y_high'][idx],
+                side=Direction(side) if side != -1 else None,
+                ptc=ptc if ptc != self.NONE else None,
+            ),
+            timing=NodeTiming(r=r, c=c['c'][idx]) if r == r else None,
+            metadata=list(metadata) if metadata is not None else None,
+            segment=NodeSegment(segment_id=segment_id)
+            if segment_id != self.NONE else None,
+        )
+
+    def __setitem__(self, idx, node):
+        """ Replace Node at idx. """
+        for name, value in self._encode(node).items():
+            self.columns[name][idx] = value
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def set_ptc(self, idx, ptc):
+        """ Set ptc of node at idx, which must not have a ptc yet. """
+        ptc_column = self.columns['ptc']
+        assert ptc_column[idx] == self.NONE, (idx, ptc_column[idx])
+        ptc_column[idx] = ptc
+
+    def sort_by_id(self):
+        """ Sort nodes by id, keeping the order of nodes with the same id. """
+        ids = self.column('id')
+        if np.all(ids[1:] >= ids[:-1]):
+            return
+
+        order = np.argsort(ids, kind='stable')
+        del ids
+
+        for name, values in self.columns.items():
+            self.columns[name] = array.array(
+                values.typecode,
+                np.frombuffer(values, dtype=values.typecode)[order].tobytes()
+            )
+
+    def column(self, name):
+        """ Returns column as a numpy array, without copying. """
+        values = self.columns[name]
+        return np.frombuffer(values, dtype=values.typecode)
+
+
 class GraphInput(namedtuple('GraphInput',
                             'switches segments block_types grid')):
     """Top level encapsulation of input Graph
@@ -212,8 +474,11 @@ class Graph(object):
         self.grid = grid
 
         self.tracks = []
-        self.nodes = nodes
-        self.nodes.sort(key=lambda node: node.id)
+        if isinstance(nodes, NodeArrays):
+            self.nodes = nodes
+        else:
+            self.nodes = NodeArrays(nodes)
+        self.nodes.sort_by_id()
         self.edges = edges if edges is not None else []
 
         # Map of (x, y) to GridLoc definitions.
@@ -477,17 +742,13 @@ class Graph(object):
         return switch.id
 
     def check_ptc(self):
-        for node in self.nodes:
-            assert node.loc.ptc is not None, node
+        missing_ptc = np.flatnonzero(
+            self.nodes.column('ptc') == NodeArrays.NONE
+        )
+        assert len(missing_ptc) == 0, self.nodes[int(missing_ptc[0])]
 
     def set_track_ptc(self, track, ptc):
-        node_d = self.nodes[track]._asdict()
-        loc_d = self.nodes[track].loc._asdict()
-        assert loc_d['ptc'] is None
-        loc_d['ptc'] = ptc
-        node_d['loc'] = NodeLoc(**loc_d)
-
-        self.nodes[track] = Node(**node_d)
+        self.nodes.set_ptc(track, ptc)
 
     def create_channels(self, pad_segment, pool=None):
         """ Pack tracks into channels and return Channels definition for tracks."""
@@ -637,4 +898,4 @@ class Graph(object):
         return self.switch_name_map[switch_name]
 
     def sort_nodes(self):
-        self.nodes.sort(key=lambda node: node.id)
+        self.nodes.sort_by_id()
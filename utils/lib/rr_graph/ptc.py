@@ -0,0 +1,174 @@
+""" Validation of ptc numbers of CHANX and CHANY nodes.
+
+Within a channel (CHANX nodes of one row, or CHANY nodes of one column) ptc
+numbers identify the track at each coordinate, so nodes with the same ptc must
+not overlap.  VPR fails to load an rr graph violating this.  Optionally ptc
+numbers are also dense: at every coordinate they run from 0 to the number of
+nodes - 1.
+
+Nodes are given as arrays of (node type, channel, low, high, ptc), the checks
+sort them once and sweep along each channel, instead of visiting every
+coordinate each node covers.
+"""
+import numpy as np
+
+from lib.rr_graph import graph2
+
+
+def chan_intervals(node_type, x_low, y_low, x_high, y_high):
+    """ Returns (channel, low, high) arrays of CHANX and CHANY nodes.
+
+    The channel of a CHANX node is its y coordinate and it spans x_low to
+    x_high.  The channel of a CHANY node is its x coordinate and it spans y_low
+    to y_high.
+
+    Arguments
+    ---------
+    node_type : numpy array
+        graph2.NodeType values of the nodes, CHANX or CHANY.
+    x_low, y_low, x_high, y_high : numpy arrays
+        Locations of the nodes.
+
+    >>> chan_types = [graph2.NodeType.CHANX.value, graph2.NodeType.CHANY.value]
+    >>> channel, low, high = chan_intervals(
+    ...     np.array(chan_types),
+    ...     np.array([1, 4]), np.array([2, 5]), np.array([3, 4]),
+    ...     np.array([2, 7]))
+    >>> channel.tolist(), low.tolist(), high.tolist()
+    ([2, 4], [1, 5], [3, 7])
+
+    """
+    is_chanx = node_type == graph2.NodeType.CHANX.value
+    assert np.all(
+        is_chanx | (node_type == graph2.NodeType.CHANY.value)
+    ), "Only CHANX and CHANY nodes have channels"
+
+    channel = np.where(is_chanx, y_low, x_low)
+    assert np.array_equal(channel, np.where(is_chanx, y_high, x_high)), \
+        "CHANX nodes must span one row and CHANY nodes one column"
+
+    low = np.where(is_chanx, x_low, y_low)
+    high = np.where(is_chanx, x_high, y_high)
+    assert np.all(low <= high)
+
+    return channel, low, high
+
+
+def find_ptc_overlaps(node_type, channel, low, high, ptc):
+    """ Returns pairs of nodes using the same ptc at the same coordinates.
+
+    Arguments
+    ---------
+    node_type, channel, low, high, ptc : numpy arrays
+        Nodes, see chan_intervals for channel, low and high.
+
+    Returns
+    -------
+    List of (index, index) of overlapping nodes.  Each node overlapping an
+    earlier node (ordered by low) is reported once.
+
+    >>> find_ptc_overlaps(
+    ...     np.array([1, 1, 1, 2]), np.array([0, 0, 0, 0]),
+    ...     np.array([0, 2, 3, 1]), np.array([2, 5, 4, 1]),
+    ...     np.array([0, 0, 0, 0]))
+    [(0, 1), (1, 2)]
+
+    """
+    if len(ptc) == 0:
+        return []
+
+    order = np.lexsort((low, ptc, channel, node_type))
+    low = low[order].astype(np.int64)
+    high = high[order].astype(np.int64)
+
+    # Nodes with the same type, channel and ptc form a group.
+    same_group = np.zeros(len(order), dtype=bool)
+    same_group[1:] = True
+    for key in (node_type, channel, ptc):
+        key = key[order]
+        same_group[1:] &= key[1:] == key[:-1]
+    group = np.cumsum(~same_group) - 1
+
+    # Running maximum of high within each group.  Offsetting each group above
+    # all earlier ones keeps the running maximum from crossing groups.
+    offset = low.min()
+    span = high.max() - offset + 1
+    max_high = np.maximum.accumulate(group * span + high - offset)
+    max_high = max_high - group * span + offset
+
+    overlaps = np.flatnonzero(same_group[1:] & (low[1:] <= max_high[:-1])) + 1
+
+    pairs = []
+    for idx in overlaps.tolist():
+        other = idx - 1
+        while high[other] < low[idx]:
+            other -= 1
+        pairs.append((int(order[other]), int(order[idx])))
+
+    return pairs
+
+
+def find_ptc_gaps(node_type, channel, low, high, ptc):
+    """ Returns spans of channels where ptcs do not run from 0 to n - 1.
+
+    The nodes must not overlap, see find_ptc_overlaps.
+
+    Arguments
+    ---------
+    node_type, channel, low, high, ptc : numpy arrays
+        Nodes, see chan_intervals for channel, low and high.
+
+    Returns
+    -------
+    List of (node type, channel, low, high) of the spans.
+
+    >>> find_ptc_gaps(
+    ...     np.array([1, 1, 1]), np.array([0, 0, 0]),
+    ...     np.array([0, 2, 0]), np.array([3, 5, 1]),
+    ...     np.array([0, 1, 1]))
+    [(1, 0, 4, 5)]
+
+    """
+    if len(ptc) == 0:
+        return []
+
+    assert np.all(ptc >= 0)
+    ptc = ptc.astype(np.int64)
+
+    # Each node adds itself, and its ptc, to the coordinates from its low to
+    # its high.  With no duplicate ptcs, the n ptcs at a coordinate run from
+    # 0 to n - 1 exactly when they sum to n * (n - 1) / 2.
+    event_type = np.concatenate((node_type, node_type))
+    event_channel = np.concatenate((channel, channel))
+    event_coord = np.concatenate((low, high + 1)).astype(np.int64)
+    event_count = np.repeat(np.array([1, -1], dtype=np.int64), len(ptc))
+    event_ptc = np.concatenate((ptc, -ptc))
+
+    order = np.lexsort((event_coord, event_channel, event_type))
+    event_type = event_type[order]
+    event_channel = event_channel[order]
+    event_coord = event_coord[order]
+    count = np.cumsum(event_count[order])
+    ptc_sum = np.cumsum(event_ptc[order])
+
+    # The state after the last event at a coordinate holds up to the next
+    # event of the channel.  Channels end with no nodes, so a span with nodes
+    # is always followed by an event of the same channel.
+    same_as_next = np.zeros(len(order), dtype=bool)
+    same_as_next[:-1] = True
+    for key in (event_type, event_channel, event_coord):
+        same_as_next[:-1] &= key[1:] == key[:-1]
+    is_last = ~same_as_next
+
+    bad = np.flatnonzero(
+        is_last & (count > 0) & (ptc_sum != count * (count - 1) // 2)
+    )
+
+    return [
+        (
+            int(event_type[idx]),
+            int(event_channel[idx]),
+            int(event_coord[idx]),
+            int(event_coord[idx + 1]) - 1,
+        ) for idx in bad.tolist()
+    ]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Compare channel2.Channel.pack_tracks with the previous linear scan packer.
+
+Random channels are packed with both implementations, the packed trees are
+checked to be identical and the packing times are printed.
+
+Example:
+
+    python3 -m lib.rr_graph.tests.benchmark_channel2 --num_tracks 200000
+"""
+import argparse
+import random
+import time
+
+from ..channel2 import Channel
+
+
+class LinearScanChannel(Channel):
+    """ Channel packed with the previous O(grid dim * tracks) algorithm. """
+
+    def pack_tracks(self):
+        by_low = {}
+
+        def pop(low):
+            track = by_low[low].pop()
+
+            if len(by_low[low]) == 0:
+                del by_low[low]
+
+            return track
+
+        for low, high, key in self.tracks:
+            if low not in by_low:
+                by_low[low] = []
+
+            by_low[low].append((high, key))
+
+        if len(by_low) > 0:
+            high = max(by_low)
+
+        while len(by_low) > 0:
+            track_low = min(by_low)
+            track_high, key = pop(track_low)
+
+            self._start_track((track_low, track_high, key))
+
+            while track_high is not None:
+                start = track_high + 1
+                track_high = None
+                for track_low in range(start, high + 1):
+                    if track_low in by_low:
+                        track_high, key = pop(track_low)
+                        self._add_track_to_tree((track_low, track_high, key))
+                        break
+
+        self._verify_trees()
+
+
+def random_tracks(num_tracks, grid_dim, max_length, seed):
+    """ Returns list of num_tracks random (low, high, idx) tracks. """
+    rng = random.Random(seed)
+
+    tracks = []
+    for idx in range(num_tracks):
+        low = rng.randrange(grid_dim)
+        high = min(grid_dim - 1, low + rng.randrange(max_length))
+        tracks.append((low, high, idx))
+
+    return tracks
+
+
+def pack(channel_class, tracks):
+    """ Returns packed trees and packing time in seconds. """
+    channel = channel_class(tracks)
+
+    start = time.time()
+    channel.pack_tracks()
+    return channel.trees, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num_tracks', type=int, default=100000)
+    parser.add_argument('--grid_dim', type=int, default=1000000)
+    parser.add_argument('--max_length', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+
+    tracks = random_tracks(
+        args.num_tracks, args.grid_dim, args.max_length, args.seed
+    )
+
+    linear_trees, linear_time = pack(LinearScanChannel, tracks)
+    trees, packing_time = pack(Channel, tracks)
+
+    assert trees == linear_trees, 'Packed channels differ!'
+
+    print('Packed {} tracks into {} ptc\'s'.format(len(tracks), len(trees)))
+    print('Linear scan {:8.2f} s'.format(linear_time))
+    print('Channel     {:8.2f} s'.format(packing_time))
+    print('Speedup     {:8.2f} x'.format(linear_time / packing_time))
+
+
+if __name__ == '__main__':
+    main()
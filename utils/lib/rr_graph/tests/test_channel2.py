@@ -1,6 +1,7 @@
 import unittest
 
 from ..channel2 import Channel
+from .benchmark_channel2 import LinearScanChannel, random_tracks
 
 
 class ChannelTests(unittest.TestCase):
@@ -21,3 +22,22 @@ class ChannelTests(unittest.TestCase):
             [xx for xx in self.channel.trees[1]], [(1, 2, 0), (3, 5, 2)]
         )
         self.assertEqual([xx for xx in self.channel.trees[0]], [(1, 3, 1)])
+
+    def test_pack_matches_linear_scan(self):
+        for seed in range(20):
+            tracks = random_tracks(
+                num_tracks=500, grid_dim=50, max_length=10, seed=seed
+            )
+
+            channel = Channel(tracks)
+            channel.pack_tracks()
+
+            linear_channel = LinearScanChannel(tracks)
+            linear_channel.pack_tracks()
+
+            self.assertEqual(channel.trees, linear_channel.trees)
+
+    def test_pack_empty(self):
+        channel = Channel([])
+        channel.pack_tracks()
+        self.assertEqual(channel.trees, [])
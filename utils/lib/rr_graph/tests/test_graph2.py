@@ -5,7 +5,7 @@ from copy import deepcopy
 from ..graph2 import SwitchTiming, SwitchSizing, Switch, SwitchType, \
     Graph, SegmentTiming, Segment, PinClass, Pin, PinType, \
     BlockType, GridLoc, NodeTiming, NodeSegment, Node, NodeType, \
-    NodeDirection, NodeLoc
+    NodeDirection, NodeLoc, NodeMetadata, EdgeArrays, NodeArrays
 from ..tracks import Track, Direction
 
 
@@ -377,3 +377,118 @@ class Graph2MediumTests(unittest.TestCase):
 
     def test_create_channels(self):
         pass
+
+
+class EdgeArraysTests(unittest.TestCase):
+    def test_append(self):
+        edges = EdgeArrays()
+        self.assertEqual(len(edges), 0)
+        self.assertEqual(list(edges), [])
+
+        edges.append(0, 1, 2)
+        edges.append(1, 2, 3, None)
+        edges.append(2, 3, 3, (('fasm_features', 'A'), ))
+        edges.append(3, 4, 3, (('fasm_features', 'B'), ))
+        edges.append(4, 5, 3, (('fasm_features', 'A'), ))
+
+        self.assertEqual(len(edges), 5)
+        self.assertEqual(
+            list(edges), [
+                (0, 1, 2, ()),
+                (1, 2, 3, ()),
+                (2, 3, 3, (('fasm_features', 'A'), )),
+                (3, 4, 3, (('fasm_features', 'B'), )),
+                (4, 5, 3, (('fasm_features', 'A'), )),
+            ]
+        )
+
+        # Metadata is interned.
+        self.assertEqual(len(edges.metadata), 3)
+        self.assertEqual(edges.metadata_ids().tolist(), [0, 0, 1, 2, 1])
+
+        self.assertEqual(edges.src_nodes().tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(edges.sink_nodes().tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(edges.switch_ids().tolist(), [2, 3, 3, 3, 3])
+
+
+class NodeArraysTests(unittest.TestCase):
+    def make_node(self, id, ptc=None, side=None, timing=None, metadata=None):
+        return Node(
+            id=id,
+            type=NodeType.CHANX,
+            direction=NodeDirection.INC_DIR,
+            capacity=id + 1,
+            loc=NodeLoc(
+                x_low=id, y_low=2, x_high=id + 3, y_high=2, side=side, ptc=ptc
+            ),
+            timing=timing,
+            metadata=metadata,
+            segment=NodeSegment(segment_id=-1),
+        )
+
+    def test_append(self):
+        nodes = NodeArrays()
+        self.assertEqual(len(nodes), 0)
+        self.assertEqual(list(nodes), [])
+
+        metadata = [
+            NodeMetadata(
+                name='fasm', x_offset=0, y_offset=0, z_offset=0, value='A'
+            )
+        ]
+        expected = [
+            self.make_node(0),
+            self.make_node(
+                1,
+                ptc=3,
+                side=Direction.TOP,
+                timing=NodeTiming(r=1.5, c=2.5),
+                metadata=metadata
+            ),
+            self.make_node(2, metadata=list(metadata)),
+            self.make_node(3, metadata=[]),
+            Node(
+                id=4,
+                type=NodeType.IPIN,
+                direction=None,
+                capacity=1,
+                loc=NodeLoc(
+                    x_low=0, y_low=0, x_high=0, y_high=0, side=None, ptc=0
+                ),
+                timing=None,
+                metadata=None,
+                segment=None,
+            ),
+        ]
+        nodes.extend(expected)
+
+        self.assertEqual(len(nodes), len(expected))
+        self.assertEqual(list(nodes), expected)
+        self.assertEqual(nodes[-1], expected[-1])
+
+        # Metadata is interned.
+        self.assertEqual(len(nodes.metadata), 3)
+        self.assertEqual(nodes.column('metadata_id').tolist(), [0, 1, 1, 2, 0])
+
+        self.assertEqual(nodes.column('x_high').tolist(), [3, 4, 5, 6, 0])
+        self.assertEqual(nodes.column('side').tolist(), [-1, 3, -1, -1, -1])
+
+    def test_set_ptc(self):
+        nodes = NodeArrays([self.make_node(0), self.make_node(1)])
+
+        nodes.set_ptc(1, 5)
+        self.assertEqual(nodes[0], self.make_node(0))
+        self.assertEqual(nodes[1], self.make_node(1, ptc=5))
+
+        with self.assertRaises(AssertionError):
+            nodes.set_ptc(1, 6)
+
+        nodes[1] = self.make_node(1, ptc=7)
+        self.assertEqual(nodes[1].loc.ptc, 7)
+
+    def test_sort_by_id(self):
+        expected = [self.make_node(idx, ptc=idx) for idx in range(5)]
+        nodes = NodeArrays([expected[idx] for idx in [3, 0, 4, 2, 1]])
+
+        nodes.sort_by_id()
+        self.assertEqual(list(nodes), expected)
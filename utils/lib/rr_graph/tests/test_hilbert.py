@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+from hilbertcurve.hilbertcurve import HilbertCurve
+
+from ..hilbert import NodeRemap, hilbert_distance, hilbert_order
+
+
+class HilbertTests(unittest.TestCase):
+    def test_matches_hilbertcurve(self):
+        for p in range(1, 6):
+            curve = HilbertCurve(p, 2)
+            xs, ys = np.meshgrid(np.arange(1 << p), np.arange(1 << p))
+            xs = xs.ravel()
+            ys = ys.ravel()
+
+            expected = [
+                curve.distance_from_coordinates([int(x), int(y)])
+                for x, y in zip(xs, ys)
+            ]
+            self.assertEqual(list(hilbert_distance(xs, ys, p)), expected)
+
+    def test_order_is_stable(self):
+        x = [3, 0, 3, 0, 1]
+        y = [0, 0, 0, 0, 0]
+        self.assertEqual(list(hilbert_order(x, y, 2)), [1, 3, 4, 0, 2])
+
+        # Distances of large grids leave no room to also encode the input
+        # position in a 64-bit key.
+        rand = np.random.RandomState(0)
+        p = 30
+        x = rand.randint(0, 1 << p, size=50).repeat(20)
+        y = rand.randint(0, 1 << p, size=50).repeat(20)
+        h = hilbert_distance(x, y, p)
+        self.assertEqual(
+            list(hilbert_order(x, y, p)),
+            sorted(range(len(x)), key=lambda idx: h[idx])
+        )
+
+    def test_node_remap(self):
+        remap = NodeRemap.from_order([3, 1, 0, 2])
+        self.assertEqual([remap(idx) for idx in range(4)], [2, 1, 3, 0])
+        self.assertEqual(list(remap[np.array([0, 3])]), [2, 0])
@@ -0,0 +1,104 @@
+import random
+import unittest
+
+import numpy as np
+
+from ..graph2 import NodeType
+from ..ptc import chan_intervals, find_ptc_overlaps, find_ptc_gaps
+
+
+def random_nodes(seed, num_nodes):
+    rand = random.Random(seed)
+
+    nodes = []
+    for _ in range(num_nodes):
+        node_type = rand.choice([NodeType.CHANX.value, NodeType.CHANY.value])
+        channel = rand.randrange(3)
+        low = rand.randrange(10)
+        high = low + rand.randrange(4)
+        ptc = rand.randrange(4)
+        nodes.append((node_type, channel, low, high, ptc))
+
+    return [np.array(column) for column in zip(*nodes)]
+
+
+def ptcs_by_coordinate(node_type, channel, low, high, ptc):
+    ptcs = {}
+    for idx in range(len(ptc)):
+        for coord in range(low[idx], high[idx] + 1):
+            key = (node_type[idx], channel[idx], coord)
+            ptcs.setdefault(key, []).append(ptc[idx])
+
+    return ptcs
+
+
+class PtcTests(unittest.TestCase):
+    def test_chan_intervals(self):
+        node_type = np.array([NodeType.CHANX.value, NodeType.CHANY.value])
+
+        channel, low, high = chan_intervals(
+            node_type, np.array([1, 4]), np.array([2, 5]), np.array([3, 4]),
+            np.array([2, 7])
+        )
+        self.assertEqual(channel.tolist(), [2, 4])
+        self.assertEqual(low.tolist(), [1, 5])
+        self.assertEqual(high.tolist(), [3, 7])
+
+        with self.assertRaises(AssertionError):
+            chan_intervals(
+                node_type, np.array([1, 4]), np.array([2, 5]),
+                np.array([3, 4]), np.array([3, 7])
+            )
+
+        with self.assertRaises(AssertionError):
+            chan_intervals(
+                np.array([NodeType.SINK.value]), np.array([1]), np.array([1]),
+                np.array([1]), np.array([1])
+            )
+
+    def test_empty(self):
+        empty = np.zeros(0, dtype=np.int64)
+        self.assertEqual(find_ptc_overlaps(*[empty] * 5), [])
+        self.assertEqual(find_ptc_gaps(*[empty] * 5), [])
+
+    def test_find_ptc_overlaps(self):
+        for seed in range(20):
+            nodes = random_nodes(seed, 30)
+            node_type, channel, low, high, ptc = nodes
+
+            pairs = find_ptc_overlaps(*nodes)
+
+            for a, b in pairs:
+                self.assertEqual(node_type[a], node_type[b])
+                self.assertEqual(channel[a], channel[b])
+                self.assertEqual(ptc[a], ptc[b])
+                self.assertLessEqual(
+                    max(low[a], low[b]), min(high[a], high[b])
+                )
+
+            has_duplicates = any(
+                len(ptcs) != len(set(ptcs))
+                for ptcs in ptcs_by_coordinate(*nodes).values()
+            )
+            self.assertEqual(len(pairs) > 0, has_duplicates)
+
+    def test_find_ptc_gaps(self):
+        for seed in range(20):
+            nodes = random_nodes(seed, 30)
+
+            # Keep the first of overlapping nodes.
+            drop = set(b for _, b in find_ptc_overlaps(*nodes))
+            keep = [idx for idx in range(len(nodes[0])) if idx not in drop]
+            nodes = [column[keep] for column in nodes]
+
+            bad = set()
+            for key, ptcs in ptcs_by_coordinate(*nodes).items():
+                if sorted(ptcs) != list(range(len(ptcs))):
+                    bad.add(key)
+
+            found = set()
+            for node_type, channel, low, high in find_ptc_gaps(*nodes):
+                for coord in range(low, high + 1):
+                    found.add((node_type, channel, coord))
+
+            self.assertEqual(found, bad)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+""" Compare graph_arrays_from_capnp with graph_from_capnp.
+
+A synthetic rr graph is written with Graph.serialize_to_capnp and
+Graph.serialize_to_capnp_bulk, and as a packed message.  The first file is
+read with graph_from_capnp, each file is read with graph_arrays_from_capnp,
+and the node and edge columns are compared.
+
+Example:
+
+    python3 -m lib.rr_graph_capnp.benchmark_bulk_reader \\
+        --vpr_capnp_schema_dir env/conda/envs/symbiflow_arch_def_base/capnp
+"""
+import argparse
+import os.path
+import random
+import tempfile
+import time
+
+import capnp
+import numpy
+
+from lib.rr_graph_capnp import bulk_writer
+from lib.rr_graph_capnp import graph2 as capnp_graph2
+from lib.rr_graph_capnp.benchmark_bulk_writer import (
+    build_graph, write_input_graph
+)
+
+capnp.remove_import_hook()
+
+
+def write_packed(rr_graph_schema, input_file_name, output_file_name):
+    """ Write a packed copy of an rr graph file. """
+    with open(input_file_name, 'rb') as f:
+        rr_graph = rr_graph_schema.RrGraph.read(
+            f, traversal_limit_in_words=2**63 - 1
+        )
+        data = rr_graph.as_builder().to_bytes_packed()
+
+    with open(output_file_name, 'wb') as f:
+        f.write(data)
+
+
+def read_objects(rr_graph_schema, file_name):
+    """ Returns node and edge columns read with graph_from_capnp. """
+    graph = capnp_graph2.graph_from_capnp(
+        rr_graph_schema,
+        file_name,
+        filter_nodes=False,
+        load_edges=True,
+    )
+
+    columns, _, _ = bulk_writer.node_columns(graph['nodes'])
+    edges = numpy.array(
+        [(e.src_node, e.sink_node, e.switch_id) for e in graph['edges']],
+        dtype=numpy.int64
+    ).reshape(-1, 3)
+
+    return columns, edges
+
+
+def read_arrays(rr_graph_schema, file_name, packed):
+    """ Returns node and edge columns read with graph_arrays_from_capnp. """
+    nodes, edges = capnp_graph2.graph_arrays_from_capnp(
+        rr_graph_schema, file_name, packed=packed
+    )
+
+    columns = nodes.all_columns()
+    edges = numpy.stack(
+        (edges.src_nodes(), edges.sink_nodes(), edges.switch_ids()), axis=1
+    ).astype(numpy.int64)
+
+    return columns, edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--vpr_capnp_schema_dir',
+        required=True,
+        help='Directory container VPR schema files',
+    )
+    parser.add_argument('--width', type=int, default=100)
+    parser.add_argument('--height', type=int, default=100)
+    parser.add_argument('--num_tracks', type=int, default=200000)
+    parser.add_argument('--num_edges', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    numpy.random.seed(args.seed)
+
+    schema_file = os.path.join(
+        args.vpr_capnp_schema_dir, 'rr_graph_uxsdcxx.capnp'
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, 'input.bin')
+        serial_file = os.path.join(tmp_dir, 'serial.bin')
+        bulk_file = os.path.join(tmp_dir, 'bulk.bin')
+        packed_file = os.path.join(tmp_dir, 'packed.bin')
+
+        rr_graph_schema = capnp.load(
+            schema_file,
+            imports=[os.path.dirname(os.path.dirname(capnp.__file__))]
+        )
+        write_input_graph(rr_graph_schema, input_file, args.width, args.height)
+
+        capnp_graph = capnp_graph2.Graph(
+            rr_graph_schema_fname=schema_file,
+            input_file_name=input_file,
+        )
+
+        channels, edges, node_remap = build_graph(
+            capnp_graph, args.width, args.height, args.num_tracks,
+            args.num_edges
+        )
+        num_nodes = len(capnp_graph.graph.nodes)
+
+        capnp_graph.output_file_name = serial_file
+        capnp_graph.serialize_to_capnp(
+            channels_obj=channels,
+            num_nodes=num_nodes,
+            nodes_obj=capnp_graph.graph.nodes,
+            num_edges=len(edges),
+            edges_obj=edges,
+            node_remap=lambda x: int(node_remap[x]),
+        )
+
+        capnp_graph.output_file_name = bulk_file
+        capnp_graph.serialize_to_capnp_bulk(
+            channels_obj=channels,
+            edges=edges,
+            node_remap=node_remap,
+        )
+
+        write_packed(rr_graph_schema, serial_file, packed_file)
+
+        print('Reading {} nodes and {} edges'.format(num_nodes, len(edges)))
+
+        start = time.time()
+        columns, edge_columns = read_objects(rr_graph_schema, serial_file)
+        objects_time = time.time() - start
+        print('graph_from_capnp              {:8.2f} s'.format(objects_time))
+
+        for file_name, packed in (
+            (serial_file, False),
+            (bulk_file, False),
+            (packed_file, True),
+        ):
+            start = time.time()
+            array_columns, array_edge_columns = read_arrays(
+                rr_graph_schema, file_name, packed
+            )
+            arrays_time = time.time() - start
+
+            for name in bulk_writer.NODE_COLUMNS:
+                assert numpy.array_equal(columns[name], array_columns[name]
+                                         ), (file_name, name)
+            assert numpy.array_equal(edge_columns, array_edge_columns)
+
+            print(
+                'graph_arrays_from_capnp {:6s}{:8.2f} s ({:.2f} x)'.format(
+                    os.path.basename(file_name).split('.')[0], arrays_time,
+                    objects_time / arrays_time
+                )
+            )
+
+        print('Columns match.')
+
+
+if __name__ == '__main__':
+    main()
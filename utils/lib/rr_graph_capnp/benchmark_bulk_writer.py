@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+""" Compare Graph.serialize_to_capnp_bulk with Graph.serialize_to_capnp.
+
+A synthetic rr graph is written with both serialization paths.  The two files
+use a different segment layout, so both are read back and deep copied into a
+fresh message, which lays out the content canonically, and the resulting bytes
+are compared.
+
+Example:
+
+    python3 -m lib.rr_graph_capnp.benchmark_bulk_writer \\
+        --vpr_capnp_schema_dir env/conda/envs/symbiflow_arch_def_base/capnp
+"""
+import argparse
+import os.path
+import random
+import tempfile
+import time
+
+import capnp
+import numpy
+
+from lib.rr_graph import graph2
+from lib.rr_graph import tracks
+from lib.rr_graph_capnp import graph2 as capnp_graph2
+
+capnp.remove_import_hook()
+
+
+def write_input_graph(rr_graph_schema, file_name, width, height):
+    """ Write a minimal input rr graph of width x height single pin tiles. """
+    rr_graph = rr_graph_schema.RrGraph.new_message()
+    rr_graph.toolComment = 'benchmark'
+    rr_graph.toolName = 'benchmark'
+    rr_graph.toolVersion = '0'
+
+    switches = rr_graph.switches.init('switches', 2)
+    for idx, (switch, name) in enumerate(zip(
+            switches, ('__vpr_delayless_switch__', 'mux'))):
+        switch.id = idx
+        switch.name = name
+        switch.type = rr_graph_schema.SwitchType.mux
+
+    segments = rr_graph.segments.init('segments', 1)
+    segments[0].id = 0
+    segments[0].name = 'dummy'
+
+    block_types = rr_graph.blockTypes.init('blockTypes', 1)
+    block_type = block_types[0]
+    block_type.id = 0
+    block_type.name = 'TILE'
+    block_type.width = 1
+    block_type.height = 1
+    pin_classes = block_type.init('pinClasses', 2)
+    pin_types = (rr_graph_schema.PinType.input, rr_graph_schema.PinType.output)
+    for ptc, (pin_class, pin_type,
+              name) in enumerate(zip(pin_classes, pin_types, ('I', 'O'))):
+        pin_class.type = pin_type
+        pins = pin_class.init('pins', 1)
+        pins[0].ptc = ptc
+        pins[0].value = 'TILE.{}[0]'.format(name)
+
+    grid_locs = rr_graph.grid.init('gridLocs', width * height)
+    for idx, grid_loc in enumerate(grid_locs):
+        grid_loc.x = idx % width
+        grid_loc.y = idx // width
+
+    nodes = rr_graph.rrNodes.init('nodes', 4 * width * height)
+    node_types = (
+        (rr_graph_schema.NodeType.sink, 0),
+        (rr_graph_schema.NodeType.source, 1),
+        (rr_graph_schema.NodeType.ipin, 0),
+        (rr_graph_schema.NodeType.opin, 1),
+    )
+    for idx, node in enumerate(nodes):
+        loc_idx, type_idx = divmod(idx, 4)
+        node.id = idx
+        node.type, node.loc.ptc = node_types[type_idx]
+        node.capacity = 1
+        node.loc.xlow = node.loc.xhigh = loc_idx % width
+        node.loc.ylow = node.loc.yhigh = loc_idx // width
+        if type_idx >= 2:
+            node.loc.side = rr_graph_schema.LocSide.left
+
+    with open(file_name, 'wb') as f:
+        rr_graph.write(f)
+
+
+def build_graph(capnp_graph, width, height, num_tracks, num_edges):
+    """ Add random tracks and return (channels, edges, node_remap). """
+    graph = capnp_graph.graph
+
+    for idx in range(num_tracks):
+        direction = 'X' if idx % 2 else 'Y'
+        low = random.randrange(1, width)
+        high = min(width - 1, low + random.randrange(6))
+        chan = random.randrange(1, height)
+        if direction == 'X':
+            track = tracks.Track(direction, low, high, chan, chan)
+        else:
+            track = tracks.Track(direction, chan, chan, low, high)
+
+        graph.add_track(
+            track=track,
+            segment_id=0,
+            ptc=idx % 64,
+            timing=graph2.NodeTiming(r=random.random(), c=random.random()),
+        )
+
+    num_nodes = len(graph.nodes)
+
+    edges = graph2.EdgeArrays()
+    for idx in range(num_edges):
+        if idx % 3:
+            metadata = (
+                (
+                    'fasm_features', 'TILE_X{}Y{}.WIRE{}.WIRE{}'.format(
+                        idx % width, idx % height, idx % 7, idx % 11
+                    )
+                ),
+            )
+        else:
+            metadata = ()
+
+        edges.append(
+            random.randrange(num_nodes), random.randrange(num_nodes),
+            random.randrange(len(graph.switches)), metadata
+        )
+
+    channels = graph2.Channels(
+        chan_width_max=64,
+        x_min=0,
+        y_min=0,
+        x_max=width - 1,
+        y_max=height - 1,
+        x_list=[graph2.ChannelList(idx, 64) for idx in range(height)],
+        y_list=[graph2.ChannelList(idx, 64) for idx in range(width)],
+    )
+
+    node_remap = numpy.random.permutation(num_nodes)
+
+    return channels, edges, node_remap
+
+
+def canonical_bytes(rr_graph_schema, file_name):
+    """ Read rr graph and return the bytes of a deep copy of the message. """
+    with open(file_name, 'rb') as f:
+        rr_graph = rr_graph_schema.RrGraph.read(
+            f, traversal_limit_in_words=2**63 - 1
+        )
+        return rr_graph.as_builder().to_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--vpr_capnp_schema_dir',
+        required=True,
+        help='Directory container VPR schema files',
+    )
+    parser.add_argument('--width', type=int, default=100)
+    parser.add_argument('--height', type=int, default=100)
+    parser.add_argument('--num_tracks', type=int, default=200000)
+    parser.add_argument('--num_edges', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    numpy.random.seed(args.seed)
+
+    schema_file = os.path.join(
+        args.vpr_capnp_schema_dir, 'rr_graph_uxsdcxx.capnp'
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, 'input.bin')
+        serial_file = os.path.join(tmp_dir, 'serial.bin')
+        bulk_file = os.path.join(tmp_dir, 'bulk.bin')
+
+        rr_graph_schema = capnp.load(
+            schema_file,
+            imports=[os.path.dirname(os.path.dirname(capnp.__file__))]
+        )
+        write_input_graph(rr_graph_schema, input_file, args.width, args.height)
+
+        capnp_graph = capnp_graph2.Graph(
+            rr_graph_schema_fname=schema_file,
+            input_file_name=input_file,
+        )
+
+        channels, edges, node_remap = build_graph(
+            capnp_graph, args.width, args.height, args.num_tracks,
+            args.num_edges
+        )
+        num_nodes = len(capnp_graph.graph.nodes)
+
+        print('Writing {} nodes and {} edges'.format(num_nodes, len(edges)))
+
+        capnp_graph.output_file_name = serial_file
+        start = time.time()
+        capnp_graph.serialize_to_capnp(
+            channels_obj=channels,
+            num_nodes=num_nodes,
+            nodes_obj=capnp_graph.graph.nodes,
+            num_edges=len(edges),
+            edges_obj=edges,
+            node_remap=lambda x: int(node_remap[x]),
+        )
+        serial_time = time.time() - start
+
+        capnp_graph.output_file_name = bulk_file
+        start = time.time()
+        capnp_graph.serialize_to_capnp_bulk(
+            channels_obj=channels,
+            edges=edges,
+            node_remap=node_remap,
+        )
+        bulk_time = time.time() - start
+
+        print('serialize_to_capnp      {:8.2f} s'.format(serial_time))
+        print('serialize_to_capnp_bulk {:8.2f} s'.format(bulk_time))
+        print(
+            'Speedup                 {:8.2f} x'.format(
+                serial_time / bulk_time
+            )
+        )
+
+        serial_bytes = canonical_bytes(rr_graph_schema, serial_file)
+        bulk_bytes = canonical_bytes(rr_graph_schema, bulk_file)
+        assert serial_bytes == bulk_bytes, 'Serialized graphs differ!'
+        print('Outputs match ({} bytes).'.format(len(serial_bytes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+""" Bulk decoding of rr graph node and edge lists into numpy arrays.
+
+Counterpart of bulk_writer.  graph_from_capnp creates a graph2.Node for every
+node, and has to walk the whole Python heap afterwards to release the capnp
+objects that kept the input file alive.  This module decodes the capnp wire
+format directly with numpy instead, using the struct layouts of the loaded
+schema, so tools that only scan or filter nodes and edges never create per
+element Python objects.
+
+Unpacked messages are memory-mapped, and a column is only decoded when it is
+first requested.  Packed messages cannot be mapped, they are unpacked into
+memory by pycapnp first.
+
+See https://capnproto.org/encoding.html for details of the wire format.
+"""
+import struct
+
+import numpy as np
+
+from lib.rr_graph import graph2
+from lib.rr_graph import tracks
+from lib.rr_graph_capnp.bulk_writer import (
+    DATA_FIELD_DTYPES, FAR_POINTER, LIST_POINTER, NODE_COLUMNS, STRUCT_POINTER,
+    WORD, COMPOSITE_ELEMENTS, StructLayout, enum_table
+)
+
+# Columns of the node table that are read from the node loc struct, and the
+# name of the field they are read from.
+NODE_LOC_FIELDS = {
+    'x_low': 'xlow',
+    'y_low': 'ylow',
+    'x_high': 'xhigh',
+    'y_high': 'yhigh',
+    'ptc': 'ptc',
+    'side': 'side',
+}
+
+
+def split_segments(data):
+    """ Split an unpacked capnp message into read-only arrays of segments.
+
+    Unlike bulk_writer.read_segments, the segments are views of data.
+
+    """
+    (segment_count, ) = struct.unpack_from('<I', data)
+    segment_count += 1
+    sizes = struct.unpack_from('<{}I'.format(segment_count), data, 4)
+
+    pos = (1 + segment_count + 1) // 2 * 8
+    segments = []
+    for size in sizes:
+        segments.append(
+            np.frombuffer(data, dtype=WORD, count=size, offset=pos)
+        )
+        pos += size * 8
+
+    return segments
+
+
+def signed_offsets(pointers):
+    """ Returns signed 30 bit offset of near pointers, in words.
+
+    >>> signed_offsets(np.array([4, 0xFFFFFFFC], dtype=WORD)).tolist()
+    [1, -1]
+    """
+    offsets = ((pointers >> WORD.type(2)) & WORD.type(0x3FFFFFFF)).astype(
+        np.int64
+    )
+    offsets[offsets >= 0x20000000] -= 0x40000000
+    return offsets
+
+
+def inverse_enum_table(python_enum, capnp_enum, to_capnp_enum):
+    """ Returns array mapping capnp enum value to python enum value.
+
+    Capnp enum values without a python counterpart (e.g. uxsdInvalid) map to
+    -1, as None does in bulk_writer.node_columns.
+
+    """
+    table = enum_table(python_enum, capnp_enum, to_capnp_enum)
+
+    inverse = np.full(max(table) + 1, -1, dtype=np.int64)
+    for e in python_enum:
+        if table[e.value + 1] != 0:
+            inverse[table[e.value + 1]] = e.value
+
+    return inverse
+
+
+class Message(object):
+    """ Segments of a capnp message, see split_segments. """
+
+    def __init__(self, segments):
+        self.segments = segments
+
+    def gather(self, segment_ids, positions):
+        """ Returns words at positions within segments.
+
+        Positions of -1 read as 0, e.g. fields of null structs.
+
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        words = np.zeros(len(positions), dtype=WORD)
+        valid = positions >= 0
+
+        segment_ids = np.broadcast_to(segment_ids, positions.shape)
+        for segment_id in np.unique(segment_ids[valid]):
+            selected = valid & (segment_ids == segment_id)
+            words[selected] = self.segments[segment_id][positions[selected]]
+
+        return words
+
+    def resolve(self, segment_ids, pointer_positions):
+        """ Follows struct or list pointers.
+
+        Returns (pointers, segment_ids, positions) of the target of each
+        pointer.  pointers holds the near pointer or double far tag that
+        describes the target.  Positions of null pointers are -1.
+
+        """
+        pointer_positions = np.asarray(pointer_positions, dtype=np.int64)
+        segment_ids = np.array(
+            np.broadcast_to(segment_ids, pointer_positions.shape),
+            dtype=np.int64
+        )
+        pointers = self.gather(segment_ids, pointer_positions)
+        positions = pointer_positions + 1 + signed_offsets(pointers)
+
+        far = (pointers & WORD.type(3)) == FAR_POINTER
+        if np.any(far):
+            landing_segments = (pointers[far] >> WORD.type(32)).astype(
+                np.int64
+            )
+            landing_positions = (
+                (pointers[far] >> WORD.type(3)) & WORD.type(0x1FFFFFFF)
+            ).astype(np.int64)
+            double_far = (pointers[far] & WORD.type(4)) != 0
+
+            landing_pads = self.gather(landing_segments, landing_positions)
+
+            # Single far: the landing pad is a near pointer to the target.
+            far_positions = landing_positions + 1 + signed_offsets(
+                landing_pads
+            )
+            far_pointers = landing_pads
+
+            # Double far: the landing pad is a far pointer to the start of the
+            # target, followed by a tag describing the target.
+            if np.any(double_far):
+                tags = self.gather(
+                    landing_segments[double_far],
+                    landing_positions[double_far] + 1
+                )
+                far_pointers[double_far] = tags
+                far_positions[double_far] = (
+                    (landing_pads[double_far] >> WORD.type(3))
+                    & WORD.type(0x1FFFFFFF)
+                ).astype(np.int64)
+                landing_segments[double_far] = (
+                    landing_pads[double_far] >> WORD.type(32)
+                ).astype(np.int64)
+
+            pointers[far] = far_pointers
+            segment_ids[far] = landing_segments
+            positions[far] = far_positions
+
+        positions[pointers == 0] = -1
+
+        return pointers, segment_ids, positions
+
+    def root(self, layout):
+        """ Returns StructArray of the root struct. """
+        pointers, segment_ids, positions = self.resolve(0, [0])
+        return StructArray.from_pointers(
+            self, layout, pointers, segment_ids, positions
+        )
+
+
+class StructArray(object):
+    """ Array of capnp structs of one type.
+
+    Arguments
+    ---------
+    message : Message
+        Message containing the structs.
+    layout : bulk_writer.StructLayout
+        Layout of the struct type in the schema.
+    segment_ids, positions : numpy arrays
+        Location of each struct.  Position -1 is a null struct.
+    data_words, pointer_counts : numpy arrays
+        Size of each struct as encoded, which may differ from the layout if
+        the message was written with another version of the schema.
+
+    """
+
+    def __init__(
+            self, message, layout, segment_ids, positions, data_words,
+            pointer_counts
+    ):
+        self.message = message
+        self.layout = layout
+        self.segment_ids = segment_ids
+        self.positions = positions
+        self.data_words = data_words
+        self.pointer_counts = pointer_counts
+
+    @staticmethod
+    def from_pointers(message, layout, pointers, segment_ids, positions):
+        """ Returns StructArray of structs targeted by struct pointers. """
+        assert np.all(
+            (pointers & WORD.type(3))[positions >= 0] == STRUCT_POINTER
+        )
+
+        data_words = ((pointers >> WORD.type(32)) & WORD.type(0xFFFF)).astype(
+            np.int64
+        )
+        pointer_counts = (pointers >> WORD.type(48)).astype(np.int64)
+
+        return StructArray(
+            message, layout, segment_ids, positions, data_words, pointer_counts
+        )
+
+    def __len__(self):
+        return len(self.positions)
+
+    def data_field(self, name):
+        """ Returns numpy array of data field name of each struct. """
+        slot = self.layout.slots[name]
+        dtype = DATA_FIELD_DTYPES[slot.type.which()]
+
+        per_word = 8 // dtype.itemsize
+        word, index = divmod(slot.offset, per_word)
+
+        present = (self.positions >= 0) & (word < self.data_words)
+        words = self.message.gather(
+            self.segment_ids, np.where(present, self.positions + word, -1)
+        )
+        column = words.view(dtype).reshape(-1, per_word)[:, index]
+
+        # Capnp data fields are stored XOR'd with their default.
+        default = slot.defaultValue
+        default = getattr(default, default.which())
+        if default:
+            bits = np.dtype('<u{}'.format(dtype.itemsize))
+            column = (
+                column.view(bits) ^ np.array(default, dtype=dtype).view(bits)
+            ).view(dtype)
+
+        return column
+
+    def pointer_positions(self, name):
+        """ Returns position of pointer field name, or -1 if not present. """
+        index = self.layout.slots[name].offset
+        present = (self.positions >= 0) & (index < self.pointer_counts)
+        return np.where(present, self.positions + self.data_words + index, -1)
+
+    def child(self, name):
+        """ Returns StructArray of struct field name of each struct. """
+        pointer_positions = self.pointer_positions(name)
+
+        pointers, segment_ids, positions = self.message.resolve(
+            self.segment_ids, np.maximum(pointer_positions, 0)
+        )
+        pointers[pointer_positions < 0] = 0
+        positions[pointer_positions < 0] = -1
+
+        return StructArray.from_pointers(
+            self.message, self.layout.child(name), pointers, segment_ids,
+            positions
+        )
+
+    def struct_list(self, name):
+        """ Returns StructArray of list of structs field name.
+
+        Only defined for a single struct.
+
+        """
+        assert len(self) == 1
+        element = self.layout.element(name)
+
+        pointer_position = self.pointer_positions(name)
+        if pointer_position[0] < 0:
+            return StructArray(
+                self.message, element, np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64)
+            )
+
+        pointers, segment_ids, positions = self.message.resolve(
+            self.segment_ids, pointer_position
+        )
+        if positions[0] < 0:
+            return StructArray(
+                self.message, element, np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64)
+            )
+
+        pointer = int(pointers[0])
+        assert pointer & 3 == LIST_POINTER, hex(pointer)
+        assert (pointer >> 32) & 7 == COMPOSITE_ELEMENTS, hex(pointer)
+
+        segment_id = int(segment_ids[0])
+        tag = int(self.message.segments[segment_id][positions[0]])
+        count = (tag >> 2) & 0x3FFFFFFF
+        data_words = (tag >> 32) & 0xFFFF
+        pointer_count = tag >> 48
+        words = data_words + pointer_count
+
+        return StructArray(
+            self.message,
+            element,
+            np.full(count, segment_id, dtype=np.int64),
+            positions[0] + 1 + np.arange(count, dtype=np.int64) * words,
+            np.full(count, data_words, dtype=np.int64),
+            np.full(count, pointer_count, dtype=np.int64),
+        )
+
+
+class NodeArrays(object):
+    """ Lazily decoded columns of the rr graph node list.
+
+    Columns use the encoding of bulk_writer.node_columns: enum columns hold
+    the python enum value, or -1 for None.
+
+    """
+
+    def __init__(self, nodes, enum_tables):
+        self.nodes = nodes
+        self.enum_tables = enum_tables
+        self.structs = {}
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _struct(self, name):
+        if name not in self.structs:
+            self.structs[name] = self.nodes.child(name)
+
+        return self.structs[name]
+
+    def _decode(self, name):
+        if name in ('id', 'capacity'):
+            return self.nodes.data_field(name)
+        elif name in ('type', 'direction'):
+            return self.enum_tables[name][self.nodes.data_field(name)]
+        elif name == 'side':
+            loc = self._struct('loc')
+            return self.enum_tables[name][loc.data_field('side')]
+        elif name in NODE_LOC_FIELDS:
+            return self._struct('loc').data_field(NODE_LOC_FIELDS[name])
+        elif name in ('r', 'c'):
+            return self._struct('timing').data_field(name)
+        elif name == 'segment_id':
+            return self._struct('segment').data_field('segmentId')
+        else:
+            assert False, name
+
+    def column(self, name):
+        """ Returns numpy array of column name, see NODE_COLUMNS. """
+        if name not in self.columns:
+            self.columns[name] = self._decode(name)
+
+        return self.columns[name]
+
+    def all_columns(self):
+        """ Returns dictionary of all columns, see NODE_COLUMNS. """
+        return {name: self.column(name) for name in NODE_COLUMNS}
+
+
+class EdgeArrays(object):
+    """ Lazily decoded columns of the rr graph edge list.
+
+    The methods match graph2.EdgeArrays, edge metadata is not decoded.
+
+    """
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.edges)
+
+    def _column(self, name):
+        if name not in self.columns:
+            self.columns[name] = self.edges.data_field(name)
+
+        return self.columns[name]
+
+    def src_nodes(self):
+        return self._column('srcNode')
+
+    def sink_nodes(self):
+        return self._column('sinkNode')
+
+    def switch_ids(self):
+        return self._column('switchId')
+
+
+class BulkReader(object):
+    """ Decodes rr graph node and edge lists with numpy.
+
+    Arguments
+    ---------
+    rr_graph_schema
+        Loaded rr_graph_uxsdcxx.capnp schema.
+    to_capnp_enum : callable
+        Conversion of python enum to capnp enum value, see
+        rr_graph_capnp.graph2.to_capnp_enum.
+
+    """
+
+    def __init__(self, rr_graph_schema, to_capnp_enum):
+        self.rr_graph_schema = rr_graph_schema
+        self.root = StructLayout(rr_graph_schema.RrGraph.schema)
+
+        self.enum_tables = {
+            'type':
+                inverse_enum_table(
+                    graph2.NodeType, rr_graph_schema.NodeType, to_capnp_enum
+                ),
+            'direction':
+                inverse_enum_table(
+                    graph2.NodeDirection, rr_graph_schema.NodeDirection,
+                    to_capnp_enum
+                ),
+            'side':
+                inverse_enum_table(
+                    tracks.Direction, rr_graph_schema.LocSide, to_capnp_enum
+                ),
+        }
+
+    def read_message(self, file_name, packed=False):
+        """ Returns Message of an rr graph file. """
+        if packed:
+            with open(file_name, 'rb') as f:
+                rr_graph = self.rr_graph_schema.RrGraph.from_bytes_packed(
+                    f.read(), traversal_limit_in_words=2**63 - 1
+                )
+            data = rr_graph.as_builder().to_bytes()
+            del rr_graph
+        else:
+            data = np.memmap(file_name, dtype=np.uint8, mode='r')
+
+        return Message(split_segments(data))
+
+    def read(self, file_name, packed=False):
+        """ Returns (NodeArrays, EdgeArrays) of an rr graph file.
+
+        Arguments
+        ---------
+        file_name : str
+            rr graph file.
+        packed : bool
+            If True, the file is a packed capnp message.
+
+        """
+        message = self.read_message(file_name, packed=packed)
+        root = message.root(self.root)
+
+        rr_nodes = root.child('rrNodes')
+        nodes = NodeArrays(rr_nodes.struct_list('nodes'), self.enum_tables)
+
+        rr_edges = root.child('rrEdges')
+        edges = EdgeArrays(rr_edges.struct_list('edges'))
+
+        return nodes, edges
@@ -0,0 +1,660 @@
+""" Bulk capnp encoding of rr graph node and edge lists from numpy arrays.
+
+pycapnp sets struct fields one Python attribute at a time, which dominates the
+time required to write an rr graph with millions of nodes and edges.  This
+module encodes the node and edge lists directly into the capnp wire format
+with numpy, using the struct layouts of the loaded schema, and splices them
+into a message that was built with pycapnp.
+
+The node and edge lists are placed in new segments that the root struct
+reaches through far pointers.  Metadata is encoded once per unique metadata
+tuple as a self contained blob (landing pad, struct, list and text), which is
+copied for each node or edge that uses it.
+
+See https://capnproto.org/encoding.html for details of the wire format.
+"""
+import struct
+
+import numpy as np
+
+from lib.rr_graph import graph2
+from lib.rr_graph import tracks
+
+WORD = np.dtype('<u8')
+
+# Largest near pointer offset, in words.
+MAX_POINTER_OFFSET = 2**29 - 1
+
+# Largest segment emitted for metadata blobs, in words.
+MAX_SEGMENT_WORDS = 2**28
+
+# Element size of list pointers.
+BYTE_ELEMENTS = 2
+COMPOSITE_ELEMENTS = 7
+
+# Pointer kinds.
+STRUCT_POINTER = 0
+LIST_POINTER = 1
+FAR_POINTER = 2
+
+DATA_FIELD_DTYPES = {
+    'int8': np.dtype('<i1'),
+    'int16': np.dtype('<i2'),
+    'int32': np.dtype('<i4'),
+    'int64': np.dtype('<i8'),
+    'uint8': np.dtype('<u1'),
+    'uint16': np.dtype('<u2'),
+    'uint32': np.dtype('<u4'),
+    'uint64': np.dtype('<u8'),
+    'float32': np.dtype('<f4'),
+    'float64': np.dtype('<f8'),
+    'enum': np.dtype('<u2'),
+}
+
+# Columns of the node table accepted by BulkWriter, see node_columns.
+NODE_COLUMNS = (
+    'id',
+    'type',
+    'direction',
+    'capacity',
+    'x_low',
+    'y_low',
+    'x_high',
+    'y_high',
+    'side',
+    'ptc',
+    'r',
+    'c',
+    'segment_id',
+)
+
+
+class StructLayout(object):
+    """ Wire layout of a capnp struct, taken from the schema. """
+
+    def __init__(self, struct_schema):
+        self.struct_schema = struct_schema
+
+        node = struct_schema.node
+        self.name = node.displayName
+        self.data_words = node.struct.dataWordCount
+        self.pointer_count = node.struct.pointerCount
+        self.words = self.data_words + self.pointer_count
+
+        self.slots = {}
+        for field in node.struct.fields:
+            if field.which() == 'slot':
+                self.slots[field.name] = field.slot
+
+    def child(self, name):
+        """ Returns StructLayout of struct field name. """
+        return StructLayout(self.struct_schema.fields[name].schema)
+
+    def element(self, name):
+        """ Returns StructLayout of the elements of list field name. """
+        return StructLayout(self.struct_schema.fields[name].schema.elementType)
+
+    def pointer_index(self, name):
+        """ Returns word index of pointer field name within the struct. """
+        slot = self.slots[name]
+        assert slot.type.which() in ('struct', 'list', 'text',
+                                     'data'), (self.name, name)
+        return self.data_words + slot.offset
+
+    def struct_pointer_bits(self):
+        """ Returns the size bits of a struct pointer to this struct. """
+        return (self.data_words << 32) | (self.pointer_count << 48)
+
+    def encode(self, count, values):
+        """ Encode count structs.
+
+        Arguments
+        ---------
+        count : int
+            Number of structs.
+        values : dict of str to array
+            Value of each data field to set.  Unset data fields and all
+            pointers are left at their defaults.
+
+        Returns
+        -------
+        Array of shape (count, self.words) of WORD.
+
+        """
+        words = np.zeros((count, self.words), dtype=WORD)
+
+        for name, value in values.items():
+            slot = self.slots[name]
+            dtype = DATA_FIELD_DTYPES[slot.type.which()]
+            column = np.asarray(value).astype(dtype)
+
+            # Capnp data fields are stored XOR'd with their default.
+            default = slot.defaultValue
+            default = getattr(default, default.which())
+            if default:
+                bits = np.dtype('<u{}'.format(dtype.itemsize))
+                column = column.view(bits) ^ np.array(
+                    default, dtype=dtype
+                ).view(bits)
+
+            words.view(column.dtype)[:, slot.offset] = column
+
+        return words
+
+
+def pointer_offsets(pointer_pos, target_pos):
+    """ Returns offset bits of near pointers at pointer_pos to target_pos. """
+    target_pos = np.asarray(target_pos, dtype=np.int64)
+    pointer_pos = np.asarray(pointer_pos, dtype=np.int64)
+    offsets = target_pos - pointer_pos - 1
+    assert np.all(np.abs(offsets) <= MAX_POINTER_OFFSET), 'Segment too large'
+    return ((offsets << 2) & 0xFFFFFFFF).astype(WORD)
+
+
+def struct_pointers(pointer_pos, target_pos, layout):
+    """ Returns struct pointers at pointer_pos to structs at target_pos. """
+    size_bits = WORD.type(STRUCT_POINTER | layout.struct_pointer_bits())
+    return pointer_offsets(pointer_pos, target_pos) | size_bits
+
+
+def composite_list_pointer(pointer_pos, tag_pos, layout, count):
+    """ Returns list pointer to count layout structs with tag at tag_pos. """
+    offset = tag_pos - pointer_pos - 1
+    assert abs(offset) <= MAX_POINTER_OFFSET
+    pointer = LIST_POINTER | ((offset << 2) & 0xFFFFFFFF)
+    pointer |= (COMPOSITE_ELEMENTS << 32) | ((count * layout.words) << 35)
+    return pointer
+
+
+def composite_tag(layout, count):
+    """ Returns tag word of a list of count layout structs. """
+    return STRUCT_POINTER | (count << 2) | layout.struct_pointer_bits()
+
+
+def text_words(pointer_pos, text_pos, s):
+    """ Returns (text pointer, text words) for s placed at text_pos. """
+    data = s.encode('utf-8') + b'\0'
+    offset = text_pos - pointer_pos - 1
+    pointer = LIST_POINTER | ((offset << 2) & 0xFFFFFFFF)
+    pointer |= (BYTE_ELEMENTS << 32) | (len(data) << 35)
+
+    data += b'\0' * (-len(data) % 8)
+    return pointer, struct.unpack('<{}Q'.format(len(data) // 8), data)
+
+
+def far_pointers(segment_ids, landing_pos):
+    """ Returns far pointers to landing pads in other segments. """
+    landing_pos = np.asarray(landing_pos, dtype=WORD)
+    segment_ids = np.asarray(segment_ids, dtype=WORD)
+    return WORD.type(FAR_POINTER) | (landing_pos << WORD.type(3)) | (
+        segment_ids << WORD.type(32)
+    )
+
+
+def read_segments(data):
+    """ Split an unpacked capnp message into writable arrays of segments. """
+    (segment_count, ) = struct.unpack_from('<I', data)
+    segment_count += 1
+    sizes = struct.unpack_from('<{}I'.format(segment_count), data, 4)
+
+    pos = (1 + segment_count + 1) // 2 * 8
+    segments = []
+    for size in sizes:
+        segments.append(
+            np.frombuffer(data, dtype=WORD, count=size, offset=pos).copy()
+        )
+        pos += size * 8
+
+    return segments
+
+
+def enum_table(python_enum, capnp_enum, to_capnp_enum):
+    """ Returns array mapping python enum value + 1 to capnp enum value.
+
+    Index 0 (e.g. value -1) is used for None, and encodes as the capnp
+    default.  Python enum values without a capnp counterpart (e.g.
+    NodeType.INVALID_NODE_TYPE) also encode as the capnp default.
+
+    """
+    table = np.zeros(max(e.value for e in python_enum) + 2, dtype=np.uint16)
+    for e in python_enum:
+        try:
+            table[e.value + 1] = to_capnp_enum(capnp_enum, e)
+        except KeyError:
+            pass
+
+    return table
+
+
+def node_array_columns(nodes):
+    """ Convert graph2.NodeArrays into the columns used by BulkWriter.
+
+    Same as node_columns, but the columns are converted with numpy instead of
+    one node at a time.
+
+    """
+    columns = {}
+    for name in NODE_COLUMNS:
+        column = nodes.column(name)
+        if name in ('r', 'c'):
+            assert not np.isnan(column).any(), 'Node without timing'
+            columns[name] = column.astype(np.float64)
+        else:
+            if name in ('ptc', 'segment_id'):
+                is_none = column == nodes.NONE
+                assert not is_none.any(), 'Node without {}'.format(name)
+            columns[name] = column.astype(np.int64)
+
+    # Map the NodeArrays metadata table, where index 0 is None, to unique
+    # (name, value) tuples.  Empty metadata is written as no metadata.
+    metadata = [()]
+    metadata_map = {(): 0}
+    metadata_remap = np.zeros(len(nodes.metadata), dtype=np.int64)
+
+    for idx, node_metadata in enumerate(nodes.metadata[1:], start=1):
+        key = tuple((meta.name, meta.value) for meta in node_metadata)
+        if key not in metadata_map:
+            metadata_map[key] = len(metadata)
+            metadata.append(key)
+
+        metadata_remap[idx] = metadata_map[key]
+
+    metadata_ids = metadata_remap[nodes.column('metadata_id')]
+
+    return columns, metadata, metadata_ids
+
+
+def node_columns(nodes):
+    """ Convert list of graph2.Node into the columns used by BulkWriter.
+
+    Enum columns hold the enum value, or -1 for None.  Every node must have
+    timing and segment set, as is the case for graphs read by
+    lib.rr_graph_capnp.graph2.Graph and tracks added with timing.
+
+    graph2.NodeArrays are converted by node_array_columns.
+
+    Returns
+    -------
+    columns : dict of column name to numpy array, see NODE_COLUMNS.
+    metadata : list of metadata tuples, index 0 is no metadata.
+    metadata_ids : numpy array of index into metadata for each node.
+
+    """
+    if isinstance(nodes, graph2.NodeArrays):
+        return node_array_columns(nodes)
+
+    columns = {name: [] for name in NODE_COLUMNS}
+
+    metadata = [()]
+    metadata_map = {(): 0}
+    metadata_ids = []
+
+    for node in nodes:
+        assert node.timing is not None, node
+        assert node.segment is not None, node
+
+        loc = node.loc
+        columns['id'].append(node.id)
+        columns['type'].append(node.type.value)
+        columns['direction'].append(
+            node.direction.value if node.direction is not None else -1
+        )
+        columns['capacity'].append(node.capacity)
+        columns['x_low'].append(loc.x_low)
+        columns['y_low'].append(loc.y_low)
+        columns['x_high'].append(loc.x_high)
+        columns['y_high'].append(loc.y_high)
+        columns['side'].append(loc.side.value if loc.side is not None else -1)
+        columns['ptc'].append(loc.ptc)
+        columns['r'].append(node.timing.r)
+        columns['c'].append(node.timing.c)
+        columns['segment_id'].append(node.segment.segment_id)
+
+        if node.metadata:
+            key = tuple((meta.name, meta.value) for meta in node.metadata)
+            if key not in metadata_map:
+                metadata_map[key] = len(metadata)
+                metadata.append(key)
+
+            metadata_ids.append(metadata_map[key])
+        else:
+            metadata_ids.append(0)
+
+    out_columns = {}
+    for name, values in columns.items():
+        if name in ('r', 'c'):
+            out_columns[name] = np.array(values, dtype=np.float64)
+        else:
+            out_columns[name] = np.array(values, dtype=np.int64)
+
+    return out_columns, metadata, np.array(metadata_ids, dtype=np.int64)
+
+
+class BulkWriter(object):
+    """ Encodes rr graph node and edge lists with numpy.
+
+    Arguments
+    ---------
+    rr_graph_schema
+        Loaded rr_graph_uxsdcxx.capnp schema.
+    to_capnp_enum : callable
+        Conversion of python enum to capnp enum value, see
+        rr_graph_capnp.graph2.to_capnp_enum.
+
+    """
+
+    def __init__(self, rr_graph_schema, to_capnp_enum):
+        self.root = StructLayout(rr_graph_schema.RrGraph.schema)
+
+        self.rr_nodes = self.root.child('rrNodes')
+        self.node = self.rr_nodes.element('nodes')
+        self.node_loc = self.node.child('loc')
+        self.node_timing = self.node.child('timing')
+        self.node_segment = self.node.child('segment')
+
+        self.rr_edges = self.root.child('rrEdges')
+        self.edge = self.rr_edges.element('edges')
+
+        self.metadata = self.node.child('metadata')
+        self.meta = self.metadata.element('metas')
+
+        self.node_type_table = enum_table(
+            graph2.NodeType, rr_graph_schema.NodeType, to_capnp_enum
+        )
+        self.node_direction_table = enum_table(
+            graph2.NodeDirection, rr_graph_schema.NodeDirection, to_capnp_enum
+        )
+        self.loc_side_table = enum_table(
+            tracks.Direction, rr_graph_schema.LocSide, to_capnp_enum
+        )
+
+    def metadata_blob(self, metas):
+        """ Encode tuple of (name, value) as a position independent blob.
+
+        Word 0 is a landing pad for a far pointer to the metadata struct.
+
+        """
+        words = [0] * (1 + self.metadata.words)
+        words[0] = STRUCT_POINTER | self.metadata.struct_pointer_bits()
+
+        metas_pos = 1 + self.metadata.pointer_index('metas')
+        words[metas_pos] = composite_list_pointer(
+            metas_pos, len(words), self.meta, len(metas)
+        )
+        words.append(composite_tag(self.meta, len(metas)))
+
+        first_meta = len(words)
+        words.extend([0] * (len(metas) * self.meta.words))
+
+        for idx, (name, value) in enumerate(metas):
+            for field, s in (('name', name), ('value', value)):
+                meta_pos = first_meta + idx * self.meta.words
+                pointer_pos = meta_pos + self.meta.pointer_index(field)
+                pointer, text = text_words(pointer_pos, len(words), s)
+                words[pointer_pos] = pointer
+                words.extend(text)
+
+        return words
+
+    def encode_metadata(self, metadata, metadata_ids, first_segment_id):
+        """ Encode metadata for a list of nodes or edges.
+
+        Arguments
+        ---------
+        metadata : list of tuple of (name, value)
+            Table of unique metadata, index 0 is no metadata.
+        metadata_ids : array of int
+            Index into metadata for each element.
+        first_segment_id : int
+            Segment id of the first segment returned.
+
+        Returns
+        -------
+        pointers : array of WORD
+            Metadata pointer for each element.
+        segments : list of array of WORD
+            Segments containing the metadata blobs.
+
+        """
+        metadata_ids = np.asarray(metadata_ids)
+        pointers = np.zeros(len(metadata_ids), dtype=WORD)
+
+        has_metadata = np.flatnonzero(metadata_ids)
+        if len(has_metadata) == 0:
+            return pointers, []
+
+        blobs = [()] + [self.metadata_blob(metas) for metas in metadata[1:]]
+        blob_lengths = np.array([len(blob) for blob in blobs], dtype=np.int64)
+        blob_starts = np.cumsum(blob_lengths) - blob_lengths
+        blob_words = np.fromiter(
+            (word for blob in blobs for word in blob),
+            dtype=WORD,
+            count=int(blob_lengths.sum())
+        )
+
+        # Copy one blob per element.
+        selected = metadata_ids[has_metadata]
+        lengths = blob_lengths[selected]
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        words = blob_words[np.repeat(blob_starts[selected] - starts, lengths) +
+                           np.arange(ends[-1])]
+
+        # Split into segments on blob boundaries.
+        segments = []
+        segment_ids = np.empty(len(selected), dtype=np.int64)
+        landing_pos = np.empty(len(selected), dtype=np.int64)
+        begin = 0
+        while begin < len(selected):
+            base = starts[begin]
+            end = max(
+                begin + 1,
+                np.searchsorted(ends, base + MAX_SEGMENT_WORDS, side='right')
+            )
+
+            segments.append(words[base:ends[end - 1]])
+            segment_ids[begin:end] = first_segment_id + len(segments) - 1
+            landing_pos[begin:end] = starts[begin:end] - base
+            begin = end
+
+        pointers[has_metadata] = far_pointers(segment_ids, landing_pos)
+
+        return pointers, segments
+
+    def encode_nodes(
+            self, columns, metadata, metadata_ids, node_remap, segment_id
+    ):
+        """ Encode node list as segments.
+
+        Segment segment_id holds a landing pad at word 0 for the rrNodes
+        pointer, followed by the RrNodes struct, node list and the node
+        loc, timing and segment structs.  Metadata segments follow.
+
+        """
+        count = len(columns['id'])
+
+        rr_nodes_pos = 1
+        tag_pos = rr_nodes_pos + self.rr_nodes.words
+        nodes_pos = tag_pos + 1
+        locs_pos = nodes_pos + count * self.node.words
+        timings_pos = locs_pos + count * self.node_loc.words
+        segments_pos = timings_pos + count * self.node_timing.words
+        end_pos = segments_pos + count * self.node_segment.words
+
+        header = np.zeros(nodes_pos, dtype=WORD)
+        header[0] = STRUCT_POINTER | self.rr_nodes.struct_pointer_bits()
+        list_pos = rr_nodes_pos + self.rr_nodes.pointer_index('nodes')
+        header[list_pos] = composite_list_pointer(
+            list_pos, tag_pos, self.node, count
+        )
+        header[tag_pos] = composite_tag(self.node, count)
+
+        nodes = self.node.encode(
+            count, {
+                'id':
+                    node_remap[columns['id']],
+                'type':
+                    self.node_type_table[columns['type'] + 1],
+                'direction':
+                    self.node_direction_table[columns['direction'] + 1],
+                'capacity':
+                    columns['capacity'],
+            }
+        )
+
+        node_pos = nodes_pos + np.arange(
+            count, dtype=np.int64
+        ) * self.node.words
+        for field, layout, first in (
+            ('loc', self.node_loc, locs_pos),
+            ('timing', self.node_timing, timings_pos),
+            ('segment', self.node_segment, segments_pos),
+        ):
+            idx = self.node.pointer_index(field)
+            nodes[:, idx] = struct_pointers(
+                node_pos + idx,
+                first + np.arange(count, dtype=np.int64) * layout.words,
+                layout,
+            )
+
+        pointers, metadata_segments = self.encode_metadata(
+            metadata, metadata_ids, segment_id + 1
+        )
+        nodes[:, self.node.pointer_index('metadata')] = pointers
+
+        locs = self.node_loc.encode(
+            count, {
+                'ptc': columns['ptc'],
+                'side': self.loc_side_table[columns['side'] + 1],
+                'xhigh': columns['x_high'],
+                'xlow': columns['x_low'],
+                'yhigh': columns['y_high'],
+                'ylow': columns['y_low'],
+            }
+        )
+        timings = self.node_timing.encode(
+            count, {
+                'c': columns['c'],
+                'r': columns['r'],
+            }
+        )
+        segments = self.node_segment.encode(
+            count, {
+                'segmentId': columns['segment_id'],
+            }
+        )
+
+        segment = np.concatenate(
+            (
+                header, nodes.reshape(-1), locs.reshape(-1),
+                timings.reshape(-1), segments.reshape(-1)
+            )
+        )
+        assert len(segment) == end_pos
+
+        return [segment] + metadata_segments
+
+    def encode_edges(self, edges, node_remap, segment_id):
+        """ Encode graph2.EdgeArrays as segments.
+
+        Segment segment_id holds a landing pad at word 0 for the rrEdges
+        pointer, followed by the RrEdges struct and the edge list.  Metadata
+        segments follow.
+
+        """
+        count = len(edges)
+
+        rr_edges_pos = 1
+        tag_pos = rr_edges_pos + self.rr_edges.words
+        edges_pos = tag_pos + 1
+
+        header = np.zeros(edges_pos, dtype=WORD)
+        header[0] = STRUCT_POINTER | self.rr_edges.struct_pointer_bits()
+        list_pos = rr_edges_pos + self.rr_edges.pointer_index('edges')
+        header[list_pos] = composite_list_pointer(
+            list_pos, tag_pos, self.edge, count
+        )
+        header[tag_pos] = composite_tag(self.edge, count)
+
+        out_edges = self.edge.encode(
+            count, {
+                'srcNode': node_remap[edges.src_nodes()],
+                'sinkNode': node_remap[edges.sink_nodes()],
+                'switchId': edges.switch_ids(),
+            }
+        )
+
+        pointers, metadata_segments = self.encode_metadata(
+            edges.metadata, edges.metadata_ids(), segment_id + 1
+        )
+        out_edges[:, self.edge.pointer_index('metadata')] = pointers
+
+        return [
+            np.concatenate((header, out_edges.reshape(-1)))
+        ] + metadata_segments
+
+    def write(
+            self, f, rr_graph, node_columns, node_metadata, node_metadata_ids,
+            edges, node_remap
+    ):
+        """ Write rr_graph message to f with bulk encoded nodes and edges.
+
+        Arguments
+        ---------
+        f : file object
+            Output file, opened for binary write.
+        rr_graph : RrGraph message builder
+            Message with everything but rrNodes and rrEdges set.
+        node_columns, node_metadata, node_metadata_ids
+            Node table, see node_columns.
+        edges : graph2.EdgeArrays
+            Edges to write.
+        node_remap : numpy array
+            New node id for each node id.
+
+        """
+        segments = read_segments(rr_graph.to_bytes())
+
+        root_pointer = int(segments[0][0])
+        assert root_pointer & 3 == STRUCT_POINTER, hex(root_pointer)
+        root_offset = (root_pointer >> 2) & 0x3FFFFFFF
+        if root_offset & 0x20000000:
+            root_offset -= 0x40000000
+        root_data_words = (root_pointer >> 32) & 0xFFFF
+        root_pointers_pos = 1 + root_offset + root_data_words
+
+        node_remap = np.asarray(node_remap, dtype=np.int64)
+
+        nodes_pointer_pos = root_pointers_pos + self.root.slots['rrNodes'
+                                                                ].offset
+        assert segments[0][nodes_pointer_pos] == 0
+        segments[0][nodes_pointer_pos] = far_pointers(len(segments), 0)
+        segments.extend(
+            self.encode_nodes(
+                columns=node_columns,
+                metadata=node_metadata,
+                metadata_ids=node_metadata_ids,
+                node_remap=node_remap,
+                segment_id=len(segments),
+            )
+        )
+
+        edges_pointer_pos = root_pointers_pos + self.root.slots['rrEdges'
+                                                                ].offset
+        assert segments[0][edges_pointer_pos] == 0
+        segments[0][edges_pointer_pos] = far_pointers(len(segments), 0)
+        segments.extend(
+            self.encode_edges(
+                edges=edges,
+                node_remap=node_remap,
+                segment_id=len(segments),
+            )
+        )
+
+        table = np.zeros((len(segments) + 2) // 2 * 2, dtype=np.dtype('<u4'))
+        table[0] = len(segments) - 1
+        table[1:len(segments) + 1] = [len(segment) for segment in segments]
+
+        f.write(table.tobytes())
+        for segment in segments:
+            f.write(segment.data)
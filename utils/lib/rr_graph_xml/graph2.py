@@ -218,7 +218,9 @@ def graph_from_xml(
 
         # Node - segment
         if path == "rr_graph/rr_nodes/node" and element.tag == "segment":
-            node_segment = int(element.attrib['segment_id'])
+            node_segment = graph2.NodeSegment(
+                segment_id=int(element.attrib['segment_id'])
+            )
 
         # Node
         if path == "rr_graph/rr_nodes" and element.tag == "node":
@@ -0,0 +1,270 @@
+""" Binary map between connection database graph_node pkeys and rr inodes.
+
+The map is written by prjxray_routing_import (--write_rr_node_map) and is
+memory mapped by readers, so lookups in either direction do not require
+loading the whole map into python objects.
+
+prjxray_routing_import can also write an inode names table
+(--write_rr_inode_names), see write_inode_names and InodeNames.
+
+File layout (little endian):
+
+    header : magic (8 bytes), version (u32), reserved (u32),
+             number of pkeys (u64), number of inodes (u64)
+    inode_by_pkey : i32 per pkey, rr inode or -1 if pkey has no rr node
+    pkey_by_inode : i32 per inode, lowest graph_node pkey or -1
+    type_by_inode : i8 per inode, graph2.NodeType value or -1
+
+Arrays start on 8 byte boundaries.
+
+"""
+import mmap
+import struct
+
+import numpy as np
+
+from lib.rr_graph.graph2 import NodeType
+
+MAGIC = b'RRNODMAP'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQ')
+
+NAMES_MAGIC = b'RRINODNM'
+NAMES_VERSION = 1
+NAMES_HEADER = struct.Struct('<8sIIQ')
+
+
+def _align(pos):
+    return (pos + 7) // 8 * 8
+
+
+def _layout(num_pkeys, num_inodes):
+    """ Returns offsets of the inode_by_pkey, pkey_by_inode and type_by_inode
+    arrays, and the total file size. """
+    inode_by_pkey = _align(HEADER.size)
+    pkey_by_inode = _align(inode_by_pkey + 4 * num_pkeys)
+    type_by_inode = _align(pkey_by_inode + 4 * num_inodes)
+    size = _align(type_by_inode + num_inodes)
+
+    return inode_by_pkey, pkey_by_inode, type_by_inode, size
+
+
+def write_rr_node_map(f, graph_node_pkeys, inodes, node_types):
+    """ Write rr node map to binary file object f.
+
+    Arguments
+    ---------
+    graph_node_pkeys : array like of int
+        graph_node pkeys.
+    inodes : array like of int
+        rr inode of each graph_node pkey.
+    node_types : array like of int
+        graph2.NodeType value of each inode.
+
+    Several graph_node pkeys may map to the same inode (e.g. the sides of a
+    site pin), in which case the reverse map holds the lowest pkey.
+
+    """
+    graph_node_pkeys = np.asarray(graph_node_pkeys, dtype=np.int64)
+    inodes = np.asarray(inodes, dtype=np.int64)
+    node_types = np.asarray(node_types, dtype=np.int64)
+    assert graph_node_pkeys.shape == inodes.shape == node_types.shape
+
+    num_pkeys = int(graph_node_pkeys.max()) + 1 if len(inodes) else 0
+    num_inodes = int(inodes.max()) + 1 if len(inodes) else 0
+    assert num_pkeys < 2**31 and num_inodes < 2**31
+
+    inode_by_pkey = np.full(num_pkeys, -1, dtype='<i4')
+    inode_by_pkey[graph_node_pkeys] = inodes
+
+    unmapped = np.iinfo(np.int64).max
+    lowest_pkey = np.full(num_inodes, unmapped, dtype=np.int64)
+    np.minimum.at(lowest_pkey, inodes, graph_node_pkeys)
+    lowest_pkey[lowest_pkey == unmapped] = -1
+    pkey_by_inode = lowest_pkey.astype('<i4')
+
+    type_by_inode = np.full(num_inodes, -1, dtype='i1')
+    type_by_inode[inodes] = node_types
+
+    offsets = _layout(num_pkeys, num_inodes)
+
+    f.write(HEADER.pack(MAGIC, VERSION, 0, num_pkeys, num_inodes))
+    pos = HEADER.size
+    for offset, array in zip(offsets,
+                             (inode_by_pkey, pkey_by_inode, type_by_inode)):
+        f.write(b'\0' * (offset - pos))
+        f.write(array.tobytes())
+        pos = offset + array.nbytes
+
+    f.write(b'\0' * (offsets[-1] - pos))
+
+
+class RrNodeMap(object):
+    """ Memory mapped rr node map written by write_rr_node_map.
+
+    The arrays inode_by_pkey, pkey_by_inode and type_by_inode are numpy views
+    of the file, and may be used directly for bulk lookups.
+
+    """
+
+    def __init__(self, fname):
+        with open(fname, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, num_pkeys, num_inodes = HEADER.unpack_from(
+            self.mmap
+        )
+        assert magic == MAGIC, (fname, magic)
+        assert version == VERSION, (fname, version)
+
+        inode_by_pkey, pkey_by_inode, type_by_inode, size = _layout(
+            num_pkeys, num_inodes
+        )
+        assert len(self.mmap) >= size, fname
+
+        self.inode_by_pkey = np.frombuffer(
+            self.mmap, dtype='<i4', count=num_pkeys, offset=inode_by_pkey
+        )
+        self.pkey_by_inode = np.frombuffer(
+            self.mmap, dtype='<i4', count=num_inodes, offset=pkey_by_inode
+        )
+        self.type_by_inode = np.frombuffer(
+            self.mmap, dtype='i1', count=num_inodes, offset=type_by_inode
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.inode_by_pkey = None
+        self.pkey_by_inode = None
+        self.type_by_inode = None
+        self.mmap.close()
+
+    def get_inode(self, graph_node_pkey):
+        """ Returns rr inode of graph_node_pkey, or None. """
+        if 0 <= graph_node_pkey < len(self.inode_by_pkey):
+            inode = int(self.inode_by_pkey[graph_node_pkey])
+            if inode != -1:
+                return inode
+
+        return None
+
+    def get_graph_node_pkey(self, inode):
+        """ Returns lowest graph_node pkey that maps to inode, or None. """
+        if 0 <= inode < len(self.pkey_by_inode):
+            graph_node_pkey = int(self.pkey_by_inode[inode])
+            if graph_node_pkey != -1:
+                return graph_node_pkey
+
+        return None
+
+    def get_node_type(self, inode):
+        """ Returns graph2.NodeType of inode, or None. """
+        if 0 <= inode < len(self.type_by_inode):
+            node_type = int(self.type_by_inode[inode])
+            if node_type != -1:
+                return NodeType(node_type)
+
+        return None
+
+
+def inode_names_from_database(conn, node_map):
+    """ Returns list of "tile/wire" name of each inode, or None.
+
+    The name of an inode is the first wire (lowest wire pkey) of the node of
+    the graph_node that node_map reverse maps the inode to.
+
+    """
+    names = [None for _ in range(len(node_map.pkey_by_inode))]
+
+    cur = conn.cursor()
+    for graph_node_pkey, tile, wire in cur.execute("""
+WITH first_wire(node_pkey, wire_pkey) AS (
+    SELECT node_pkey, MIN(pkey) FROM wire GROUP BY node_pkey
+)
+SELECT graph_node.pkey, phy_tile.name, wire_in_tile.name
+FROM graph_node
+INNER JOIN first_wire ON graph_node.node_pkey = first_wire.node_pkey
+INNER JOIN wire ON first_wire.wire_pkey = wire.pkey
+INNER JOIN wire_in_tile ON wire.wire_in_tile_pkey = wire_in_tile.pkey
+INNER JOIN phy_tile ON wire.phy_tile_pkey = phy_tile.pkey;"""):
+        inode = node_map.get_inode(graph_node_pkey)
+        if inode is None:
+            continue
+
+        if node_map.pkey_by_inode[inode] == graph_node_pkey:
+            names[inode] = '{}/{}'.format(tile, wire)
+
+    return names
+
+
+def write_inode_names(f, names):
+    """ Write string table of inode names to binary file object f.
+
+    File layout (little endian):
+
+        header : magic (8 bytes), version (u32), reserved (u32),
+                 number of inodes (u64)
+        offsets : u64 per inode + 1, start of each name in the string data
+        string data : utf-8 names, None is written as an empty name
+
+    """
+    data = [(name or '').encode('utf-8') for name in names]
+
+    offsets = np.zeros(len(data) + 1, dtype='<u8')
+    np.cumsum([len(name) for name in data], out=offsets[1:])
+
+    f.write(NAMES_HEADER.pack(NAMES_MAGIC, NAMES_VERSION, 0, len(data)))
+    f.write(offsets.tobytes())
+    for name in data:
+        f.write(name)
+
+
+class InodeNames(object):
+    """ Memory mapped inode names table written by write_inode_names. """
+
+    def __init__(self, fname):
+        with open(fname, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, num_inodes = NAMES_HEADER.unpack_from(self.mmap)
+        assert magic == NAMES_MAGIC, (fname, magic)
+        assert version == NAMES_VERSION, (fname, version)
+
+        self.offsets = np.frombuffer(
+            self.mmap,
+            dtype='<u8',
+            count=num_inodes + 1,
+            offset=NAMES_HEADER.size
+        )
+        self.data_start = NAMES_HEADER.size + self.offsets.nbytes
+        assert len(self.mmap) >= self.data_start + int(self.offsets[-1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.offsets = None
+        self.mmap.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, inode):
+        """ Returns name of inode, or None. """
+        if not 0 <= inode < len(self):
+            return None
+
+        start = self.data_start + int(self.offsets[inode])
+        end = self.data_start + int(self.offsets[inode + 1])
+        if start == end:
+            return None
+
+        return self.mmap[start:end].decode('utf-8')
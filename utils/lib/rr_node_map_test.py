@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import os.path
+import sqlite3
+import tempfile
+import unittest
+
+from lib.rr_graph.graph2 import NodeType
+from .connection_database import create_tables
+from .rr_node_map import (
+    InodeNames, RrNodeMap, inode_names_from_database, write_inode_names,
+    write_rr_node_map
+)
+
+
+class TestRrNodeMap(unittest.TestCase):
+    def test_round_trip(self):
+        node_mapping = {
+            1: (4, NodeType.CHANX),
+            7: (0, NodeType.IPIN),
+            3: (0, NodeType.IPIN),
+            5: (2, NodeType.OPIN),
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = os.path.join(tmp_dir, 'node_map.bin')
+            with open(fname, 'wb') as f:
+                write_rr_node_map(
+                    f,
+                    graph_node_pkeys=list(node_mapping.keys()),
+                    inodes=[inode for inode, _ in node_mapping.values()],
+                    node_types=[
+                        node_type.value
+                        for _, node_type in node_mapping.values()
+                    ],
+                )
+
+            with RrNodeMap(fname) as node_map:
+                for pkey, (inode, node_type) in node_mapping.items():
+                    self.assertEqual(node_map.get_inode(pkey), inode)
+                    self.assertEqual(node_map.get_node_type(inode), node_type)
+
+                self.assertIsNone(node_map.get_inode(0))
+                self.assertIsNone(node_map.get_inode(100))
+
+                self.assertEqual(node_map.get_graph_node_pkey(0), 3)
+                self.assertEqual(node_map.get_graph_node_pkey(2), 5)
+                self.assertEqual(node_map.get_graph_node_pkey(4), 1)
+                self.assertIsNone(node_map.get_graph_node_pkey(1))
+                self.assertIsNone(node_map.get_node_type(3))
+
+                self.assertEqual(
+                    list(node_map.inode_by_pkey[[1, 3, 5]]), [4, 0, 2]
+                )
+
+
+class TestInodeNames(unittest.TestCase):
+    def test_from_database(self):
+        conn = sqlite3.connect(':memory:')
+        create_tables(conn)
+
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT INTO phy_tile(pkey, name) VALUES (?, ?)",
+            [(1, 'INT_L_X0Y0'), (2, 'CLBLL_L_X0Y0')]
+        )
+        cur.executemany(
+            "INSERT INTO wire_in_tile(pkey, name) VALUES (?, ?)",
+            [(1, 'EE2BEG0'), (2, 'CLBLL_L_A')]
+        )
+        cur.executemany(
+            """
+INSERT INTO wire(pkey, node_pkey, phy_tile_pkey, wire_in_tile_pkey)
+VALUES (?, ?, ?, ?)""", [(3, 10, 1, 1), (4, 11, 2, 2), (5, 11, 1, 1)]
+        )
+        cur.executemany(
+            "INSERT INTO graph_node(pkey, node_pkey) VALUES (?, ?)",
+            [(1, 10), (2, 11), (3, 11)]
+        )
+        conn.commit()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            map_fname = os.path.join(tmp_dir, 'node_map.bin')
+            with open(map_fname, 'wb') as f:
+                write_rr_node_map(
+                    f,
+                    graph_node_pkeys=[1, 2, 3],
+                    inodes=[2, 0, 0],
+                    node_types=[
+                        NodeType.CHANX.value, NodeType.IPIN.value,
+                        NodeType.IPIN.value
+                    ],
+                )
+
+            with RrNodeMap(map_fname) as node_map:
+                names = inode_names_from_database(conn, node_map)
+
+            self.assertEqual(
+                names, ['CLBLL_L_X0Y0/CLBLL_L_A', None, 'INT_L_X0Y0/EE2BEG0']
+            )
+
+            names_fname = os.path.join(tmp_dir, 'inode_names.bin')
+            with open(names_fname, 'wb') as f:
+                write_inode_names(f, names)
+
+            with InodeNames(names_fname) as inode_names:
+                self.assertEqual(len(inode_names), 3)
+                self.assertEqual(
+                    [inode_names[idx] for idx in range(4)], names + [None]
+                )
@@ -3,17 +3,123 @@
 This utility script allows to walk through the routing graph from a given
 starting node id to a given target node id. If the target node id is not
 given then it lists all available routes which start at the starting node.
+
+With a target node id, the shortest route to it is found with a bidirectional
+breadth first search. Without one, routes can be limited to a maximum depth.
+
+The graph is stored as compressed sparse row (CSR) arrays, and cached next to
+the routing graph file, so later walks on the same graph skip parsing it.
 """
 
 import sys
 import argparse
 import gc
+import os
+import tempfile
 from collections import namedtuple
 
 import lxml.etree as ET
+import numpy as np
 
 from progressbar import progressbar
 
+# Node type names, in the order of the lib.rr_graph.graph2.NodeType values.
+NODE_TYPES = (
+    "INVALID_NODE_TYPE",
+    "CHANX",
+    "CHANY",
+    "SOURCE",
+    "SINK",
+    "OPIN",
+    "IPIN",
+)
+
+# Increment when the content of the cache file changes.
+CACHE_VERSION = 1
+
+# Arrays stored in the cache file.
+GRAPH_ARRAYS = (
+    "node_type",
+    "xlow",
+    "ylow",
+    "xhigh",
+    "yhigh",
+    "fwd_offsets",
+    "fwd_targets",
+    "bwd_offsets",
+    "bwd_targets",
+)
+
+# =============================================================================
+
+
+def build_csr(keys, values, num_nodes):
+    """
+    Builds compressed sparse row arrays of edges.
+
+    Edges of a node keep their order in the input.
+
+    Args:
+        keys: Array of the node each edge is listed under.
+        values: Array of the other node of each edge.
+        num_nodes: Number of nodes.
+
+    Returns:
+        (offsets, targets) where the edges of node n are
+        targets[offsets[n]:offsets[n + 1]].
+
+    >>> offsets, targets = build_csr(np.array([2, 0, 2]), np.array([0, 1, 1]),
+    ...                              3)
+    >>> offsets.tolist(), targets.tolist()
+    ([0, 1, 1, 3], [1, 0, 1])
+    """
+
+    order = np.argsort(keys, kind="stable")
+
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_nodes), out=offsets[1:])
+
+    return offsets, values[order].astype(np.int32)
+
+
+def csr_neighbors(offsets, targets, nodes):
+    """
+    Gathers the edges of many nodes at once.
+
+    Args:
+        offsets, targets: CSR arrays, see build_csr.
+        nodes: Array of node ids.
+
+    Returns:
+        (sources, neighbors) arrays with one element per edge.
+
+    >>> offsets, targets = build_csr(np.array([2, 0, 2]), np.array([0, 1, 1]),
+    ...                              3)
+    >>> [a.tolist() for a in csr_neighbors(offsets, targets, np.array([2, 0]))]
+    [[2, 2, 0], [0, 1, 1]]
+    """
+
+    starts = offsets[nodes]
+    counts = offsets[nodes + 1] - starts
+
+    # Index of each edge: the start of its node plus its rank within the node.
+    first_edge = np.cumsum(counts) - counts
+    index = np.repeat(starts - first_edge, counts) + np.arange(counts.sum())
+
+    return np.repeat(nodes, counts), targets[index]
+
+
+def get_cache_file_name(rr_graph_file):
+    """
+    Returns the name of the cache file stored next to the routing graph.
+
+    >>> get_cache_file_name("rr_graph.xml")
+    'rr_graph.xml.walk.npz'
+    """
+
+    return rr_graph_file + ".walk.npz"
+
+
 # =============================================================================
 
 
@@ -25,21 +131,82 @@ class RoutingGraph(object):
     Node = namedtuple("Node", "id type xlow ylow xhigh yhigh")
     WalkContext = namedtuple("WalkContext", "node_id depth")
 
-    def __init__(self, xml_file):
+    def __init__(self, rr_graph_file, capnp_schema_file=None, use_cache=True):
         """
         Constructs the graph given a VPR routing graph file
 
         Args:
-            xml_file: Name of the XML file with the graph.
+            rr_graph_file: Name of the XML or capnp file with the graph.
+            capnp_schema_file: Name of the VPR rr graph capnp schema. If given
+                the graph is read as capnp, otherwise as XML.
+            use_cache: Load the graph from, and save it to, the cache file
+                next to the graph file.
         """
 
-        self.nodes = {}
+        self.arrays = None
 
-        self.edges_from = {}
-        self.edges_to = {}
+        cache_file = get_cache_file_name(rr_graph_file)
+        source_stat = os.stat(rr_graph_file)
+        source_key = np.array(
+            [CACHE_VERSION, source_stat.st_size, source_stat.st_mtime_ns],
+            dtype=np.int64
+        )
 
-        # Load and parse the routing graph
-        self._load_and_parse_rr_graph(xml_file)
+        if use_cache and os.path.exists(cache_file):
+            self._load_cache(cache_file, source_key)
+
+        if self.arrays is None:
+            if capnp_schema_file is not None:
+                self._load_capnp(rr_graph_file, capnp_schema_file)
+            else:
+                self._load_and_parse_rr_graph(rr_graph_file)
+
+            if use_cache:
+                self._save_cache(cache_file, source_key)
+
+        for name in GRAPH_ARRAYS:
+            setattr(self, name, self.arrays[name])
+
+        print(
+            "{} nodes, {} edges".format(
+                len(self.node_type), len(self.fwd_targets)
+            )
+        )
+
+    def _set_graph(self, node_ids, node_type, locs, src_nodes, dst_nodes):
+        """
+        Builds the graph arrays from node and edge columns.
+
+        Args:
+            node_ids: Array of node ids.
+            node_type: Array of node type indices into NODE_TYPES.
+            locs: Arrays of xlow, ylow, xhigh and yhigh of the nodes.
+            src_nodes, dst_nodes: Arrays of the edge endpoints.
+        """
+
+        num_nodes = 0
+        if len(node_ids) > 0:
+            num_nodes = int(node_ids.max()) + 1
+
+        # Node ids not present in the graph are INVALID_NODE_TYPE.
+        arrays = {"node_type": np.zeros(num_nodes, dtype=np.int8)}
+        arrays["node_type"][node_ids] = node_type
+
+        for name, loc in zip(("xlow", "ylow", "xhigh", "yhigh"), locs):
+            arrays[name] = np.zeros(num_nodes, dtype=np.int32)
+            arrays[name][node_ids] = loc
+
+        src_nodes = np.asarray(src_nodes, dtype=np.int64)
+        dst_nodes = np.asarray(dst_nodes, dtype=np.int64)
+
+        arrays["fwd_offsets"], arrays["fwd_targets"] = build_csr(
+            src_nodes, dst_nodes, num_nodes
+        )
+        arrays["bwd_offsets"], arrays["bwd_targets"] = build_csr(
+            dst_nodes, src_nodes, num_nodes
+        )
+
+        self.arrays = arrays
 
     def _load_and_parse_rr_graph(self, xml_file):
         """
@@ -49,18 +216,19 @@ class RoutingGraph(object):
             xml_file: Name of the XML file with the graph.
         """
 
-        def append_edge(edge_dict, key_node, target_node):
-            if key_node not in edge_dict.keys():
-                edge_dict[key_node] = [target_node]
-            else:
-                edge_dict[key_node].append(target_node)
-
         print("Loading and parsing XML file...")
 
         # Load and initialize parser
         parser = ET.iterparse(xml_file, events=("start", "end"))
         parser = iter(parser)
 
+        # Node and edge columns
+        node_ids = []
+        node_type = []
+        locs = ([], [], [], [])
+        src_nodes = []
+        dst_nodes = []
+
         # Parse
         expect_nodes = False
         expect_edges = False
@@ -94,24 +262,16 @@ class RoutingGraph(object):
                     xml_loc = element.find("loc")
 
                     # Append the node
-                    node = RoutingGraph.Node(
-                        id=int(element.get("id")),
-                        type=element.get("type"),
-                        xlow=int(xml_loc.get("xlow")),
-                        ylow=int(xml_loc.get("ylow")),
-                        xhigh=int(xml_loc.get("xhigh")),
-                        yhigh=int(xml_loc.get("yhigh"))
-                    )
-                    self.nodes[node.id] = node
+                    node_ids.append(int(element.get("id")))
+                    node_type.append(NODE_TYPES.index(element.get("type")))
+                    for loc, name in zip(locs,
+                                         ("xlow", "ylow", "xhigh", "yhigh")):
+                        loc.append(int(xml_loc.get(name)))
 
                 # Got a complete edge element
                 if expect_edges and element.tag == "edge":
-                    src_node = int(element.get("src_node"))
-                    dst_node = int(element.get("sink_node"))
-
-                    # Append edge
-                    append_edge(self.edges_from, src_node, dst_node)
-                    append_edge(self.edges_to, dst_node, src_node)
+                    src_nodes.append(int(element.get("src_node")))
+                    dst_nodes.append(int(element.get("sink_node")))
 
                 # Clear the element
                 if element.tag != "loc":
@@ -121,8 +281,116 @@ class RoutingGraph(object):
         del parser
         gc.collect()
 
-        print(
-            "{} nodes, {} edges".format(len(self.nodes), len(self.edges_from))
+        self._set_graph(
+            np.array(node_ids, dtype=np.int64),
+            np.array(node_type, dtype=np.int8),
+            [np.array(loc, dtype=np.int32) for loc in locs],
+            src_nodes,
+            dst_nodes,
+        )
+
+    def _load_capnp(self, capnp_file, capnp_schema_file):
+        """
+        Loads the routing graph from a capnp file.
+
+        Requires the utils directory on the PYTHONPATH.
+
+        Args:
+            capnp_file: Name of the capnp file with the graph.
+            capnp_schema_file: Name of the VPR rr graph capnp schema.
+        """
+
+        import capnp
+        from lib.rr_graph_capnp.graph2 import graph_arrays_from_capnp
+
+        print("Loading capnp file...")
+
+        capnp.remove_import_hook()
+        rr_graph_schema = capnp.load(
+            capnp_schema_file,
+            imports=[os.path.dirname(os.path.dirname(capnp.__file__))]
+        )
+
+        nodes, edges = graph_arrays_from_capnp(rr_graph_schema, capnp_file)
+
+        self._set_graph(
+            nodes.column("id").astype(np.int64),
+            nodes.column("type").astype(np.int8),
+            [
+                nodes.column(name)
+                for name in ("x_low", "y_low", "x_high", "y_high")
+            ],
+            edges.src_nodes(),
+            edges.sink_nodes(),
+        )
+
+    def _load_cache(self, cache_file, source_key):
+        """
+        Loads the graph arrays from the cache file, if it is up to date.
+
+        Args:
+            cache_file: Name of the cache file.
+            source_key: Array identifying the graph file the cache must have
+                been made from.
+        """
+
+        try:
+            with np.load(cache_file) as data:
+                if not np.array_equal(data["source_key"], source_key):
+                    return
+
+                arrays = {name: data[name] for name in GRAPH_ARRAYS}
+        except (OSError, KeyError, ValueError) as e:
+            print("Ignoring unreadable cache '{}': {}".format(cache_file, e))
+            return
+
+        print("Loaded graph from '{}'".format(cache_file))
+        self.arrays = arrays
+
+    def _save_cache(self, cache_file, source_key):
+        """
+        Saves the graph arrays to the cache file. The file is written
+        atomically, failing to write it is not an error.
+
+        Args:
+            cache_file: Name of the cache file.
+            source_key: Array identifying the graph file.
+        """
+
+        tmp_file = None
+        try:
+            fd, tmp_file = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(cache_file)),
+                suffix=".tmp"
+            )
+            with os.fdopen(fd, "wb") as fp:
+                np.savez(fp, source_key=source_key, **self.arrays)
+            os.replace(tmp_file, cache_file)
+            tmp_file = None
+        except OSError as e:
+            print("Not caching to '{}': {}".format(cache_file, e))
+        finally:
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def node(self, node_id):
+        """
+        Returns a node
+
+        Args:
+            node_id: Numerical identifier of a graph node
+
+        Returns:
+            A RoutingGraph.Node
+        """
+
+        return RoutingGraph.Node(
+            id=node_id,
+            type=NODE_TYPES[self.node_type[node_id]],
+            xlow=int(self.xlow[node_id]),
+            ylow=int(self.ylow[node_id]),
+            xhigh=int(self.xhigh[node_id]),
+            yhigh=int(self.yhigh[node_id])
         )
 
     def node_to_string(self, node_id):
@@ -136,68 +404,71 @@ class RoutingGraph(object):
             String with a pretty node description
         """
 
-        node = self.nodes[node_id]
+        node = self.node(node_id)
 
         return "%s:%d [%d,%d,%d,%d]" % (
             node.type, node.id, node.xlow, node.ylow, node.xhigh, node.yhigh
         )
 
-    def verify_route(self, route, walk_direction):
+    def edges(self, walk_direction):
         """
-        Checks wheter a given route is valid
+        Returns the CSR arrays of edges in a walk direction
 
         Args:
-            route: Route as a sequence of node ids
-            walk_direction: Direction of the route. When > 0 its along graph
-                edges direction, when < 0 its the opposite direction.
+            walk_direction: When > 0 edges go along graph edges direction,
+                when < 0 in the opposite direction.
 
         Returns:
-            True or False
+            (offsets, targets), see build_csr.
         """
 
-        visited_nodes = set()
+        if walk_direction > 0:
+            return self.fwd_offsets, self.fwd_targets
+        else:
+            return self.bwd_offsets, self.bwd_targets
 
-        # Walk through the route
-        for i in range(len(route) - 1):
-
-            # Get nodes
-            src_id = route[i]
-            dst_id = route[i + 1]
+    def neighbors(self, node_id, walk_direction):
+        """
+        Returns the nodes reachable from a node through one edge
 
-            # Find edge from src to dst
-            edge_valid = False
+        Args:
+            node_id: Numerical identifier of a graph node
+            walk_direction: Direction of the edges, see edges().
 
-            if walk_direction > 0:
-                if src_id in self.edges_from:
-                    for dst in self.edges_from[src_id]:
-                        if dst == dst_id:
-                            edge_valid = True
-                            break
+        Returns:
+            Array of node ids
+        """
 
-            if walk_direction < 0:
-                if src_id in self.edges_to:
-                    for dst in self.edges_to[src_id]:
-                        if dst == dst_id:
-                            edge_valid = True
-                            break
+        offsets, targets = self.edges(walk_direction)
+        return targets[offsets[node_id]:offsets[node_id + 1]]
 
-            # Edge not valid
-            if not edge_valid:
-                return False
+    def verify_route(self, route, walk_direction):
+        """
+        Checks wheter a given route is valid
 
-            # We have already been there
-            if src_id in visited_nodes:
-                return False
+        Args:
+            route: Route as a sequence of node ids
+            walk_direction: Direction of the route. When > 0 its along graph
+                edges direction, when < 0 its the opposite direction.
 
-            visited_nodes.add(src_id)
+        Returns:
+            True or False
+        """
 
-        # Check the last node
-        if route[-1] in visited_nodes:
+        # A node must not be visited twice
+        if len(set(route)) != len(route):
             return False
 
+        # There must be an edge from each node to the next one
+        for src_id, dst_id in zip(route[:-1], route[1:]):
+            if not np.any(self.neighbors(src_id, walk_direction) == dst_id):
+                return False
+
         return True
 
-    def walk(self, start_node_id, route_callback, walk_direction):
+    def walk(
+            self, start_node_id, route_callback, walk_direction, max_depth=None
+    ):
         """
         Walk the routing graph from a given starting node id.
 
@@ -210,10 +481,15 @@ class RoutingGraph(object):
                 route found starting from the start node id and ending on
                 a graph leaf. If the function returns False then the walk
                 stops, if returns true then the walk continues.
+            max_depth: If given, nodes max_depth edges away from the start
+                node are treated as leaves.
         """
 
-        # Copy all nodes. A node is removed from this set once visited.
-        walk_nodes = set([node.id for node in self.nodes.values()])
+        offsets, targets = self.edges(walk_direction)
+
+        # A node is marked once visited.
+        visited = np.zeros(len(self.node_type), dtype=bool)
+        visited[start_node_id] = True
 
         # Add the starting node id
         stack = list()
@@ -236,33 +512,20 @@ class RoutingGraph(object):
             # Add all nodes that can be reached from this one through edges
             is_leaf = True
 
-            # Walking forward
-            if walk_direction > 0:
-                if context.node_id in self.edges_from.keys():
-                    for dst in self.edges_from[context.node_id]:
-                        # We haven't visited the target
-                        if dst in walk_nodes:
-                            stack.append(
-                                RoutingGraph.WalkContext(
-                                    dst, context.depth + 1
-                                )
-                            )
-                            walk_nodes.remove(dst)
-                            is_leaf = False
-
-            # Walking backward
-            if walk_direction < 0:
-                if context.node_id in self.edges_to.keys():
-                    for src in self.edges_to[context.node_id]:
-                        # We haven't visited the target
-                        if src in walk_nodes:
-                            stack.append(
-                                RoutingGraph.WalkContext(
-                                    src, context.depth + 1
-                                )
-                            )
-                            walk_nodes.remove(src)
-                            is_leaf = False
+            if max_depth is None or context.depth < max_depth:
+                node_targets = targets[offsets[context.
+                                               node_id]:offsets[context.node_id
+                                                                + 1]]
+                for dst in node_targets[~visited[node_targets]].tolist():
+                    # The same node may be listed by several edges
+                    if visited[dst]:
+                        continue
+
+                    stack.append(
+                        RoutingGraph.WalkContext(dst, context.depth + 1)
+                    )
+                    visited[dst] = True
+                    is_leaf = False
 
             # We are in a leaf node
             if is_leaf:
@@ -278,6 +541,97 @@ class RoutingGraph(object):
                 if not res:
                     return
 
+    def shortest_route(self, start_node_id, end_node_id, walk_direction):
+        """
+        Finds a shortest route between two nodes with a bidirectional
+        breadth first search.
+
+        Args:
+            start_node_id: Identifier of the starting node.
+            end_node_id: Identifier of the target node.
+            walk_direction: Direction of the route. When > 0 its along graph
+                edges direction, when < 0 its the opposite direction.
+
+        Returns:
+            Route as a list of node ids from the start node to the target
+            node, or None if the target is not reachable.
+        """
+
+        if start_node_id == end_node_id:
+            return [start_node_id]
+
+        num_nodes = len(self.node_type)
+
+        # One search from each end. Each side walks its own edge direction,
+        # the target side walks the edges backwards.
+        sides = []
+        for node_id, direction in ((start_node_id, walk_direction),
+                                   (end_node_id, -walk_direction)):
+            parent = np.full(num_nodes, -1, dtype=np.int32)
+            parent[node_id] = node_id
+            distance = np.full(num_nodes, -1, dtype=np.int32)
+            distance[node_id] = 0
+            sides.append(
+                {
+                    "edges": self.edges(direction),
+                    "parent": parent,
+                    "distance": distance,
+                    "frontier": np.array([node_id], dtype=np.int64),
+                    "depth": 0,
+                }
+            )
+
+        meet_node = None
+        while meet_node is None:
+            if len(sides[0]["frontier"]) == 0 or len(sides[1]["frontier"]
+                                                     ) == 0:
+                return None
+
+            # Expand the smaller frontier by one level
+            if len(sides[0]["frontier"]) <= len(sides[1]["frontier"]):
+                this, other = sides
+            else:
+                other, this = sides
+
+            sources, neighbors = csr_neighbors(
+                *this["edges"], this["frontier"]
+            )
+
+            is_new = this["parent"][neighbors] == -1
+            sources = sources[is_new]
+            neighbors = neighbors[is_new]
+
+            # Keep the first edge reaching each new node
+            neighbors, first = np.unique(neighbors, return_index=True)
+            sources = sources[first]
+
+            this["depth"] += 1
+            this["parent"][neighbors] = sources
+            this["distance"][neighbors] = this["depth"]
+            this["frontier"] = neighbors.astype(np.int64)
+
+            # All new nodes have the same distance on this side, take the
+            # one closest to the other end.
+            other_distance = other["distance"][neighbors]
+            meets = np.flatnonzero(other_distance >= 0)
+            if len(meets) > 0:
+                meet_node = int(
+                    neighbors[meets[np.argmin(other_distance[meets])]]
+                )
+
+        def trace(parent, node_id):
+            nodes = [node_id]
+            while parent[node_id] != node_id:
+                node_id = int(parent[node_id])
+                nodes.append(node_id)
+            return nodes
+
+        route = trace(sides[0]["parent"], meet_node)
+        route.reverse()
+        route += trace(sides[1]["parent"], meet_node)[1:]
+
+        return route
+
 
 # =============================================================================
 
@@ -330,7 +684,23 @@ def main():
     )
 
     parser.add_argument(
-        "--rr_graph", type=str, required=True, help="Routing graph XML file"
+        "--rr_graph",
+        type=str,
+        required=True,
+        help="Routing graph XML or capnp file"
+    )
+    parser.add_argument(
+        "--vpr_capnp_schema_dir",
+        type=str,
+        default=None,
+        help="Directory with the VPR capnp schema files. When specified the "
+        "routing graph is read as capnp."
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Do not load the graph from, or save it to, the cache file next "
+        "to the routing graph file."
     )
     parser.add_argument(
         "-s",
@@ -344,8 +714,15 @@ def main():
         "--end_inode",
         type=int,
         default=-1,
-        help="End node id. If not specified then all reachable"
-        "leaf nodes will be reported."
+        help="End node id. If specified the shortest route to it is reported."
+        " If not specified then all reachable leaf nodes will be reported."
+    )
+    parser.add_argument(
+        "--max_depth",
+        type=int,
+        default=None,
+        help="When specified routes are not walked further than this number "
+        "of edges from the start node."
     )
     parser.add_argument(
         "--route",
@@ -372,8 +749,18 @@ def main():
 
     args = parser.parse_args()
 
+    capnp_schema_file = None
+    if args.vpr_capnp_schema_dir is not None:
+        capnp_schema_file = os.path.join(
+            args.vpr_capnp_schema_dir, "rr_graph_uxsdcxx.capnp"
+        )
+
     # Load the routing graph
-    rr_graph = RoutingGraph(args.rr_graph)
+    rr_graph = RoutingGraph(
+        args.rr_graph,
+        capnp_schema_file=capnp_schema_file,
+        use_cache=not args.no_cache
+    )
 
     # Open the route file
     route_file = open(args.route, "w")
@@ -384,7 +771,7 @@ def main():
         nonlocal target_reached
 
         # Get endpoint
-        endpoint = graph.nodes[route[-1]]
+        endpoint = graph.node(route[-1])
 
         # Check if we hit CHANX/CHANY if we do not want to output them then
         # skip those routes.
@@ -392,11 +779,6 @@ def main():
             if endpoint.type == "CHANX" or endpoint.type == "CHANY":
                 return True
 
-        # If we are looking for a particular target node then do not save/print
-        # other routes.
-        if args.end_inode >= 0 and endpoint.id != args.end_inode:
-            return True
-
         # Save the route
         save_route(route, route_file)
 
@@ -405,18 +787,12 @@ def main():
             print_route(graph, route)
 
         # Hit anything
-        if args.end_inode < 0:
-            target_reached = True
-
-        # Hit target, stop
-        if args.end_inode == endpoint.id:
-            target_reached = True
-            return False
+        target_reached = True
 
         return True
 
     # Determine walk direction
-    node = rr_graph.nodes[args.start_inode]
+    node = rr_graph.node(args.start_inode)
 
     if node.type == "SOURCE" or node.type == "OPIN":
         walk_direction = +1
@@ -431,8 +807,27 @@ def main():
     else:
         print("...")
 
-    # Start the walk
-    rr_graph.walk(args.start_inode, route_callback, walk_direction)
+    if args.end_inode >= 0:
+        # Find the shortest route to the target
+        route = rr_graph.shortest_route(
+            args.start_inode, args.end_inode, walk_direction
+        )
+
+        if route is not None:
+            assert rr_graph.verify_route(route, walk_direction), route
+            save_route(route, route_file)
+            if args.print:
+                print_route(rr_graph, route)
+            target_reached = True
+
+    else:
+        # Start the walk
+        rr_graph.walk(
+            args.start_inode,
+            route_callback,
+            walk_direction,
+            max_depth=args.max_depth
+        )
 
     # Check if we have reached the target
     if not target_reached:
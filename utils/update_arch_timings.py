@@ -1,9 +1,27 @@
 #!/usr/bin/env python3
+""" Fill in the timings of an arch.xml from SDF files.
+
+Parsing the SDF files dominates the runtime, and the same SDF directory is
+used to annotate the arch.xml of every device variant.  The merged timings of
+an SDF directory are therefore cached in --cache_dir, keyed by a fingerprint
+of the SDF files and the sdf_timing library.  Without --cache_dir nothing is
+cached.  With --jobs, the SDF files are parsed in a pool of worker processes.
+
+The output arch.xml may be written to stdout, so diagnostics go to stderr.
+"""
 import lxml.etree as ET
 import argparse
+import contextlib
+import sdf_timing
 from sdf_timing import sdfparse
 from sdf_timing.utils import get_scale_seconds
 from lib.pb_type import get_pb_type_chain
+from lib.connection_database import fingerprint_inputs
+from lib.prjxray_database import get_cache_file_name, load_cached, \
+    remove_stale_cache_files
+import glob
+import hashlib
+import multiprocessing
 import re
 import os
 import sys
@@ -12,6 +30,9 @@ import sys
 # in bels.json
 DEBUG = False
 
+# Increment when the content of the cached timings changes.
+TIMINGS_CACHE_VERSION = 1
+
 
 def mergedicts(source, destination):
     """This function recursively merges two dictionaries:
@@ -115,10 +136,102 @@ def find_timings(timings, bel, location, site, bels, corner, speed_type):
     return bel_timings
 
 
-def get_bel_timings(element, timings, bels, corner, speed_type):
+def parse_sdf_file(file_name):
+    """Returns timings parsed from SDF file `file_name`"""
+    with open(file_name, 'r') as fp:
+        return sdfparse.parse(fp.read())
+
+
+def parse_sdf_files(file_names, jobs=1):
+    """Parses SDF files and returns their timings merged in
+       file order, in a pool of `jobs` worker processes if
+       jobs > 1"""
+    timings = dict()
+
+    if jobs > 1:
+        with multiprocessing.Pool(processes=jobs) as pool:
+            for tmp in pool.imap(parse_sdf_file, file_names):
+                mergedicts(tmp, timings)
+    else:
+        for file_name in file_names:
+            mergedicts(parse_sdf_file(file_name), timings)
+
+    return timings
+
+
+def get_timings_fingerprint(file_names):
+    """Returns fingerprint of SDF files and the sdf_timing library"""
+    sdf_timing_dir = os.path.dirname(sdf_timing.__file__)
+    paths = list(file_names)
+    paths += glob.glob(os.path.join(sdf_timing_dir, '*.py'))
+
+    return fingerprint_inputs(
+        paths,
+        values=(
+            TIMINGS_CACHE_VERSION,
+            '{}.{}'.format(*sys.version_info[:2]),
+        )
+    )
+
+
+def load_timings(sdf_dir, jobs=1, cache_dir=None):
+    """Returns merged timings of all SDF files in `sdf_dir`,
+       loaded from the cache in `cache_dir` if possible"""
+    # Keep cache and parser messages out of an arch.xml written to stdout.
+    with contextlib.redirect_stdout(sys.stderr):
+        return _load_timings(sdf_dir, jobs, cache_dir)
+
+
+def _load_timings(sdf_dir, jobs, cache_dir):
+    file_names = sorted(glob.glob(os.path.join(sdf_dir, '*.sdf')))
+
+    def load():
+        return parse_sdf_files(file_names, jobs)
+
+    if cache_dir is None:
+        return load()
+
+    # Name cache files after the SDF directory, so directories of different
+    # families do not invalidate each other.
+    name = 'sdf_timings-{}'.format(
+        hashlib.sha256(os.path.abspath(sdf_dir).encode('utf-8')
+                       ).hexdigest()[:16]
+    )
+    cache_file_name = get_cache_file_name(
+        cache_dir, name, get_timings_fingerprint(file_names)
+    )
+    if not os.path.exists(cache_file_name):
+        remove_stale_cache_files(cache_dir, name, cache_file_name)
+
+    return load_cached(cache_file_name, load)
+
+
+class BelTimings(object):
+    """Memoizes find_timings for each (site, location, bel,
+       corner, speed_type), as many arch.xml elements share
+       the same bel"""
+
+    def __init__(self, timings, bels):
+        self.timings = timings
+        self.bels = bels
+        self.cache = {}
+
+    def find_timings(self, bel, location, site, corner, speed_type):
+        key = (site, location, bel, corner, speed_type)
+        if key not in self.cache:
+            self.cache[key] = find_timings(
+                self.timings, bel, location, site, self.bels, corner,
+                speed_type
+            )
+
+        return self.cache[key]
+
+
+def get_bel_timings(element, lookup, corner, speed_type):
     """This function returns all the timings for an arch.xml
-       `element`. It determines the bel location by traversing
-       the pb_type chain"""
+       `element`, looked up in BelTimings `lookup`. It
+       determines the bel location by traversing the pb_type
+       chain"""
     pb_chain = get_pb_type_chain(element)
     if len(pb_chain) == 1:
         return None
@@ -131,9 +244,7 @@ def get_bel_timings(element, timings, bels, corner, speed_type):
     location = pb_chain[-2]
     site = remove_site_number(pb_chain[1])
 
-    result = find_timings(
-        timings, bel, location, site, bels, corner, speed_type
-    )
+    result = lookup.find_timings(bel, location, site, corner, speed_type)
 
     if DEBUG:
         print(site, bel, location, result is not None, file=sys.stderr)
@@ -156,6 +267,16 @@ def main():
         required=True,
         help="VPR <-> timing info bels mapping json file"
     )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes used to parse SDF files',
+    )
+    parser.add_argument(
+        '--cache_dir',
+        help='Directory to cache the parsed SDF files in, none if not given',
+    )
 
     args = parser.parse_args()
 
@@ -167,23 +288,19 @@ def main():
     with open(args.bels_map, 'r') as fp:
         bels = json.load(fp)
 
-    timings = dict()
-    files = os.listdir(args.sdf_dir)
-    for f in files:
-        if not f.endswith('.sdf'):
-            continue
-        with open(args.sdf_dir + '/' + f, 'r') as fp:
-            tmp = sdfparse.parse(fp.read())
-            mergedicts(tmp, timings)
+    timings = load_timings(args.sdf_dir, args.jobs, args.cache_dir)
+
+    if DEBUG:
+        with open("/tmp/dump.json", 'w') as fp:
+            json.dump(timings, fp, indent=4)
 
-    with open("/tmp/dump.json", 'w') as fp:
-        json.dump(timings, fp, indent=4)
+    lookup = BelTimings(timings, bels)
 
     for dm in root_element.iter('delay_matrix'):
         if dm.attrib['type'] == 'max':
-            bel_timings = get_bel_timings(dm, timings, bels, 'SLOW', 'max')
+            bel_timings = get_bel_timings(dm, lookup, 'SLOW', 'max')
         elif dm.attrib['type'] == 'min':
-            bel_timings = get_bel_timings(dm, timings, bels, 'FAST', 'min')
+            bel_timings = get_bel_timings(dm, lookup, 'FAST', 'min')
         else:
             assert dm.attrib['type']
 
@@ -194,32 +311,32 @@ def main():
 
     for dc in root_element.iter('delay_constant'):
         format_s = dc.attrib['max']
-        max_tim = get_bel_timings(dc, timings, bels, 'SLOW', 'max')
+        max_tim = get_bel_timings(dc, lookup, 'SLOW', 'max')
         if max_tim is not None:
             dc.attrib['max'] = format_s.format(**max_tim)
 
-        min_tim = get_bel_timings(dc, timings, bels, 'FAST', 'min')
+        min_tim = get_bel_timings(dc, lookup, 'FAST', 'min')
         if min_tim is not None:
             dc.attrib['min'] = format_s.format(**min_tim)
 
     for tq in root_element.iter('T_clock_to_Q'):
         format_s = tq.attrib['max']
-        max_tim = get_bel_timings(tq, timings, bels, 'SLOW', 'max')
+        max_tim = get_bel_timings(tq, lookup, 'SLOW', 'max')
         if max_tim is not None:
             tq.attrib['max'] = format_s.format(**max_tim)
 
-        min_tim = get_bel_timings(tq, timings, bels, 'FAST', 'min')
+        min_tim = get_bel_timings(tq, lookup, 'FAST', 'min')
         if min_tim is not None:
             tq.attrib['min'] = format_s.format(**min_tim)
 
     for ts in root_element.iter('T_setup'):
-        bel_timings = get_bel_timings(ts, timings, bels, 'SLOW', 'max')
+        bel_timings = get_bel_timings(ts, lookup, 'SLOW', 'max')
         if bel_timings is None:
             continue
         ts.attrib['value'] = ts.attrib['value'].format(**bel_timings)
 
     for th in root_element.iter('T_hold'):
-        bel_timings = get_bel_timings(th, timings, bels, 'FAST', 'min')
+        bel_timings = get_bel_timings(th, lookup, 'FAST', 'min')
         if bel_timings is None:
             continue
         th.attrib['value'] = th.attrib['value'].format(**bel_timings)
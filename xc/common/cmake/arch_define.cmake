@@ -142,12 +142,14 @@ function(ADD_XC_ARCH_DEFINE)
       ${symbiflow-arch-defs_SOURCE_DIR}/xc/common/utils/prjxray_routing_import.py
     RR_PATCH_CMD "${CMAKE_COMMAND} -E env \
     PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils:${symbiflow-arch-defs_BINARY_DIR}/utils \
+    PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR} \
         \${PYTHON3} \${RR_PATCH_TOOL} \
         --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH} \
         --part \${PART} \
         --read_rr_graph \${OUT_RRXML_VIRT} \
         --write_rr_graph \${OUT_RRXML_REAL} \
-        --write_rr_node_map \${OUT_RRXML_REAL}.node_map.pickle \
+        --write_rr_node_map \${OUT_RRXML_REAL}.node_map.bin \
+        --write_rr_inode_names \${OUT_RRXML_REAL}.inode_names.bin \
         --vpr_capnp_schema_dir ${VPR_CAPNP_SCHEMA_DIR}
         "
     PLACE_TOOL
@@ -79,13 +79,14 @@ function(PROJECT_RAY_ARCH)
   set(VPR_GRID_MAP
     ${symbiflow-arch-defs_SOURCE_DIR}/xc/${FAMILY}/archs/${ARCH}/channels/${PART}/vpr_grid_map.csv)
   get_file_location(VPR_GRID_MAP_LOCATION ${VPR_GRID_MAP})
+  string(REGEX REPLACE "\\.csv$" ".bin" VPR_GRID_MAP_BINARY_LOCATION ${VPR_GRID_MAP_LOCATION})
 
   if(NOT "${PROJECT_RAY_ARCH_USE_ROI}" STREQUAL "")
     set(SYNTH_DEPS "")
     append_file_dependency(SYNTH_DEPS ${GENERIC_CHANNELS})
     add_custom_command(
       OUTPUT synth_tiles.json
-      COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+      COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
       ${PYTHON3} ${CREATE_SYNTH_TILES}
         --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
         --part ${PART}
@@ -121,7 +122,7 @@ function(PROJECT_RAY_ARCH)
     append_file_dependency(SYNTH_DEPS ${GENERIC_CHANNELS})
     add_custom_command(
       OUTPUT synth_tiles.json
-      COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+      COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
       ${PYTHON3} ${CREATE_SYNTH_TILES}
         --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
         --part ${PART}
@@ -154,14 +155,15 @@ function(PROJECT_RAY_ARCH)
   list(APPEND CHANNELS_DEPS ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/${PART}/tileconn.json)
 
   add_custom_command(
-    OUTPUT channels.db vpr_grid_map.csv
-    COMMAND ${CMAKE_COMMAND} -E copy ${GENERIC_CHANNELS_LOCATION} ${CMAKE_CURRENT_BINARY_DIR}/channels.db
+    OUTPUT channels.db vpr_grid_map.csv vpr_grid_map.bin
     COMMAND ${CMAKE_COMMAND} -E copy ${VPR_GRID_MAP_LOCATION} ${CMAKE_CURRENT_BINARY_DIR}/vpr_grid_map.csv
-    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+    COMMAND ${CMAKE_COMMAND} -E copy ${VPR_GRID_MAP_BINARY_LOCATION} ${CMAKE_CURRENT_BINARY_DIR}/vpr_grid_map.bin
+    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
     ${PYTHON3} ${CREATE_EDGES}
       --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
       --part ${PART}
       --pin_assignments ${PIN_ASSIGNMENTS}
+      --generic_connection_database ${GENERIC_CHANNELS_LOCATION}
       --connection_database ${CMAKE_CURRENT_BINARY_DIR}/channels.db
       ${ROI_ARG_FOR_CREATE_EDGES}
     DEPENDS
@@ -185,7 +187,7 @@ function(PROJECT_RAY_ARCH)
 
   add_custom_command(
     OUTPUT arch.xml
-    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
     ${PYTHON3} ${ARCH_IMPORT}
       --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
       --part ${PART}
@@ -238,9 +240,10 @@ function(PROJECT_RAY_PREPARE_DATABASE)
     file(MAKE_DIRECTORY ${CMAKE_CURRENT_BINARY_DIR}/channels/${PART})
     set(CHANNELS channels/${PART}/channels.db)
     set(VPR_GRID_MAP channels/${PART}/vpr_grid_map.csv)
+    set(VPR_GRID_MAP_BINARY channels/${PART}/vpr_grid_map.bin)
     add_custom_command(
-      OUTPUT ${CHANNELS} ${VPR_GRID_MAP}
-      COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+      OUTPUT ${CHANNELS} ${VPR_GRID_MAP} ${VPR_GRID_MAP_BINARY}
+      COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
       ${PYTHON3} ${FORM_CHANNELS}
       --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
       --part ${PROTOTYPE_PART}
@@ -268,7 +271,7 @@ function(PROJECT_RAY_PREPARE_DATABASE)
   set(PIN_ASSIGNMENTS pin_assignments.json)
   add_custom_command(
     OUTPUT ${PIN_ASSIGNMENTS}
-    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
     ${PYTHON3} ${ASSIGN_PINS}
     --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
     --part ${PROTOTYPE_PART}
@@ -389,7 +392,7 @@ function(PROJECT_RAY_TILE)
 
   add_custom_command(
     OUTPUT ${TILE}.pb_type.xml ${TILE}.model.xml
-    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
     ${PYTHON3} ${TILE_IMPORT}
     --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
     --part ${PROTOTYPE_PART}
@@ -694,7 +697,7 @@ function(PROJECT_RAY_TILE_CAPACITY)
 
   add_custom_command(
     OUTPUT ${TILE_LOWER}.tile.xml
-    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils
+    COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PRJRAY_DIR}:${symbiflow-arch-defs_SOURCE_DIR}/utils PRJXRAY_DB_CACHE_DIR=${PRJXRAY_DB_CACHE_DIR}
     ${PYTHON3} ${TILE_CAPACITY_IMPORT}
       --db_root ${PRJRAY_DB_DIR}/${PRJRAY_ARCH}/
       --part ${PROTOTYPE_PART}
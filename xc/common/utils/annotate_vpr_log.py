@@ -1,20 +1,31 @@
-"""
+""" Annotate rr inodes in a VPR log (read from stdin) with tile/wire names.
+
+Names are looked up either from the inode names table written by
+prjxray_routing_import --write_rr_inode_names (fast), or from the rr node map
+and connection database.
 
 """
 import argparse
 import functools
-import pickle
 import re
 import sqlite3
 import sys
 
+from lib.rr_node_map import InodeNames, RrNodeMap
+
+NODE_RE = re.compile('(node|rt_node:) ([1-9][0-9]*)')
+
+# Size of the chunks of the log processed at once, in characters.
+CHUNK_SIZE = 1024 * 1024
 
-def create_lookup_inode(conn, inode_to_graph_map):
+
+def create_lookup_inode(conn, node_map):
     cur = conn.cursor()
 
     @functools.lru_cache(maxsize=1024 * 1024)
     def lookup_inode(inode):
-        if inode not in inode_to_graph_map:
+        graph_node_pkey = node_map.get_graph_node_pkey(inode)
+        if graph_node_pkey is None:
             return '{}'.format(inode)
         else:
             cur.execute(
@@ -25,7 +36,7 @@ INNER JOIN wire ON graph_node.node_pkey = wire.node_pkey
 INNER JOIN wire_in_tile ON wire.wire_in_tile_pkey = wire_in_tile.pkey
 INNER JOIN phy_tile ON wire.phy_tile_pkey = phy_tile.pkey
 WHERE graph_node.pkey = ?
-LIMIT 1;""", (inode_to_graph_map[inode], )
+LIMIT 1;""", (graph_node_pkey, )
             )
             tile, wire = cur.fetchone()
 
@@ -34,33 +45,73 @@ LIMIT 1;""", (inode_to_graph_map[inode], )
     return lookup_inode
 
 
-def main():
-    parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument('--rrgraph_node_map', required=True)
-    parser.add_argument('--connection_database', required=True)
+def create_lookup_inode_from_names(inode_names):
+    def lookup_inode(inode):
+        name = inode_names[inode]
+        if name is None:
+            return '{}'.format(inode)
+        else:
+            return '{} ({})'.format(name, inode)
 
-    args = parser.parse_args()
+    return lookup_inode
 
-    with open(args.rrgraph_node_map, 'rb') as f:
-        node_map = pickle.load(f)
 
-    inode_to_graph_map = {}
-    for graph_node_pkey, rr_inode in node_map.items():
-        assert rr_inode not in inode_to_graph_map
-        inode_to_graph_map[rr_inode] = graph_node_pkey
+def annotate_log(lookup_inode, in_f, out_f):
+    """ Copy in_f to out_f, replacing inodes using lookup_inode.
 
-    conn = sqlite3.connect(
-        'file:{}?mode=ro'.format(args.connection_database), uri=True
-    )
+    The log is processed in chunks of whole lines, so each chunk needs a
+    single regex pass.
 
-    lookup_inode = create_lookup_inode(conn, inode_to_graph_map)
+    """
 
     def replace_inode(match):
         return match.group(1) + ' ' + lookup_inode(int(match.group(2)))
 
-    NODE_RE = re.compile('(node|rt_node:) ([1-9][0-9]*)')
-    for line in sys.stdin:
-        sys.stdout.write(NODE_RE.sub(replace_inode, line))
+    remainder = ''
+    while True:
+        chunk = in_f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+
+        chunk = remainder + chunk
+        end = chunk.rfind('\n') + 1
+        remainder = chunk[end:]
+        out_f.write(NODE_RE.sub(replace_inode, chunk[:end]))
+
+    out_f.write(NODE_RE.sub(replace_inode, remainder))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rrgraph_node_map')
+    parser.add_argument('--connection_database')
+    parser.add_argument(
+        '--inode_names',
+        help='Inode names table from prjxray_routing_import. '
+        'If given, --rrgraph_node_map and --connection_database are not used.'
+    )
+
+    args = parser.parse_args()
+
+    if args.inode_names:
+        inode_names = InodeNames(args.inode_names)
+        lookup_inode = create_lookup_inode_from_names(inode_names)
+    else:
+        if not args.rrgraph_node_map or not args.connection_database:
+            parser.error(
+                '--rrgraph_node_map and --connection_database are required '
+                'without --inode_names'
+            )
+
+        node_map = RrNodeMap(args.rrgraph_node_map)
+
+        conn = sqlite3.connect(
+            'file:{}?mode=ro'.format(args.connection_database), uri=True
+        )
+
+        lookup_inode = create_lookup_inode(conn, node_map)
+
+    annotate_log(lookup_inode, sys.stdin, sys.stdout)
 
 
 if __name__ == "__main__":
@@ -11,7 +11,6 @@ IO placement spefications to target the synthetic IO pads.
 """
 from __future__ import print_function
 import argparse
-import prjxray.db
 from prjxray.roi import Roi
 from prjxray.overlay import Overlay
 from prjxray import grid_types
@@ -22,6 +21,22 @@ import lxml.etree as ET
 
 from prjxray_db_cache import DatabaseCache
 from prjxray_tile_import import add_vpr_tile_prefix
+from lib.prjxray_database import load_database
+
+# Connection database tables used by this script.
+ARCH_IMPORT_TABLES = (
+    'phy_tile',
+    'segment',
+    'site',
+    'site_as_tile',
+    'site_instance',
+    'site_type',
+    'switch',
+    'tile',
+    'tile_map',
+    'tile_type',
+    'wire_in_tile',
+)
 
 
 def create_synth_io_tile(
@@ -985,7 +1000,7 @@ def main():
         )
 
     layout_xml = ET.SubElement(arch_xml, 'layout')
-    db = prjxray.db.Database(args.db_root, args.part)
+    db = load_database(args.db_root, args.part)
     g = db.grid()
 
     synth_tiles = {}
@@ -1107,7 +1122,10 @@ def main():
 
         create_synth_pb_types(model_xml, complexblocklist_xml, True)
 
-    with DatabaseCache(args.connection_database, read_only=True) as conn:
+    # Only the tile and site tables are used, the (large) wire, node and graph
+    # tables are not loaded.
+    with DatabaseCache(args.connection_database, read_only=True,
+                       tables=ARCH_IMPORT_TABLES) as conn:
         c = conn.cursor()
 
         if 'GND' not in synth_tile_map:
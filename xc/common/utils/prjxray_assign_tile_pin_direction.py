@@ -15,19 +15,21 @@ prjxray_assign_tile_pin_direction.
 """
 import argparse
 from collections import namedtuple
-import prjxray.db
-import prjxray.tile
+import glob
+import os.path
 import simplejson as json
 from lib.rr_graph import tracks
 from lib.connection_database import (
     NodeClassification, yield_logical_wire_info_from_node, get_track_model,
-    node_to_site_pins, get_pin_name_of_wire
+    node_to_site_pins, get_pin_name_of_wire, fingerprint_inputs,
+    read_stage_fingerprint
 )
 from prjxray_constant_site_pins import yield_ties_to_wire
 from lib import progressbar_utils
 import datetime
 
 from prjxray_db_cache import DatabaseCache
+from lib.prjxray_database import load_database
 
 now = datetime.datetime.now
 DirectConnection = namedtuple(
@@ -433,6 +435,34 @@ WHERE pkey in (
     return edge_assignments, wires_in_tile_types
 
 
+def get_inputs_fingerprint(connection_database, part):
+    """ Returns fingerprint of the inputs of prjxray_assign_tile_pin_direction.
+
+    Returns None if the connection database does not record the fingerprint
+    of prjxray_form_channels, in which case the inputs are unknown.
+
+    """
+    form_channels_fingerprint = read_stage_fingerprint(
+        connection_database, 'form_channels'
+    )
+    if form_channels_fingerprint is None:
+        return None
+
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = glob.glob(os.path.join(utils_dir, 'prjxray_*.py'))
+
+    return fingerprint_inputs(paths, values=(form_channels_fingerprint, part))
+
+
+def read_fingerprint(fname):
+    """ Returns fingerprint stored in fname, or None. """
+    if not os.path.exists(fname):
+        return None
+
+    with open(fname) as f:
+        return f.read().strip()
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -453,7 +483,27 @@ Output JSON assigning pins to tile types and direction connections""",
 
     args = parser.parse_args()
 
-    db = prjxray.db.Database(args.db_root, args.part)
+    # The fingerprint of the inputs is stored next to the pin assignments,
+    # and the pin assignments are only recomputed if the inputs changed.
+    fingerprint_file = args.pin_assignments + '.fingerprint'
+    fingerprint = get_inputs_fingerprint(args.connection_database, args.part)
+    unchanged = (
+        fingerprint is not None and os.path.exists(args.pin_assignments)
+        and read_fingerprint(fingerprint_file) == fingerprint
+    )
+    if unchanged:
+        print(
+            '{} Inputs unchanged, keeping "{}"'.format(
+                now(), args.pin_assignments
+            )
+        )
+        os.utime(args.pin_assignments)
+        return
+
+    if os.path.exists(fingerprint_file):
+        os.remove(fingerprint_file)
+
+    db = load_database(args.db_root, args.part)
 
     edge_assignments = {}
 
@@ -637,6 +687,10 @@ Output JSON assigning pins to tile types and direction connections""",
                 indent=2
             )
 
+        if fingerprint is not None:
+            with open(fingerprint_file, 'w') as f:
+                f.write(fingerprint)
+
         print(
             '{} Flushing database back to file "{}"'.format(
                 now(), args.connection_database
@@ -11,7 +11,9 @@ Add graph_nodes for all IPIN's and OPIN's in the grid based on pin assignments.
 Collect tracks used by the ROI (if in used) to prevent tracks from being used
 twice.
 
-Make graph edges based on pips in every tile.
+Make graph edges based on pips in every tile.  With --jobs, tiles are split
+into shards that are converted to edges in parallel worker processes, and the
+edges are merged back in tile order.
 
 Compute which routing tracks are alive based on whether they have at least one
 edge that sinks and one edge that sources the routing node.
@@ -19,12 +21,26 @@ edge that sinks and one edge that sources the routing node.
 Build final channels based on alive tracks and insert dummy CHANX or CHANY to
 fill empty spaces.  This is required by VPR to allocate the right data.
 
+With --generic_connection_database, the connection database is first copied
+from the generic connection database, and edges are only created again if the
+inputs changed since the connection database was last written.
+
 """
 
 import argparse
 import datetime
+import glob
+import os.path
+import shutil
 import sqlite3
 
+from lib.connection_database import (
+    fingerprint_inputs,
+    get_code_sources,
+    read_stage_fingerprint,
+    set_stage_fingerprint,
+)
+
 from prjxray_edge_library import (
     create_edges,
     build_channels,
@@ -35,6 +51,42 @@ from prjxray_edge_library import (
 )
 
 
+def get_inputs_fingerprint(args):
+    """ Returns fingerprint of the inputs of prjxray_create_edges.
+
+    The inputs are the fingerprint of prjxray_form_channels,
+    the prjxray database JSON files of the part, the pin assignments and synth
+    tiles, and the code of the stage.
+
+    Returns None if the generic connection database does not record the
+    fingerprint of prjxray_form_channels, in which case the inputs are
+    unknown.
+
+    """
+    form_channels_fingerprint = read_stage_fingerprint(
+        args.generic_connection_database, 'form_channels'
+    )
+    if form_channels_fingerprint is None:
+        return None
+
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = glob.glob(os.path.join(utils_dir, 'prjxray_*.py'))
+    paths += get_code_sources(os.path.join(utils_dir, '..', '..', '..'))
+    paths += glob.glob(os.path.join(args.db_root, '*.json'))
+    paths += glob.glob(os.path.join(args.db_root, args.part, '*.json'))
+    paths.append(args.pin_assignments)
+    if args.synth_tiles:
+        paths.append(args.synth_tiles)
+
+    return fingerprint_inputs(
+        paths,
+        values=(
+            form_channels_fingerprint, args.part, args.overlay,
+            args.graph_limit
+        )
+    )
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -46,6 +98,11 @@ def main():
         help='Database of fabric connectivity',
         required=True
     )
+    parser.add_argument(
+        '--generic_connection_database',
+        help='Database of fabric connectivity from prjxray_form_channels, '
+        'copied to --connection_database if edges need to be created'
+    )
     parser.add_argument(
         '--pin_assignments', help='Pin assignments JSON', required=True
     )
@@ -64,17 +121,45 @@ def main():
         '--graph_limit',
         help='Limit grid to specified dimensions in x_min,y_min,x_max,y_max',
     )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes used to create edges',
+    )
 
     args = parser.parse_args()
 
     now = datetime.datetime.now
+
+    fingerprint = None
+    if args.generic_connection_database:
+        fingerprint = get_inputs_fingerprint(args)
+        unchanged = (
+            fingerprint is not None and
+            read_stage_fingerprint(args.connection_database,
+                                   'create_edges') == fingerprint
+        )
+        if unchanged:
+            print(
+                '{}: Inputs unchanged, keeping "{}"'.format(
+                    now(), args.connection_database
+                )
+            )
+            os.utime(args.connection_database)
+            return
+
+        shutil.copyfile(
+            args.generic_connection_database, args.connection_database
+        )
+
     print("{}: Creating edges".format(now()))
-    ccio_sites = create_edges(args)
+    ccio_sites = create_edges(args, jobs=args.jobs)
     print("{}: Done with edges".format(now()))
 
     with sqlite3.connect(args.connection_database) as conn:
         print("{}: Build channels".format(now()))
-        build_channels(conn)
+        build_channels(conn, jobs=args.jobs)
         print("{}: Channels built".format(now()))
 
     with sqlite3.connect(args.connection_database) as conn:
@@ -98,6 +183,10 @@ def main():
         verify_channels(conn)
         print("{}: Channels verified".format(now()))
 
+    if fingerprint is not None:
+        with sqlite3.connect(args.connection_database) as conn:
+            set_stage_fingerprint(conn, 'create_edges', fingerprint)
+
 
 if __name__ == '__main__':
     main()
@@ -1,12 +1,16 @@
 """ Convert a PCF file into a VPR io.place file. """
 from __future__ import print_function
 import argparse
+from collections.abc import Mapping
 import eblif
+import numpy as np
+import os.path
 import sys
 import csv
 import vpr_place_constraints
 import lxml.etree as ET
 import constraint
+from prjxray_vpr_grid_map import BinaryGridMap, get_binary_grid_map_name
 
 CLOCKS = {
     "PLLE2_ADV_VPR":
@@ -109,20 +113,68 @@ def get_cmt(cmt_dict, loc):
     return None
 
 
+class LazyDict(Mapping):
+    """ Read-only dictionary computing each value on first access.
+
+    Arguments
+    ---------
+    get_keys : callable
+        Returns iterable of the keys of the dictionary.
+    get_value : callable
+        Returns value of the given key, raises KeyError if key is not present.
+
+    """
+
+    def __init__(self, get_keys, get_value):
+        self.get_keys = get_keys
+        self.get_value = get_value
+        self.cache = {}
+
+    def __getitem__(self, key):
+        if key not in self.cache:
+            self.cache[key] = self.get_value(key)
+
+        return self.cache[key]
+
+    def __iter__(self):
+        return iter(self.get_keys())
+
+    def __len__(self):
+        return sum(1 for _ in self.get_keys())
+
+
 class VprGrid(object):
     """This class contains a set of dictionaries helpful
-    to have a fast lookup at the various coordinates mapping."""
+    to have a fast lookup at the various coordinates mapping.
+
+    If a binary grid map newer than the CSV grid map is present alongside it,
+    the binary grid map is memory-mapped and the dictionaries are built
+    lazily, per key, from it.
+    """
 
     def __init__(self, vpr_grid_map, graph_limit):
         self.site_dict = dict()
         self.site_type_dict = dict()
-        self.cmt_dict = dict()
+        self.cmt_dict = None
         self.tile_dict = dict()
         self.vpr_loc_cmt = dict()
 
+        limits = None
         if graph_limit is not None:
-            limits = graph_limit.split(",")
-            xmin, ymin, xmax, ymax = [int(x) for x in limits]
+            limits = [int(x) for x in graph_limit.split(",")]
+
+        binary_grid_map = get_binary_grid_map_name(vpr_grid_map)
+        if os.path.exists(binary_grid_map) and os.path.getmtime(
+                binary_grid_map) >= os.path.getmtime(vpr_grid_map):
+            self.load_binary_grid_map(binary_grid_map, limits)
+        else:
+            self.load_csv_grid_map(vpr_grid_map, limits)
+
+    def load_csv_grid_map(self, vpr_grid_map, limits):
+        self.cmt_dict = dict()
+
+        if limits is not None:
+            xmin, ymin, xmax, ymax = limits
 
         with open(vpr_grid_map, 'r') as csv_vpr_grid:
             csv_reader = csv.DictReader(csv_vpr_grid)
@@ -136,7 +188,7 @@ class VprGrid(object):
                 can_y = row['canon_y']
                 clk_region = row['clock_region']
 
-                if graph_limit is not None:
+                if limits is not None:
                     if int(can_x) < xmin or int(can_x) > xmax:
                         continue
                     if int(can_y) < ymin or int(can_y) > ymax:
@@ -161,21 +213,10 @@ class VprGrid(object):
                     (site_name, phy_tile, clk_region)
                 )
 
-                # Generating the cmt dictionary.
-                # Each entry has:
-                #   - canonical location
-                #   - a list of vpr coordinates
-                #   - clock region
-                if phy_tile not in self.cmt_dict:
-                    self.cmt_dict[phy_tile] = {
-                        'canon_loc': (int(can_x), int(can_y)),
-                        'vpr_loc': [(int(vpr_x), int(vpr_y))],
-                        'clock_region': clk_region,
-                    }
-                else:
-                    self.cmt_dict[phy_tile]['vpr_loc'].append(
-                        (int(vpr_x), int(vpr_y))
-                    )
+                self.add_to_cmt_dict(
+                    phy_tile, (int(can_x), int(can_y)),
+                    (int(vpr_x), int(vpr_y)), clk_region
+                )
 
                 # Generating the tile dictionary.
                 # Each tile has a list of (site, site_type) pairs
@@ -186,6 +227,148 @@ class VprGrid(object):
 
                 self.vpr_loc_cmt[(int(vpr_x), int(vpr_y))] = clk_region
 
+    def add_to_cmt_dict(self, phy_tile, canon_loc, vpr_loc, clk_region):
+        # Generating the cmt dictionary.
+        # Each entry has:
+        #   - canonical location
+        #   - a list of vpr coordinates
+        #   - clock region
+        if phy_tile not in self.cmt_dict:
+            self.cmt_dict[phy_tile] = {
+                'canon_loc': canon_loc,
+                'vpr_loc': [vpr_loc],
+                'clock_region': clk_region,
+            }
+        else:
+            self.cmt_dict[phy_tile]['vpr_loc'].append(vpr_loc)
+
+    def load_binary_grid_map(self, binary_grid_map, limits):
+        grid_map = BinaryGridMap(binary_grid_map)
+        self.grid_map = grid_map
+
+        # Rows of the sites within the graph limit, in grid map order.
+        in_limit = np.ones(len(grid_map), dtype=bool)
+        if limits is not None:
+            xmin, ymin, xmax, ymax = limits
+            in_limit &= (grid_map.canon_x >= xmin)
+            in_limit &= (grid_map.canon_x <= xmax)
+            in_limit &= (grid_map.canon_y >= ymin)
+            in_limit &= (grid_map.canon_y <= ymax)
+
+        rows = np.flatnonzero(in_limit)
+        self.rows = rows
+
+        def get_site(site_name):
+            row = grid_map.find_site(site_name)
+            if row is None or not in_limit[row]:
+                raise KeyError(site_name)
+
+            site = grid_map.get_row(row)
+            return {
+                'type': site['site_type'],
+                'tile': site['physical_tile'],
+                'vpr_loc': (site['vpr_x'], site['vpr_y']),
+                'canon_loc': (site['canon_x'], site['canon_y']),
+                'clock_region': site['clock_region'],
+            }
+
+        def get_site_names():
+            for row in rows:
+                yield grid_map.site_names[row]
+
+        def get_rows_of(column, value_id, key):
+            if value_id is None:
+                raise KeyError(key)
+
+            matching_rows = rows[column[rows] == value_id]
+            if len(matching_rows) == 0:
+                raise KeyError(key)
+
+            return matching_rows
+
+        def get_unique_names(column, names):
+            """ Returns names in column in order of first occurrence. """
+            ids, first_rows = np.unique(column[rows], return_index=True)
+            for value_id in ids[np.argsort(first_rows)]:
+                yield names[value_id]
+
+        def get_site_types():
+            return get_unique_names(
+                grid_map.site_type, grid_map.site_type_names
+            )
+
+        def get_tiles():
+            return get_unique_names(
+                grid_map.physical_tile, grid_map.physical_tile_names
+            )
+
+        def get_site_type_sites(site_type):
+            return [
+                (
+                    grid_map.site_names[row],
+                    grid_map.physical_tile_names[grid_map.physical_tile[row]],
+                    grid_map.get_clock_region(row),
+                ) for row in get_rows_of(
+                    grid_map.site_type, grid_map.find_site_type(site_type),
+                    site_type
+                )
+            ]
+
+        def get_tile_sites(phy_tile):
+            return [
+                (
+                    grid_map.site_names[row],
+                    grid_map.site_type_names[grid_map.site_type[row]],
+                ) for row in get_rows_of(
+                    grid_map.physical_tile,
+                    grid_map.find_physical_tile(phy_tile), phy_tile
+                )
+            ]
+
+        def get_vpr_locs():
+            locs = np.stack(
+                (grid_map.vpr_x[rows], grid_map.vpr_y[rows]), axis=1
+            )
+            _, first_rows = np.unique(locs, axis=0, return_index=True)
+            for x, y in locs[np.sort(first_rows)].tolist():
+                yield (x, y)
+
+        def get_vpr_loc_cmt(vpr_loc):
+            x, y = vpr_loc
+            matching_rows = rows[(grid_map.vpr_x[rows] == x)
+                                 & (grid_map.vpr_y[rows] == y)]
+            if len(matching_rows) == 0:
+                raise KeyError(vpr_loc)
+
+            # Last site at the location wins, like for the CSV grid map.
+            return grid_map.get_clock_region(matching_rows[-1])
+
+        self.site_dict = LazyDict(get_site_names, get_site)
+        self.site_type_dict = LazyDict(get_site_types, get_site_type_sites)
+        self.tile_dict = LazyDict(get_tiles, get_tile_sites)
+        self.vpr_loc_cmt = LazyDict(get_vpr_locs, get_vpr_loc_cmt)
+
+    def build_binary_cmt_dict(self):
+        """ Builds cmt dictionary from all sites in the binary grid map. """
+        self.cmt_dict = dict()
+
+        grid_map = self.grid_map
+        rows = self.rows
+        physical_tile_names = {}
+        for phy_tile, canon_x, canon_y, vpr_x, vpr_y, row in zip(
+                grid_map.physical_tile[rows].tolist(),
+                grid_map.canon_x[rows].tolist(),
+                grid_map.canon_y[rows].tolist(), grid_map.vpr_x[rows].tolist(),
+                grid_map.vpr_y[rows].tolist(), rows.tolist()):
+            if phy_tile not in physical_tile_names:
+                physical_tile_names[phy_tile
+                                    ] = grid_map.physical_tile_names[phy_tile]
+
+            self.add_to_cmt_dict(
+                physical_tile_names[phy_tile], (canon_x, canon_y),
+                (vpr_x, vpr_y), grid_map.get_clock_region(row)
+            )
+
     def get_site_dict(self):
         return self.site_dict
 
@@ -193,6 +376,9 @@ class VprGrid(object):
         return self.site_type_dict
 
     def get_cmt_dict(self):
+        if self.cmt_dict is None:
+            self.build_binary_cmt_dict()
+
         return self.cmt_dict
 
     def get_tile_dict(self):
@@ -1,9 +1,19 @@
 import argparse
-import prjxray.db
 from prjxray.roi import Roi
 import simplejson as json
 
 from prjxray_db_cache import DatabaseCache
+from lib.prjxray_database import load_database
+
+# Connection database tables used by this script.
+SYNTH_TILES_TABLES = (
+    'phy_tile',
+    'tile',
+    'tile_map',
+    'tile_type',
+    'wire',
+    'wire_in_tile',
+)
 
 
 def map_tile_to_vpr_coord(conn, tile):
@@ -170,7 +180,7 @@ def main():
 
     args = parser.parse_args()
 
-    db = prjxray.db.Database(args.db_root, args.part)
+    db = load_database(args.db_root, args.part)
     g = db.grid()
 
     synth_tiles = {}
@@ -211,7 +221,8 @@ def main():
     else:
         assert False, 'Synth tiles must be for roi or overlay'
 
-    with DatabaseCache(args.connection_database, read_only=True) as conn:
+    with DatabaseCache(args.connection_database, read_only=True,
+                       tables=SYNTH_TILES_TABLES) as conn:
         tile_in_use = set()
         num_synth_tiles = 0
 
@@ -4,69 +4,270 @@ which operates on a memory copy of the database.
 
 Upon object creation the database is "backed up" to memory. All subsequent
 operations are then pefromed on this copy which yields in performance increase.
+
+If a list of tables is given, only these tables (and their indices) are copied
+to memory, which saves load time and memory for stages that only need a few
+small tables.
+
+When the database is not open as read-only, only the tables that were modified
+in memory are written back to the file.
 """
+import re
 import sqlite3
+from lib import progressbar_utils
 from lib.progressbar_utils import ProgressBar
 
 # =============================================================================
 
+# Name of the schema the database file is attached as to the memory database.
+FILE_SCHEMA = "database_cache_file"
+
+# Minimum number of pages copied per backup step. Larger databases are copied
+# in about BACKUP_STEPS steps.
+MIN_BACKUP_PAGES = 1024
+BACKUP_STEPS = 100
+
+# Authorizer actions which modify the table given as first or second argument.
+MODIFY_TABLE_ACTIONS = {
+    sqlite3.SQLITE_INSERT: 0,
+    sqlite3.SQLITE_UPDATE: 0,
+    sqlite3.SQLITE_DELETE: 0,
+    sqlite3.SQLITE_CREATE_TABLE: 0,
+    sqlite3.SQLITE_DROP_TABLE: 0,
+    sqlite3.SQLITE_CREATE_INDEX: 1,
+    sqlite3.SQLITE_DROP_INDEX: 1,
+    sqlite3.SQLITE_ALTER_TABLE: 1,
+}
+
+CREATE_RE = re.compile(
+    r'^\s*(CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX)\s+(?:IF\s+NOT\s+EXISTS\s+)?)',
+    re.IGNORECASE
+)
+
+
+def qualify_create(sql, schema):
+    """ Returns CREATE TABLE or CREATE INDEX statement creating in schema.
+
+    >>> qualify_create('CREATE TABLE tile(pkey INTEGER)', 'file')
+    'CREATE TABLE file.tile(pkey INTEGER)'
+    >>> qualify_create('CREATE INDEX idx ON tile(pkey)', 'file')
+    'CREATE INDEX file.idx ON tile(pkey)'
+    """
+    sql, count = CREATE_RE.subn(r'\1{}.'.format(schema), sql, count=1)
+    assert count == 1, sql
+    return sql
+
+
+def get_schema(conn, schema, tables=None):
+    """ Returns CREATE statements of tables and their indices in schema.
+
+    Returns dictionary of table name to tuple of the table CREATE statement
+    and list of index CREATE statements.
+
+    """
+    table_sql = {}
+    index_sql = {}
+    for type, name, table, sql in conn.execute(
+            "SELECT type, name, tbl_name, sql FROM {}.sqlite_master;".format(
+                schema)):
+        if name.startswith('sqlite_') or sql is None:
+            continue
+
+        if tables is not None and table not in tables:
+            continue
+
+        if type == 'table':
+            table_sql[name] = sql
+        elif type == 'index':
+            index_sql.setdefault(table, []).append(sql)
+
+    return {
+        name: (sql, index_sql.get(name, []))
+        for name, sql in table_sql.items()
+    }
+
 
 class DatabaseCache(object):
-    def __init__(self, file_name, read_only=False):
+    def __init__(self, file_name, read_only=False, tables=None):
+        """
+        Arguments
+        ---------
+        file_name : str
+            Database file.
+        read_only : bool
+            If False, tables modified in memory are written back to the file.
+        tables : iterable of str, optional
+            Tables to load into memory.  If None, the whole database is loaded.
+        """
 
         self.file_name = file_name
         self.read_only = read_only
+        self.tables = None if tables is None else set(tables)
         self.bar = None
+        self.modified_tables = set()
 
     def __enter__(self):
         """
         Opens the database file and makes its copy in memory
         """
 
-        # File URI
-        if self.read_only:
-            uri = "file:%s?mode=ro" % self.file_name
-        else:
-            uri = "file:%s?mode=rwc" % self.file_name
-
         # Open connections
-        self.memory_connection = sqlite3.connect(":memory:")
-        self.file_connection = sqlite3.connect(uri, uri=True)
+        self.memory_connection = sqlite3.connect(":memory:", uri=True)
 
         # Load the database
         print("Loading database from '{}'".format(self.file_name))
-        self.file_connection.backup(
-            self.memory_connection, pages=100, progress=self._progress
-        )
+        if self.tables is None:
+            self._load_all()
+        else:
+            self._load_tables()
 
-        self.bar.finish()
-        self.bar = None
+        self.memory_connection.set_authorizer(self._authorize)
 
         # Return the connection
         return self.memory_connection
 
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Writes back the database to file if the database was open as not read-only
+        Writes back the modified tables to file if the database was open as not
+        read-only
         """
 
+        self.memory_connection.set_authorizer(None)
+
         # Write back only if not read-only
         if not self.read_only:
             if self.memory_connection.in_transaction:
                 assert exc_type is not None, "Outstanding transaction, but no exception?"
                 self.memory_connection.rollback()
 
-            print("Dumping database to '{}'".format(self.file_name))
-            self.memory_connection.backup(
-                self.file_connection, pages=100, progress=self._progress
-            )
+            self._write_back()
+
+        # Close connections
+        self.memory_connection.close()
+
+    def _uri(self):
+        """
+        Returns URI of the database file.
+        """
+        if self.read_only:
+            return "file:%s?mode=ro" % self.file_name
+        else:
+            return "file:%s?mode=rwc" % self.file_name
+
+    def _attach(self):
+        self.memory_connection.execute(
+            "ATTACH DATABASE ? AS {};".format(FILE_SCHEMA), (self._uri(), )
+        )
 
+    def _detach(self):
+        self.memory_connection.execute(
+            "DETACH DATABASE {};".format(FILE_SCHEMA)
+        )
+
+    def _load_all(self):
+        """
+        Copies the whole database file to memory.
+        """
+        file_connection = sqlite3.connect(self._uri(), uri=True)
+
+        page_count = file_connection.execute("PRAGMA page_count;"
+                                             ).fetchone()[0]
+        file_connection.backup(
+            self.memory_connection,
+            pages=max(MIN_BACKUP_PAGES, page_count // BACKUP_STEPS),
+            progress=self._progress
+        )
+
+        if self.bar is not None:
             self.bar.finish()
             self.bar = None
 
-        # Close connections
-        self.memory_connection.close()
-        self.file_connection.close()
+        file_connection.close()
+
+    def _load_tables(self):
+        """
+        Copies the requested tables of the database file to memory.
+        """
+        self._attach()
+
+        schema = get_schema(self.memory_connection, FILE_SCHEMA, self.tables)
+        missing_tables = self.tables - set(schema.keys())
+        assert len(missing_tables) == 0, (self.file_name, missing_tables)
+
+        c = self.memory_connection.cursor()
+        for table in progressbar_utils.progressbar(sorted(schema.keys())):
+            table_sql, index_sqls = schema[table]
+            c.execute(qualify_create(table_sql, 'main'))
+            c.execute(
+                "INSERT INTO main.{table} SELECT * FROM {schema}.{table};".
+                format(table=table, schema=FILE_SCHEMA)
+            )
+            for index_sql in index_sqls:
+                c.execute(qualify_create(index_sql, 'main'))
+
+        self.memory_connection.commit()
+        self._detach()
+
+    def _authorize(self, action, arg1, arg2, db_name, trigger_name):
+        """
+        Records tables modified in memory.
+        """
+        arg = MODIFY_TABLE_ACTIONS.get(action)
+        if arg is not None and db_name == 'main':
+            table = (arg1, arg2)[arg]
+            if table is not None and not table.startswith('sqlite_'):
+                self.modified_tables.add(table)
+
+        return sqlite3.SQLITE_OK
+
+    def _write_back(self):
+        """
+        Replaces the tables of the database file that were modified in memory.
+        """
+        self._attach()
+
+        memory_schema = get_schema(self.memory_connection, 'main')
+        file_schema = get_schema(self.memory_connection, FILE_SCHEMA)
+
+        # Tables that are not in the file are written even if not recorded as
+        # modified, e.g. after a table was renamed.
+        tables = self.modified_tables | (
+            set(memory_schema.keys()) - set(file_schema.keys())
+        )
+
+        if len(tables) == 0:
+            self._detach()
+            return
+
+        print(
+            "Dumping tables {} to '{}'".format(
+                ', '.join(sorted(tables)), self.file_name
+            )
+        )
+
+        c = self.memory_connection.cursor()
+        c.execute("BEGIN;")
+        for table in progressbar_utils.progressbar(sorted(tables)):
+            c.execute(
+                "DROP TABLE IF EXISTS {schema}.{table};".format(
+                    table=table, schema=FILE_SCHEMA
+                )
+            )
+
+            if table not in memory_schema:
+                continue
+
+            table_sql, index_sqls = memory_schema[table]
+            c.execute(qualify_create(table_sql, FILE_SCHEMA))
+            c.execute(
+                "INSERT INTO {schema}.{table} SELECT * FROM main.{table};".
+                format(table=table, schema=FILE_SCHEMA)
+            )
+            for index_sql in index_sqls:
+                c.execute(qualify_create(index_sql, FILE_SCHEMA))
+
+        self.memory_connection.commit()
+        self._detach()
 
     def _progress(self, status, remaining, total):
         """
@@ -2,9 +2,9 @@
 
 """
 import argparse
-from prjxray.db import Database
 import re
 from collections import OrderedDict
+from lib.prjxray_database import load_database
 
 
 def add_segment_wires(db, tile, wires, segments):
@@ -198,7 +198,7 @@ def main():
 
     args = parser.parse_args()
 
-    db = Database(args.db_root, args.part)
+    db = load_database(args.db_root, args.part)
 
     segments = get_segments(db)
 
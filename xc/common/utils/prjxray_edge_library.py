@@ -1,4 +1,3 @@
-import prjxray.db
 from prjxray.roi import Roi
 from prjxray.overlay import Overlay
 from prjxray import grid_types
@@ -6,6 +5,11 @@ import simplejson as json
 from lib import progressbar_utils
 import datetime
 import functools
+import itertools
+import multiprocessing
+import os
+import sqlite3
+import tempfile
 from collections import namedtuple
 from lib.rr_graph import tracks
 from lib.rr_graph import graph2
@@ -13,11 +17,13 @@ from prjxray.site_type import SitePinDirection
 from prjxray_constant_site_pins import yield_ties_to_wire
 from lib.connection_database import get_track_model, get_wire_in_tile_from_pin_name
 from lib.rr_graph.graph2 import NodeType
+from lib.rr_graph.ptc import chan_intervals, find_ptc_overlaps
 import re
 import math
 import numpy
 
 from prjxray_db_cache import DatabaseCache
+from lib.prjxray_database import load_database
 
 now = datetime.datetime.now
 
@@ -362,6 +368,143 @@ WHERE
 
 Pins = namedtuple('Pins', 'x y edge_map site_pin_direction')
 
+# Site pin wire node that Connector.find_wire_node would have created.  See
+# Connector.find_wire_node and create_resolve_site_pin_nodes.
+SitePinNodeRequest = namedtuple(
+    'SitePinNodeRequest', 'request_id wire_pkey site_wire_pkey node_pkey '
+    'track_graph_node_pkey capacitance resistance'
+)
+SITE_PIN_NODE_REQUEST_IDS = itertools.count()
+
+
+def insert_site_pin_graph_node(write_cur, request):
+    """ Creates the site pin wire node described by a SitePinNodeRequest.
+
+    The new graph node is a copy of the track graph node, with the timing of
+    the site pin wire, on its own new track.
+
+    Returns:
+        graph_node_pkey (int) of the new node.
+
+    """
+    write_cur.execute("INSERT INTO track DEFAULT VALUES")
+    new_track_pkey = write_cur.lastrowid
+
+    write_cur.execute(
+        """
+INSERT INTO
+    graph_node(
+        graph_node_type,
+        node_pkey,
+        x_low,
+        x_high,
+        y_low,
+        y_high,
+        capacity,
+        capacitance,
+        resistance,
+        track_pkey)
+SELECT
+    graph_node_type,
+    ?,
+    x_low,
+    x_high,
+    y_low,
+    y_high,
+    capacity,
+    ?,
+    ?,
+    ?
+FROM graph_node WHERE pkey = ?""", (
+            request.node_pkey,
+            request.capacitance,
+            request.resistance,
+            new_track_pkey,
+            request.track_graph_node_pkey,
+        )
+    )
+    site_pin_graph_node_pkey = write_cur.lastrowid
+
+    write_cur.execute(
+        """
+UPDATE wire SET site_pin_graph_node_pkey = ?
+WHERE pkey = ?""", (
+            site_pin_graph_node_pkey,
+            request.wire_pkey,
+        )
+    )
+
+    write_cur.connection.commit()
+
+    return site_pin_graph_node_pkey
+
+
+def create_resolve_site_pin_nodes(conn):
+    """ Returns a function that replaces SitePinNodeRequest's in edges.
+
+    Requests must be resolved in the same order that the serial edge
+    creation would have created the nodes, e.g. tile by tile in
+    grid.tile_locations() order, so that graph_node and track primary keys
+    match.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        Function.  See resolve_site_pin_nodes below for signature.
+    """
+    write_cur = conn.cursor()
+
+    # Map of request key to the graph_node_pkey created for it.
+    resolved = {}
+
+    # Map of wire pkey to the site_pin_graph_node_pkey written to that wire,
+    # mirroring the wire table updates done by insert_site_pin_graph_node.
+    wire_site_pin_nodes = {}
+
+    def resolve(shard, request):
+        key = (shard, request.request_id)
+        if key not in resolved:
+            graph_node_pkey = wire_site_pin_nodes.get(request.site_wire_pkey)
+            if graph_node_pkey is None:
+                graph_node_pkey = insert_site_pin_graph_node(
+                    write_cur, request
+                )
+                wire_site_pin_nodes[request.wire_pkey] = graph_node_pkey
+
+            resolved[key] = graph_node_pkey
+
+        return resolved[key]
+
+    def resolve_site_pin_nodes(shard, edges):
+        """ Resolve placeholders in edges from one worker.
+
+        Args:
+            shard (int): Identifier of the worker shard that produced the
+                edges.  Request ids are only unique within a shard.
+            edges (list of edge tuples): Edges as returned by make_connection,
+                which may contain SitePinNodeRequest's in place of the source
+                or destination graph_node_pkey.
+
+        Returns:
+            List of edge tuples with only graph_node_pkey's.
+
+        """
+        out_edges = []
+        for edge in edges:
+            src, dest = edge[0:2]
+            if isinstance(src, SitePinNodeRequest):
+                src = resolve(shard, src)
+            if isinstance(dest, SitePinNodeRequest):
+                dest = resolve(shard, dest)
+
+            out_edges.append((src, dest) + tuple(edge[2:]))
+
+        return out_edges
+
+    return resolve_site_pin_nodes
+
+
 OPPOSITE_DIRECTIONS = {
     tracks.Direction.TOP: tracks.Direction.BOTTOM,
     tracks.Direction.BOTTOM: tracks.Direction.TOP,
@@ -379,7 +522,9 @@ class Connector(object):
 
     """
 
-    def __init__(self, conn, pins=None, tracks=None):
+    def __init__(
+            self, conn, pins=None, tracks=None, defer_site_pin_nodes=False
+    ):
         """ Create a Connector object.
 
         Provide either pins or tracks, not both or neither.
@@ -394,10 +539,15 @@ class Connector(object):
                 The tuple can most easily be constructed via
                 connection_database.get_track_model, which builds the Tracks
                 models and the graph node list.
+            defer_site_pin_nodes (bool): If True, the connection database is
+                never written.  Site pin wire nodes that do not exist yet are
+                returned as SitePinNodeRequest placeholders, which must be
+                resolved with create_resolve_site_pin_nodes.
         """
         self.conn = conn
         self.pins = pins
         self.tracks = tracks
+        self.defer_site_pin_nodes = defer_site_pin_nodes
         self.track_connections = {}
         assert (self.pins is not None) ^ (self.tracks is not None)
 
@@ -552,57 +702,23 @@ WHERE pkey IN (
                     # possible.
                     break
 
-            # This node does not exist, create it now
-            write_cur = self.conn.cursor()
-
-            write_cur.execute("INSERT INTO track DEFAULT VALUES")
-            new_track_pkey = write_cur.lastrowid
-
-            write_cur.execute(
-                """
-INSERT INTO
-    graph_node(
-        graph_node_type,
-        node_pkey,
-        x_low,
-        x_high,
-        y_low,
-        y_high,
-        capacity,
-        capacitance,
-        resistance,
-        track_pkey)
-SELECT
-    graph_node_type,
-    ?,
-    x_low,
-    x_high,
-    y_low,
-    y_high,
-    capacity,
-    ?,
-    ?,
-    ?
-FROM graph_node WHERE pkey = ?""", (
-                    node_pkey,
-                    capacitance,
-                    resistance,
-                    new_track_pkey,
-                    track_graph_node_pkey,
-                )
+            request = SitePinNodeRequest(
+                request_id=next(SITE_PIN_NODE_REQUEST_IDS),
+                wire_pkey=wire_pkey,
+                site_wire_pkey=site_wire_pkey,
+                node_pkey=node_pkey,
+                track_graph_node_pkey=track_graph_node_pkey,
+                capacitance=capacitance,
+                resistance=resistance,
             )
-            site_pin_graph_node_pkey = write_cur.lastrowid
 
-            write_cur.execute(
-                """
-UPDATE wire SET site_pin_graph_node_pkey = ?
-WHERE pkey = ?""", (
-                    site_pin_graph_node_pkey,
-                    wire_pkey,
-                )
-            )
+            if self.defer_site_pin_nodes:
+                return site_pin_switch_pkey, request
 
-            write_cur.connection.commit()
+            # This node does not exist, create it now
+            site_pin_graph_node_pkey = insert_site_pin_graph_node(
+                self.conn.cursor(), request
+            )
 
         return site_pin_switch_pkey, site_pin_graph_node_pkey
 
@@ -834,11 +950,12 @@ AND
         )
 
 
-def create_find_connector(conn):
+def create_find_connector(conn, defer_site_pin_nodes=False):
     """ Returns a function returns a Connector object for a given wire and node.
 
     Args:
         conn: Database connection
+        defer_site_pin_nodes (bool): See Connector.
 
     Returns:
         Function.  See find_connector below for signature.
@@ -880,7 +997,9 @@ def create_find_connector(conn):
                 assert node[1] == track_pkey
 
             return Connector(
-                conn=conn, tracks=get_track_model(conn, track_pkey)
+                conn=conn,
+                tracks=get_track_model(conn, track_pkey),
+                defer_site_pin_nodes=defer_site_pin_nodes
             )
 
         # Check if this node has a special track.  This is being used to
@@ -898,7 +1017,9 @@ WHERE
         for track_pkey, site_wire_pkey in c:
             if track_pkey is not None and site_wire_pkey is not None:
                 return Connector(
-                    conn=conn, tracks=get_track_model(conn, track_pkey)
+                    conn=conn,
+                    tracks=get_track_model(conn, track_pkey),
+                    defer_site_pin_nodes=defer_site_pin_nodes
                 )
 
         # This is not a track, so it must be a site pin.  Make sure the
@@ -981,13 +1102,14 @@ WHERE
                 x=x,
                 y=y,
                 site_pin_direction=site_pin_direction,
-            )
+            ),
+            defer_site_pin_nodes=defer_site_pin_nodes
         )
 
     return find_connector
 
 
-def create_const_connectors(conn):
+def create_const_connectors(conn, defer_site_pin_nodes=False):
     c = conn.cursor()
     c.execute(
         """
@@ -998,10 +1120,14 @@ SELECT vcc_track_pkey, gnd_track_pkey FROM constant_sources;
 
     const_connectors = {}
     const_connectors[0] = Connector(
-        conn=conn, tracks=get_track_model(conn, gnd_track_pkey)
+        conn=conn,
+        tracks=get_track_model(conn, gnd_track_pkey),
+        defer_site_pin_nodes=defer_site_pin_nodes
     )
     const_connectors[1] = Connector(
-        conn=conn, tracks=get_track_model(conn, vcc_track_pkey)
+        conn=conn,
+        tracks=get_track_model(conn, vcc_track_pkey),
+        defer_site_pin_nodes=defer_site_pin_nodes
     )
 
     return const_connectors
@@ -1149,21 +1275,128 @@ def make_connection(
         yield edge
 
 
+def make_csr(keys, values, num_keys):
+    """ Returns CSR offsets and values of the (key, value) pairs.
+
+    The values of key k are values[offsets[k]:offsets[k + 1]], in their
+    original order.
+
+    >>> offsets, values = make_csr([2, 0, 2], [10, 11, 12], 3)
+    >>> offsets
+    array([0, 1, 1, 3])
+    >>> values
+    array([11, 10, 12])
+    """
+    keys = numpy.asarray(keys, dtype=numpy.int64)
+    values = numpy.asarray(values, dtype=numpy.int64)
+
+    offsets = numpy.zeros(num_keys + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(keys, minlength=num_keys), out=offsets[1:])
+
+    return offsets, values[numpy.argsort(keys, kind='stable')]
+
+
+class GraphEdgeIndex(object):
+    """ In memory forward and reverse adjacency of the graph_edge table.
+
+    Adjacency is stored as CSR arrays indexed by graph_node pkey, e.g. the
+    successors of graph node pkey are
+    successors[successor_offsets[pkey]:successor_offsets[pkey + 1]].
+    Neighbours of a node are in graph_edge rowid order, which is the order
+    SQLite returns them when querying graph_edge by node.
+
+    """
+
+    def __init__(self, conn):
+        cur = conn.cursor()
+
+        cur.execute("SELECT MAX(pkey) FROM graph_node;")
+        max_pkey = cur.fetchone()[0]
+        self.num_nodes = 0 if max_pkey is None else max_pkey + 1
+
+        cur.execute("SELECT count(*) FROM graph_edge;")
+        num_edges = cur.fetchone()[0]
+
+        edges = numpy.fromiter(
+            itertools.chain.from_iterable(
+                cur.execute(
+                    """
+SELECT src_graph_node_pkey, dest_graph_node_pkey FROM graph_edge
+ORDER BY rowid;"""
+                )
+            ),
+            dtype=numpy.int64,
+            count=2 * num_edges
+        ).reshape(num_edges, 2)
+
+        self.successor_offsets, self.successors = make_csr(
+            edges[:, 0], edges[:, 1], self.num_nodes
+        )
+        self.predecessor_offsets, self.predecessors = make_csr(
+            edges[:, 1], edges[:, 0], self.num_nodes
+        )
+
+    def out_degree(self):
+        """ Returns array of number of edges from each graph node. """
+        return numpy.diff(self.successor_offsets)
+
+    def in_degree(self):
+        """ Returns array of number of edges to each graph node. """
+        return numpy.diff(self.predecessor_offsets)
+
+    def get_successors(self, graph_node_pkey):
+        """ Returns array of dest graph nodes of edges from graph_node_pkey. """
+        return self.successors[self.successor_offsets[graph_node_pkey]:self.
+                               successor_offsets[graph_node_pkey + 1]]
+
+    def get_predecessors(self, graph_node_pkey):
+        """ Returns array of src graph nodes of edges to graph_node_pkey. """
+        return self.predecessors[self.predecessor_offsets[graph_node_pkey]:self
+                                 .predecessor_offsets[graph_node_pkey + 1]]
+
+    def unique_neighbour_count(self):
+        """ Returns array of number of distinct graph nodes connected to each
+        graph node by an edge in either direction. """
+        nodes = numpy.arange(self.num_nodes, dtype=numpy.int64)
+
+        neighbour_pairs = numpy.unique(
+            numpy.concatenate(
+                (
+                    numpy.repeat(nodes, self.out_degree()) * self.num_nodes +
+                    self.successors,
+                    numpy.repeat(nodes, self.in_degree()) * self.num_nodes +
+                    self.predecessors,
+                )
+            )
+        )
+
+        return numpy.bincount(
+            neighbour_pairs // max(self.num_nodes, 1),
+            minlength=self.num_nodes
+        )
+
+
 def mark_track_liveness(conn, input_only_nodes, output_only_nodes):
     """ Checks tracks for liveness.
 
     Iterates over all graph nodes that are routing tracks and determines if
     at least one graph edge originates from or two the track.
 
+    A track is alive if one of its nodes is an input or output only node, or
+    if one of its graph nodes has edges in both directions to at least two
+    other graph nodes.
+
     Args:
         conn (sqlite3.Connection): Connection database
 
     """
-
-    alive_tracks = set()
     c = conn.cursor()
     write_cur = conn.cursor()
-    for graph_node_pkey, node_pkey, track_pkey in c.execute("""
+
+    edge_index = GraphEdgeIndex(conn)
+
+    track_nodes = c.execute(
+        """
 SELECT
   pkey,
   node_pkey,
@@ -1171,38 +1404,30 @@ SELECT
 FROM
   graph_node
 WHERE
-  track_pkey IS NOT NULL;"""):
-        if track_pkey in alive_tracks:
-            continue
+  track_pkey IS NOT NULL;"""
+    ).fetchall()
 
-        if node_pkey in input_only_nodes or node_pkey in output_only_nodes:
-            alive_tracks.add(track_pkey)
-            continue
-
-        write_cur.execute(
-            """SELECT count(switch_pkey) FROM graph_edge WHERE
-            src_graph_node_pkey = ?;""", (graph_node_pkey, )
-        )
-        src_count = write_cur.fetchone()[0]
-
-        write_cur.execute(
-            """SELECT count(switch_pkey) FROM graph_edge WHERE
-            dest_graph_node_pkey = ?;""", (graph_node_pkey, )
-        )
-        sink_count = write_cur.fetchone()[0]
+    graph_node_pkeys = numpy.array(
+        [graph_node_pkey for graph_node_pkey, _, _ in track_nodes],
+        dtype=numpy.int64
+    )
+    track_pkeys = numpy.array(
+        [track_pkey for _, _, track_pkey in track_nodes], dtype=numpy.int64
+    )
+    io_only = numpy.array(
+        [
+            node_pkey in input_only_nodes or node_pkey in output_only_nodes
+            for _, node_pkey, _ in track_nodes
+        ],
+        dtype=bool
+    )
 
-        write_cur.execute(
-            """
-SELECT count() FROM (
-  SELECT dest_graph_node_pkey FROM graph_edge WHERE src_graph_node_pkey = ?
-  UNION
-  SELECT src_graph_node_pkey FROM graph_edge WHERE dest_graph_node_pkey = ?
-  );""", (graph_node_pkey, graph_node_pkey)
-        )
-        active_other_nodes = write_cur.fetchone()[0]
+    has_out_edges = edge_index.out_degree()[graph_node_pkeys] > 0
+    has_in_edges = edge_index.in_degree()[graph_node_pkeys] > 0
+    has_neighbours = edge_index.unique_neighbour_count()[graph_node_pkeys] > 1
+    active = has_out_edges & has_in_edges & has_neighbours
 
-        if src_count > 0 and sink_count > 0 and active_other_nodes > 1:
-            alive_tracks.add(track_pkey)
+    alive_tracks = set(track_pkeys[io_only | active].tolist())
 
     c.execute("SELECT count(pkey) FROM track;")
     track_count = c.fetchone()[0]
@@ -1212,12 +1437,15 @@ SELECT count() FROM (
         )
     )
 
+    track_pkeys = c.execute("""SELECT pkey FROM track;""").fetchall()
+
     write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
-    for (track_pkey, ) in c.execute("""SELECT pkey FROM track;"""):
-        write_cur.execute(
-            "UPDATE track SET alive = ? WHERE pkey = ?;",
+    write_cur.executemany(
+        "UPDATE track SET alive = ? WHERE pkey = ?;", (
             (track_pkey in alive_tracks, track_pkey)
+            for (track_pkey, ) in track_pkeys
         )
+    )
     write_cur.execute("""COMMIT TRANSACTION;""")
 
     print('{} Track aliveness committed'.format(now()))
@@ -1242,27 +1470,47 @@ def direction_to_enum(pin):
     assert False
 
 
-def build_channels(conn):
-    x_channel_models = {}
-    y_channel_models = {}
+def pack_channel(channel_tracks):
+    """ Packs the tracks of a channel into ptc's.
 
-    cur = conn.cursor()
+    Args:
+        channel_tracks (tuple of (int, list of (low, high, graph_node_pkey))):
+            Channel index and tracks in the channel.
+
+    Returns:
+        Tuple of channel index, number of ptc's and list of
+        (ptc, graph_node_pkey) to update.
+
+    """
+    channel, data = channel_tracks
+    channel_model = graph2.process_track(data)
+
+    ptcs = []
+    for ptc, tree in enumerate(channel_model.trees):
+        for _, _, graph_node_pkey in tree:
+            ptcs.append((ptc, graph_node_pkey))
+
+    return channel, len(channel_model.trees), ptcs
+
+
+def yield_channel_tracks(conn, graph_node_type):
+    """ Yields the alive tracks of each CHANX or CHANY channel.
+
+    Yields tuples of channel index (y for CHANX, x for CHANY) and list of
+    (low, high, graph_node_pkey) in graph_node pkey order.
 
+    """
+    if graph_node_type == graph2.NodeType.CHANX:
+        columns = 'graph_node.y_low, graph_node.x_low, graph_node.x_high'
+    else:
+        assert graph_node_type == graph2.NodeType.CHANY
+        columns = 'graph_node.x_low, graph_node.y_low, graph_node.y_high'
+
+    cur = conn.cursor()
     cur.execute(
         """
-SELECT MIN(x_low), MAX(x_high), MIN(y_low), MAX(y_high) FROM graph_node
-INNER JOIN track
-ON track.pkey = graph_node.track_pkey
-WHERE track.alive;"""
-    )
-    x_min, x_max, y_min, y_max = cur.fetchone()
-
-    for x in progressbar_utils.progressbar(range(x_min, x_max + 1)):
-        cur.execute(
-            """
 SELECT
-    graph_node.y_low,
-    graph_node.y_high,
+    {columns},
     graph_node.pkey
 FROM graph_node
 INNER JOIN track
@@ -1273,67 +1521,80 @@ AND
     track.alive
 AND
     graph_node_type = ?
-AND
-    x_low = ?;""", (graph2.NodeType.CHANY.value, x)
-        )
+ORDER BY 1, graph_node.pkey;""".format(columns=columns),
+        (graph_node_type.value, )
+    )
 
-        data = list(cur)
-        y_channel_models[x] = graph2.process_track(data)
+    for channel, rows in itertools.groupby(cur, key=lambda row: row[0]):
+        yield channel, [(low, high, pkey) for _, low, high, pkey in rows]
 
-    for y in progressbar_utils.progressbar(range(y_min, y_max + 1)):
-        cur.execute(
-            """
-SELECT
-    graph_node.x_low,
-    graph_node.x_high,
-    graph_node.pkey
-FROM graph_node
-INNER JOIN track
-ON track.pkey = graph_node.track_pkey
-WHERE
-    track_pkey IS NOT NULL
-AND
-    track.alive
-AND
-    graph_node_type = ?
-AND
-    y_low = ?;""", (graph2.NodeType.CHANX.value, y)
-        )
 
-        data = list(cur)
-        x_channel_models[y] = graph2.process_track(data)
+def yield_packed_channels(channel_tracks, jobs):
+    """ Yields result of pack_channel for each channel, in channel order.
 
-    x_list = []
-    y_list = []
+    Channels are packed in a pool of jobs worker processes if jobs > 1.
 
-    write_cur = conn.cursor()
-    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+    """
+    if jobs > 1:
+        with multiprocessing.Pool(processes=jobs) as pool:
+            yield from pool.imap(pack_channel, channel_tracks, chunksize=16)
+    else:
+        yield from map(pack_channel, channel_tracks)
 
-    for y in progressbar_utils.progressbar(range(y_max + 1)):
-        if y in x_channel_models:
-            x_list.append(len(x_channel_models[y].trees))
 
-            for idx, tree in enumerate(x_channel_models[y].trees):
-                for i in tree:
-                    write_cur.execute(
-                        'UPDATE graph_node SET ptc = ? WHERE pkey = ?;',
-                        (idx, i[2])
-                    )
-        else:
-            x_list.append(0)
+def build_channels(conn, jobs=1):
+    """ Packs alive tracks into channels and assigns their ptc's.
 
-    for x in progressbar_utils.progressbar(range(x_max + 1)):
-        if x in y_channel_models:
-            y_list.append(len(y_channel_models[x].trees))
+    The alive tracks of all channels are read at once, the channels are
+    packed (in a pool of jobs worker processes if jobs > 1), and the ptc's are
+    written back in bulk.
 
-            for idx, tree in enumerate(y_channel_models[x].trees):
-                for i in tree:
-                    write_cur.execute(
-                        'UPDATE graph_node SET ptc = ? WHERE pkey = ?;',
-                        (idx, i[2])
-                    )
+    """
+    cur = conn.cursor()
+
+    cur.execute(
+        """
+SELECT MIN(x_low), MAX(x_high), MIN(y_low), MAX(y_high) FROM graph_node
+INNER JOIN track
+ON track.pkey = graph_node.track_pkey
+WHERE track.alive;"""
+    )
+    x_min, x_max, y_min, y_max = cur.fetchone()
+
+    channels = [
+        (graph2.NodeType.CHANX, y, data)
+        for y, data in yield_channel_tracks(conn, graph2.NodeType.CHANX)
+    ]
+    channels += [
+        (graph2.NodeType.CHANY, x, data)
+        for x, data in yield_channel_tracks(conn, graph2.NodeType.CHANY)
+    ]
+
+    x_channel_widths = {}
+    y_channel_widths = {}
+    ptcs = []
+
+    for idx, num_ptcs, channel_ptcs in progressbar_utils.progressbar(
+            yield_packed_channels(
+                [(idx, data) for idx, (_, _, data) in enumerate(channels)],
+                jobs), max_value=len(channels)):
+        graph_node_type, channel, _ = channels[idx]
+        if graph_node_type == graph2.NodeType.CHANX:
+            x_channel_widths[channel] = num_ptcs
         else:
-            y_list.append(0)
+            y_channel_widths[channel] = num_ptcs
+
+        ptcs.extend(channel_ptcs)
+
+    x_list = [x_channel_widths.get(y, 0) for y in range(y_max + 1)]
+    y_list = [y_channel_widths.get(x, 0) for x in range(x_max + 1)]
+
+    write_cur = conn.cursor()
+    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+
+    write_cur.executemany(
+        'UPDATE graph_node SET ptc = ? WHERE pkey = ?;', ptcs
+    )
 
     write_cur.execute(
         """
@@ -1342,17 +1603,15 @@ AND
         (max(max(x_list), max(y_list)), x_min, x_max, y_min, y_max)
     )
 
-    for idx, info in enumerate(x_list):
-        write_cur.execute(
-            """
-        INSERT INTO x_list(idx, info) VALUES (?, ?);""", (idx, info)
-        )
+    write_cur.executemany(
+        """
+        INSERT INTO x_list(idx, info) VALUES (?, ?);""", enumerate(x_list)
+    )
 
-    for idx, info in enumerate(y_list):
-        write_cur.execute(
-            """
-        INSERT INTO y_list(idx, info) VALUES (?, ?);""", (idx, info)
-        )
+    write_cur.executemany(
+        """
+        INSERT INTO y_list(idx, info) VALUES (?, ?);""", enumerate(y_list)
+    )
 
     write_cur.execute("""COMMIT TRANSACTION;""")
 
@@ -1368,7 +1627,7 @@ def verify_channels(conn):
 
     c = conn.cursor()
 
-    chan_ptcs = {}
+    chan_nodes = []
 
     for (graph_node_pkey, alive, graph_node_type, x_low, x_high, y_low, y_high,
          ptc, capacity) in c.execute(
@@ -1395,76 +1654,110 @@ WHERE (graph_node_type = ? or graph_node_type = ?);""",
 
         assert ptc is not None, graph_node_pkey
 
-        for x in range(x_low, x_high + 1):
-            for y in range(y_low, y_high + 1):
-                key = (graph_node_type, x, y)
-                if key not in chan_ptcs:
-                    chan_ptcs[key] = []
+        chan_nodes.append(
+            (
+                graph_node_pkey, graph_node_type, x_low, y_low, x_high, y_high,
+                ptc
+            )
+        )
 
-                chan_ptcs[key].append((graph_node_pkey, ptc))
+    if not chan_nodes:
+        return
 
-    for key in chan_ptcs:
-        ptcs = {}
-        for graph_node_pkey, ptc in chan_ptcs[key]:
-            assert ptc not in ptcs, (ptcs[ptc], graph_node_pkey)
-            ptcs[ptc] = graph_node_pkey
+    graph_node_pkeys, node_type, x_low, y_low, x_high, y_high, ptc = (
+        numpy.array(column, dtype=numpy.int64) for column in zip(*chan_nodes)
+    )
 
+    channel, low, high = chan_intervals(
+        node_type, x_low, y_low, x_high, y_high
+    )
+    overlaps = find_ptc_overlaps(node_type, channel, low, high, ptc)
+    assert not overlaps, [
+        (int(graph_node_pkeys[a]), int(graph_node_pkeys[b]))
+        for a, b in overlaps[:10]
+    ]
 
-def set_pin_connection(
-        conn, write_cur, pin_graph_node_pkey, forward, graph_node_pkey, tracks
-):
-    """ Sets pin connection box location canonical location.
 
-    Tracks that are a part of the pinfeed also get this location.
+def create_get_pin_connection(conn, node_types, node_pkeys):
+    """ Returns a function that returns the connection box of a pin feed.
 
-    """
+    The wires of the nodes in node_pkeys and the number of non-pseudo pips
+    from and to each wire in tile are loaded once, only an ambiguous OPIN
+    source location is resolved with a query.
+
+    Args:
+        conn: Database connection
+        node_types (list): graph_node_type of each graph_node_pkey.
+        node_pkeys (set of node_pkey): Nodes of the graph nodes that
+            get_pin_connection will be called with.
+
+    Returns:
+        Function.  See get_pin_connection below for signature.
+    """
     cur = conn.cursor()
-    cur2 = conn.cursor()
-    cur.execute(
-        """SELECT node_pkey, graph_node_type FROM graph_node WHERE pkey = ?""",
-        (pin_graph_node_pkey, )
-    )
-    pin_node_pkey, graph_node_type = cur.fetchone()
 
-    source_wires = []
-    sink_wires = []
-    cur.execute(
-        """SELECT pkey FROM wire WHERE node_pkey = (
-        SELECT node_pkey FROM graph_node WHERE pkey = ?
-        )""", (graph_node_pkey, )
+    forward_pips = dict(
+        cur.execute(
+            """
+SELECT src_wire_in_tile_pkey, count() FROM pip_in_tile
+WHERE is_pseudo = 0 GROUP BY src_wire_in_tile_pkey"""
+        )
     )
-    for (wire_pkey, ) in cur:
-        cur2.execute(
-            """SELECT count() FROM pip_in_tile WHERE src_wire_in_tile_pkey = (
-            SELECT wire_in_tile_pkey FROM wire WHERE pkey = ?
-            ) AND pip_in_tile.is_pseudo = 0""", (wire_pkey, )
+    backward_pips = dict(
+        cur.execute(
+            """
+SELECT dest_wire_in_tile_pkey, count() FROM pip_in_tile
+WHERE is_pseudo = 0 GROUP BY dest_wire_in_tile_pkey"""
         )
-        has_forward_pip = cur2.fetchone()[0]
+    )
+    forward_pips.pop(None, None)
+    backward_pips.pop(None, None)
 
-        cur2.execute(
-            """SELECT count() FROM pip_in_tile WHERE dest_wire_in_tile_pkey = (
-            SELECT wire_in_tile_pkey FROM wire WHERE pkey = ?
-            ) AND pip_in_tile.is_pseudo = 0""", (wire_pkey, )
-        )
-        has_backward_pip = cur2.fetchone()[0]
+    node_wires = {}
+    wire_phy_tiles = {}
+    for wire_pkey, node_pkey, wire_in_tile_pkey, phy_tile_pkey in cur.execute(
+            "SELECT pkey, node_pkey, wire_in_tile_pkey, phy_tile_pkey FROM wire"
+    ):
+        if node_pkey in node_pkeys:
+            node_wires.setdefault(node_pkey,
+                                  []).append((wire_pkey, wire_in_tile_pkey))
+            wire_phy_tiles[wire_pkey] = phy_tile_pkey
 
-        if forward:
-            if has_forward_pip:
-                source_wires.append(wire_pkey)
-            if has_backward_pip:
-                sink_wires.append(wire_pkey)
-        else:
-            if has_forward_pip:
-                sink_wires.append(wire_pkey)
-            if has_backward_pip:
-                source_wires.append(wire_pkey)
+    def get_pin_connection(
+            pin_graph_node_pkey, forward, graph_node_pkey, node_pkey, tracks
+    ):
+        """ Returns pin connection box location canonical location.
 
-    if len(source_wires) > 1:
-        if forward:
-            # Ambiguous output location, just use input pips, which should
-            # have only 1 phy_tile location.
-            cur2.execute(
-                """
+        Tracks that are a part of the pinfeed also get this location.
+
+        Returns None if the location is unknown, otherwise tuple of the
+        phy_tile_pkey of the location and the connection box wire pkey of the
+        IPIN (None for OPIN's).
+
+        """
+        source_wires = []
+        sink_wires = []
+        for wire_pkey, wire_in_tile_pkey in node_wires.get(node_pkey, []):
+            has_forward_pip = forward_pips.get(wire_in_tile_pkey, 0)
+            has_backward_pip = backward_pips.get(wire_in_tile_pkey, 0)
+
+            if forward:
+                if has_forward_pip:
+                    source_wires.append(wire_pkey)
+                if has_backward_pip:
+                    sink_wires.append(wire_pkey)
+            else:
+                if has_forward_pip:
+                    sink_wires.append(wire_pkey)
+                if has_backward_pip:
+                    source_wires.append(wire_pkey)
+
+        if len(source_wires) > 1:
+            if forward:
+                # Ambiguous output location, just use input pips, which should
+                # have only 1 phy_tile location.
+                cur.execute(
+                    """
 WITH wires_in_graph_node(phy_tile_pkey, phy_tile_type_pkey, wire_in_tile_pkey) AS (
     SELECT wire.phy_tile_pkey, phy_tile.tile_type_pkey, wire.wire_in_tile_pkey
     FROM graph_node
@@ -1484,86 +1777,64 @@ ON
     wire.wire_in_tile_pkey = pip_in_tile.src_wire_in_tile_pkey
 AND
     wire.phy_tile_pkey = wires_in_graph_node.phy_tile_pkey;
-                """, (graph_node_pkey, )
-            )
-            src_phy_tiles = cur2.fetchall()
-
-            if len(src_phy_tiles) > 1:
-                # Try pruning bi-directional pips
-                src_phy_tiles = [
-                    (phy_tile_pkey, is_directional)
-                    for (phy_tile_pkey, is_directional) in src_phy_tiles
-                    if is_directional
-                ]
-
-            assert len(src_phy_tiles) == 1, (
-                pin_graph_node_pkey, graph_node_pkey, source_wires, tracks,
-                src_phy_tiles
-            )
-            phy_tile_pkey = src_phy_tiles[0][0]
-        else:
-            # Have an ambiguous source, see if there is an unambigous sink.
-            #
-            # Remove sinks that are also sources (e.g. bidirectional wires)
-            sink_wires = list(set(sink_wires) - set(source_wires))
-
-            if len(sink_wires) == 1:
-                cur.execute(
-                    "SELECT phy_tile_pkey FROM wire WHERE pkey = ?",
-                    (sink_wires[0], )
+                    """, (graph_node_pkey, )
                 )
-                source_wires = sink_wires
-                phy_tile_pkey = cur.fetchone()[0]
-            else:
-                assert False, (
-                    pin_graph_node_pkey, graph_node_pkey, source_wires,
-                    sink_wires, tracks
+                src_phy_tiles = cur.fetchall()
+
+                if len(src_phy_tiles) > 1:
+                    # Try pruning bi-directional pips
+                    src_phy_tiles = [
+                        (phy_tile_pkey, is_directional)
+                        for (phy_tile_pkey, is_directional) in src_phy_tiles
+                        if is_directional
+                    ]
+
+                assert len(src_phy_tiles) == 1, (
+                    pin_graph_node_pkey, graph_node_pkey, source_wires, tracks,
+                    src_phy_tiles
                 )
-                return
-    elif len(source_wires) == 1:
-        cur.execute(
-            "SELECT phy_tile_pkey FROM wire WHERE pkey = ?",
-            (source_wires[0], )
-        )
-        phy_tile_pkey = cur.fetchone()[0]
-    elif len(sink_wires) == 1:
-        cur.execute(
-            "SELECT phy_tile_pkey FROM wire WHERE pkey = ?", (sink_wires[0], )
-        )
-        source_wires = sink_wires
-        phy_tile_pkey = cur.fetchone()[0]
-    else:
-        return
+                phy_tile_pkey = src_phy_tiles[0][0]
+            else:
+                # Have an ambiguous source, see if there is an unambigous
+                # sink.
+                #
+                # Remove sinks that are also sources (e.g. bidirectional
+                # wires)
+                sink_wires = list(set(sink_wires) - set(source_wires))
+
+                if len(sink_wires) == 1:
+                    source_wires = sink_wires
+                    phy_tile_pkey = wire_phy_tiles[sink_wires[0]]
+                else:
+                    assert False, (
+                        pin_graph_node_pkey, graph_node_pkey, source_wires,
+                        sink_wires, tracks
+                    )
+                    return None
+        elif len(source_wires) == 1:
+            phy_tile_pkey = wire_phy_tiles[source_wires[0]]
+        elif len(sink_wires) == 1:
+            source_wires = sink_wires
+            phy_tile_pkey = wire_phy_tiles[sink_wires[0]]
+        else:
+            return None
 
-    for track_pkey in tracks:
-        write_cur.execute(
-            "UPDATE track SET canon_phy_tile_pkey = ? WHERE pkey = ?", (
-                phy_tile_pkey,
-                track_pkey,
-            )
-        )
+        if forward:
+            return phy_tile_pkey, None
+        else:
+            assert NodeType(node_types[pin_graph_node_pkey]) == NodeType.IPIN
+            return phy_tile_pkey, source_wires[0]
 
-    if not forward:
-        assert NodeType(graph_node_type) == NodeType.IPIN
-        source_wire_pkey = source_wires[0]
-        write_cur.execute(
-            """
-UPDATE graph_node SET connection_box_wire_pkey = ? WHERE pkey = ?
-            """, (
-                source_wire_pkey,
-                pin_graph_node_pkey,
-            )
-        )
+    return get_pin_connection
 
 
-def walk_and_mark_segment(
-        conn, write_cur, graph_node_pkey, forward, segment_pkey, unknown_pkey,
-        pin_graph_node_pkey, tracks, visited_nodes
-):
-    """ Recursive function to walk along a node and mark segments.
+class PinFeedWalk(object):
+    """ Walk along the pin feed of an IPIN or OPIN.
 
-    This algorithm is used for marking INPINFEED and OUTPINFEED on nodes
-    starting from an IPIN or OPIN edge.
+    The walk starts at the IPIN or OPIN and follows the graph edges (forward
+    from OPIN's, backward from IPIN's) while the next graph node is
+    unambiguous.  The walk is used for marking INPINFEED and OUTPINFEED on
+    tracks starting from an IPIN or OPIN edge.
 
     In addition, the canonical location of the connection box IPIN/OPIN nodes
     is the canonical location of the routing interface.  For example, the
@@ -1573,157 +1844,187 @@ def walk_and_mark_segment(
     tile.
 
     """
-    cur = conn.cursor()
 
-    # Update track segment's to segment_pkey (e.g. INPINFEED or OUTPINFEED).
-    cur.execute(
-        """SELECT graph_node_type FROM graph_node WHERE pkey = ?""",
-        (graph_node_pkey, )
-    )
-    graph_node_type = NodeType(cur.fetchone()[0])
-    if graph_node_type in [NodeType.CHANX, NodeType.CHANY]:
-        cur.execute(
-            "SELECT track_pkey FROM graph_node WHERE pkey = ?",
-            (graph_node_pkey, )
-        )
-        track_pkey = cur.fetchone()[0]
-        assert track_pkey is not None
+    def __init__(self, pin_graph_node_pkey, forward, segment_pkey):
+        self.pin_graph_node_pkey = pin_graph_node_pkey
+        self.forward = forward
+        self.segment_pkey = segment_pkey
 
-        cur.execute(
-            "SELECT segment_pkey FROM track WHERE pkey = ?", (track_pkey, )
-        )
-        old_segment_pkey = cur.fetchone()[0]
-        if old_segment_pkey == unknown_pkey or old_segment_pkey is None:
-            tracks.append(track_pkey)
-            write_cur.execute(
-                "UPDATE track SET segment_pkey = ? WHERE pkey = ?", (
-                    segment_pkey,
-                    track_pkey,
-                )
-            )
-    else:
-        track_pkey = None
+        # Current graph node of the walk, the graph node the walk ended at
+        # once done.
+        self.graph_node_pkey = pin_graph_node_pkey
+        self.visited_nodes = set()
 
-    # Traverse to the next graph node.
-    if forward:
-        cur.execute(
-            """
-SELECT
-    graph_edge.dest_graph_node_pkey,
-    graph_node.track_pkey
-FROM
-    graph_edge
-INNER JOIN graph_node ON graph_node.pkey = graph_edge.dest_graph_node_pkey
-WHERE
-    src_graph_node_pkey = ?
-""", (graph_node_pkey, )
-        )
-        next_nodes = cur.fetchall()
-    else:
-        cur.execute(
-            """
-SELECT
-    graph_edge.src_graph_node_pkey,
-    graph_node.track_pkey
-FROM
-    graph_edge
-INNER JOIN graph_node ON graph_node.pkey = graph_edge.src_graph_node_pkey
-WHERE
-    dest_graph_node_pkey = ?
-""", (graph_node_pkey, )
-        )
-        next_nodes = cur.fetchall()
-
-    if not forward:
-        # Some nodes simply lead to GND/VCC tieoff pins, these should not
-        # stop the walk, as they are not relevant to connection box.
-        next_non_tieoff_nodes = []
-        for (next_graph_node_pkey, next_track) in next_nodes:
-            cur.execute(
-                """
-SELECT count() FROM constant_sources WHERE
-    vcc_track_pkey = (SELECT track_pkey FROM graph_node WHERE pkey = ?)
-OR
-    gnd_track_pkey = (SELECT track_pkey FROM graph_node WHERE pkey = ?)
-    """, (
-                    next_graph_node_pkey,
-                    next_graph_node_pkey,
-                )
-            )
-            if cur.fetchone()[0] == 0:
-                next_non_tieoff_nodes.append(
-                    (next_graph_node_pkey, next_track)
-                )
+        # Tracks of the CHANX/CHANY graph nodes visited, in walk order.
+        self.visited_tracks = []
 
-        if len(next_non_tieoff_nodes) == 1:
-            (next_node, next_track) = next_non_tieoff_nodes[0]
+        # Tracks whose segment is set by this walk.
+        self.tracks = []
 
-        next_nodes = next_non_tieoff_nodes
+    def advance(self, edge_index, node_types, node_tracks, tieoff_tracks):
+        """ Moves the walk to the next graph node.
 
-    if len(next_nodes) == 1:
-        # This is a simple edge, keep walking.
-        (next_node, next_track) = next_nodes[0]
-    else:
-        next_other_nodes = []
-        for next_node, next_track in next_nodes:
+        Returns False if there is no next graph node, in which case the walk
+        is done.
+
+        """
+        graph_node_pkey = self.graph_node_pkey
+
+        if node_types[graph_node_pkey] in [NodeType.CHANX.value,
+                                           NodeType.CHANY.value]:
+            track_pkey = node_tracks[graph_node_pkey]
+            assert track_pkey is not None
+            self.visited_tracks.append(track_pkey)
+        else:
+            track_pkey = None
+
+        # Traverse to the next graph node.
+        if self.forward:
+            next_nodes = edge_index.get_successors(graph_node_pkey).tolist()
+        else:
+            next_nodes = edge_index.get_predecessors(graph_node_pkey).tolist()
+
+        next_nodes = [
+            (next_node, node_tracks[next_node]) for next_node in next_nodes
+        ]
+
+        if not self.forward:
+            # Some nodes simply lead to GND/VCC tieoff pins, these should not
+            # stop the walk, as they are not relevant to connection box.
+            next_nodes = [
+                (next_node, next_track)
+                for (next_node, next_track) in next_nodes
+                if next_track not in tieoff_tracks
+            ]
+
+        if len(next_nodes) == 1:
+            # This is a simple edge, keep walking.
+            (next_node, next_track) = next_nodes[0]
+        else:
             # Shorted groups will have edges back to previous nodes, but they
             # will be in the same track, so ignore these.
-            if next_node in visited_nodes and track_pkey == next_track:
-                continue
+            next_other_nodes = [
+                (next_node, next_track)
+                for (next_node, next_track) in next_nodes
+                if next_node not in self.visited_nodes
+                or track_pkey != next_track
+            ]
+
+            if len(next_other_nodes) == 1:
+                # This is a simple edge, keep walking.
+                (next_node, next_track) = next_other_nodes[0]
             else:
-                next_other_nodes.append((next_node, next_track))
+                next_node = None
 
-        if len(next_other_nodes) == 1:
-            # This is a simple edge, keep walking.
-            (next_node, next_track) = next_other_nodes[0]
-        else:
-            next_node = None
+        if next_node is None or next_node in self.visited_nodes:
+            return False
 
-    if next_node is not None and next_node not in visited_nodes:
-        # If there is a next node, keep walking
-        visited_nodes.add(next_node)
-        walk_and_mark_segment(
-            conn=conn,
-            write_cur=write_cur,
-            graph_node_pkey=next_node,
-            forward=forward,
-            segment_pkey=segment_pkey,
-            unknown_pkey=unknown_pkey,
-            pin_graph_node_pkey=pin_graph_node_pkey,
-            tracks=tracks,
-            visited_nodes=visited_nodes
-        )
-    else:
-        # There is not a next node, update the connection box of the IPIN/OPIN
-        # the walk was started from.
-        set_pin_connection(
-            conn=conn,
-            write_cur=write_cur,
-            pin_graph_node_pkey=pin_graph_node_pkey,
-            forward=forward,
-            graph_node_pkey=graph_node_pkey,
-            tracks=tracks
-        )
+        self.visited_nodes.add(next_node)
+        self.graph_node_pkey = next_node
+        return True
 
 
-def active_graph_node(conn, graph_node_pkey, forward):
-    """ Returns true if an edge in the specified direction exists. """
+def walk_pin_feeds(conn, edge_index, walks, unknown_pkey):
+    """ Runs pin feed walks and marks the segments of the walked tracks.
+
+    All walks are advanced together, one graph node at a time, using in
+    memory copies of the graph node types and tracks.
+
+    The segment of a walked track is set to the segment of the walk if it is
+    unknown.  Walks claim tracks in the order of walks, and the canonical
+    location of the tracks claimed by a walk and the connection box of the
+    walk IPIN is set from the graph node the walk ended at, see
+    create_get_pin_connection.
+
+    """
     cur = conn.cursor()
 
-    if forward:
-        cur.execute(
-            """
-SELECT count(*) FROM graph_edge WHERE src_graph_node_pkey = ? LIMIT 1
-            """, (graph_node_pkey, )
-        )
-    else:
-        cur.execute(
+    node_types = [None for _ in range(edge_index.num_nodes)]
+    node_tracks = [None for _ in range(edge_index.num_nodes)]
+    node_nodes = [None for _ in range(edge_index.num_nodes)]
+    for graph_node_pkey, graph_node_type, track_pkey, node_pkey in cur.execute(
             """
-SELECT count(*) FROM graph_edge WHERE dest_graph_node_pkey = ? LIMIT 1
-            """, (graph_node_pkey, )
+SELECT pkey, graph_node_type, track_pkey, node_pkey FROM graph_node"""):
+        node_types[graph_node_pkey] = graph_node_type
+        node_tracks[graph_node_pkey] = track_pkey
+        node_nodes[graph_node_pkey] = node_pkey
+
+    tieoff_tracks = set()
+    for vcc_track_pkey, gnd_track_pkey in cur.execute(
+            "SELECT vcc_track_pkey, gnd_track_pkey FROM constant_sources"):
+        tieoff_tracks.add(vcc_track_pkey)
+        tieoff_tracks.add(gnd_track_pkey)
+    tieoff_tracks.discard(None)
+
+    track_segments = dict(cur.execute("SELECT pkey, segment_pkey FROM track"))
+
+    frontier = walks
+    while len(frontier) > 0:
+        frontier = [
+            walk for walk in frontier if
+            walk.advance(edge_index, node_types, node_tracks, tieoff_tracks)
+        ]
+
+    get_pin_connection = create_get_pin_connection(
+        conn,
+        node_types=node_types,
+        node_pkeys=set(node_nodes[walk.graph_node_pkey] for walk in walks),
+    )
+
+    segment_updates = []
+    canon_loc_updates = []
+    connection_box_updates = []
+    for walk in walks:
+        for track_pkey in walk.visited_tracks:
+            old_segment_pkey = track_segments[track_pkey]
+            if old_segment_pkey == unknown_pkey or old_segment_pkey is None:
+                walk.tracks.append(track_pkey)
+                track_segments[track_pkey] = walk.segment_pkey
+                segment_updates.append((walk.segment_pkey, track_pkey))
+
+        # There is not a next node, update the connection box of the
+        # IPIN/OPIN the walk was started from.
+        pin_connection = get_pin_connection(
+            pin_graph_node_pkey=walk.pin_graph_node_pkey,
+            forward=walk.forward,
+            graph_node_pkey=walk.graph_node_pkey,
+            node_pkey=node_nodes[walk.graph_node_pkey],
+            tracks=walk.tracks
         )
+        if pin_connection is None:
+            continue
 
-    return cur.fetchone()[0] > 0
+        phy_tile_pkey, connection_box_wire_pkey = pin_connection
+        for track_pkey in walk.tracks:
+            canon_loc_updates.append((phy_tile_pkey, track_pkey))
+
+        if connection_box_wire_pkey is not None:
+            connection_box_updates.append(
+                (connection_box_wire_pkey, walk.pin_graph_node_pkey)
+            )
+
+    write_cur = conn.cursor()
+    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+    write_cur.executemany(
+        "UPDATE track SET segment_pkey = ? WHERE pkey = ?", segment_updates
+    )
+    write_cur.executemany(
+        "UPDATE track SET canon_phy_tile_pkey = ? WHERE pkey = ?",
+        canon_loc_updates
+    )
+    write_cur.executemany(
+        "UPDATE graph_node SET connection_box_wire_pkey = ? WHERE pkey = ?",
+        connection_box_updates
+    )
+    write_cur.execute("""COMMIT TRANSACTION;""")
+
+
+def active_graph_node(edge_index, graph_node_pkey, forward):
+    """ Returns true if an edge in the specified direction exists. """
+    if forward:
+        return len(edge_index.get_successors(graph_node_pkey)) > 0
+    else:
+        return len(edge_index.get_predecessors(graph_node_pkey)) > 0
 
 
 def annotate_pin_feeds(conn, ccio_sites):
@@ -1734,7 +2035,6 @@ def annotate_pin_feeds(conn, ccio_sites):
     if these nodes are not given a specific segment, they will be assigned as
     INPINFEED or OUTPINFEED.
     """
-    write_cur = conn.cursor()
     cur = conn.cursor()
 
     segments = {}
@@ -1742,27 +2042,27 @@ def annotate_pin_feeds(conn, ccio_sites):
             "SELECT pkey, name FROM segment"):
         segments[segment_name] = segment_pkey
 
-    # Find BUFHCE OPIN's, so that walk_and_mark_segment uses correct segment
+    # Find BUFHCE OPIN's, so that the pin feed walk uses correct segment
     # type.
     bufhce_opins = get_pins(conn, "BUFHCE", "O")
 
-    # Find BUFGCTRL OPIN's, so that walk_and_mark_segment uses correct segment
+    # Find BUFGCTRL OPIN's, so that the pin feed walk uses correct segment
     # type.
     bufg_opins = get_pins(conn, "BUFGCTRL", "O")
 
-    # Find BUFGCTRL IPIN's, so that walk_and_mark_segment uses correct segment
+    # Find BUFGCTRL IPIN's, so that the pin feed walk uses correct segment
     # type.
     bufg_ipins = set()
     for nipins in range(2):
         bufg_ipins |= get_pins(conn, "BUFGCTRL", "I{}".format(nipins))
 
-    # Find PLL OPIN's, so that walk_and_mark_segment uses correct segment
+    # Find PLL OPIN's, so that the pin feed walk uses correct segment
     # type.
     pll_opins = set()
     for nclk in range(6):
         pll_opins |= get_pins(conn, "PLLE2_ADV", "CLKOUT{}".format(nclk))
 
-    # Find PLL IPIN's, so that walk_and_mark_segment uses correct segment
+    # Find PLL IPIN's, so that the pin feed walk uses correct segment
     # type.
     pll_ipins = set()
     for nclk in range(2):
@@ -1800,7 +2100,8 @@ AND
         for (graph_node_pkey, ) in cur:
             ccio_opins.add(graph_node_pkey)
 
-    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+    edge_index = GraphEdgeIndex(conn)
+    walks = []
 
     # Walk from OPIN's first.
     for (graph_node_pkey, node_pkey) in cur.execute("""
@@ -1808,7 +2109,7 @@ SELECT graph_node.pkey, graph_node.node_pkey
 FROM graph_node
 WHERE graph_node.graph_node_type = ?
         """, (NodeType.OPIN.value, )):
-        if not active_graph_node(conn, graph_node_pkey, forward=True):
+        if not active_graph_node(edge_index, graph_node_pkey, forward=True):
             continue
 
         if graph_node_pkey in bufhce_opins:
@@ -1822,16 +2123,12 @@ WHERE graph_node.graph_node_type = ?
         else:
             segment_pkey = segments["OUTPINFEED"]
 
-        walk_and_mark_segment(
-            conn,
-            write_cur,
-            graph_node_pkey,
-            forward=True,
-            segment_pkey=segment_pkey,
-            unknown_pkey=segments["unknown"],
-            pin_graph_node_pkey=graph_node_pkey,
-            tracks=list(),
-            visited_nodes=set()
+        walks.append(
+            PinFeedWalk(
+                pin_graph_node_pkey=graph_node_pkey,
+                forward=True,
+                segment_pkey=segment_pkey
+            )
         )
 
     # Walk from IPIN's next.
@@ -1841,7 +2138,7 @@ FROM graph_node
 WHERE graph_node.graph_node_type = ?
         """, (NodeType.IPIN.value, )):
 
-        if not active_graph_node(conn, graph_node_pkey, forward=False):
+        if not active_graph_node(edge_index, graph_node_pkey, forward=False):
             continue
 
         if graph_node_pkey in bufg_ipins:
@@ -1851,19 +2148,15 @@ WHERE graph_node.graph_node_type = ?
         else:
             segment_pkey = segments["INPINFEED"]
 
-        walk_and_mark_segment(
-            conn,
-            write_cur,
-            graph_node_pkey,
-            forward=False,
-            segment_pkey=segment_pkey,
-            unknown_pkey=segments["unknown"],
-            pin_graph_node_pkey=graph_node_pkey,
-            tracks=list(),
-            visited_nodes=set()
+        walks.append(
+            PinFeedWalk(
+                pin_graph_node_pkey=graph_node_pkey,
+                forward=False,
+                segment_pkey=segment_pkey
+            )
         )
 
-    write_cur.execute("""COMMIT TRANSACTION;""")
+    walk_pin_feeds(conn, edge_index, walks, unknown_pkey=segments["unknown"])
 
 
 def set_track_canonical_loc(conn):
@@ -1875,53 +2168,60 @@ def set_track_canonical_loc(conn):
 
     For bidirection wires (generally long segments), use a consisent
     canonilization.
+
+    The canonical location is the tile of the track wire with a pip driving
+    it that has the smallest (grid_x, grid_y).
+
     """
 
-    write_cur = conn.cursor()
     cur = conn.cursor()
-    cur2 = conn.cursor()
-    cur3 = conn.cursor()
-
-    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
 
-    cur.execute("SELECT pkey FROM track WHERE alive")
-    tracks = cur.fetchall()
-    for (track_pkey, ) in progressbar_utils.progressbar(tracks):
-        source_wires = []
-        for (wire_pkey, ) in cur2.execute("""
-SELECT pkey FROM wire WHERE node_pkey IN (
-    SELECT pkey FROM node WHERE track_pkey = ?
-    )""", (track_pkey, )):
-            cur3.execute(
-                """
-SELECT count(*)
-FROM pip_in_tile
-WHERE
-    dest_wire_in_tile_pkey = (SELECT wire_in_tile_pkey FROM wire WHERE pkey = ?)
-LIMIT 1
-    """, (wire_pkey, )
-            )
-            pips_to_wire = cur3.fetchone()[0]
-            if pips_to_wire > 0:
-                cur3.execute(
-                    """
-SELECT grid_x, grid_y FROM phy_tile WHERE pkey = (
-    SELECT phy_tile_pkey FROM wire WHERE pkey = ?
-                    )""", (wire_pkey, )
-                )
-                grid_x, grid_y = cur3.fetchone()
-                source_wires.append(((grid_x, grid_y), wire_pkey))
+    # Wire in tile types driven by at least one pip.
+    cur.execute("SELECT MAX(pkey) FROM wire_in_tile")
+    max_wire_in_tile_pkey = cur.fetchone()[0]
+    has_pip_to_wire = numpy.zeros(
+        0 if max_wire_in_tile_pkey is None else max_wire_in_tile_pkey + 1,
+        dtype=bool
+    )
+    dest_wire_in_tile_pkeys = numpy.array(
+        cur.execute(
+            """
+SELECT DISTINCT dest_wire_in_tile_pkey FROM pip_in_tile"""
+        ).fetchall(),
+        dtype=numpy.int64
+    ).reshape(-1)
+    has_pip_to_wire[dest_wire_in_tile_pkeys] = True
 
-        if len(source_wires) > 0:
-            source_wire_pkey = min(source_wires, key=lambda x: x[0])[1]
-            write_cur.execute(
-                """
-UPDATE track
-SET canon_phy_tile_pkey = (SELECT phy_tile_pkey FROM wire WHERE pkey = ?)
-WHERE pkey = ?
-            """, (source_wire_pkey, track_pkey)
-            )
+    track_wires = numpy.array(
+        cur.execute(
+            """
+SELECT node.track_pkey, wire.wire_in_tile_pkey, phy_tile.grid_x,
+    phy_tile.grid_y, wire.phy_tile_pkey
+FROM wire
+INNER JOIN node ON node.pkey = wire.node_pkey
+INNER JOIN track ON track.pkey = node.track_pkey
+INNER JOIN phy_tile ON phy_tile.pkey = wire.phy_tile_pkey
+WHERE track.alive"""
+        ).fetchall(),
+        dtype=numpy.int64
+    ).reshape(-1, 5)
+    track_wires = track_wires[has_pip_to_wire[track_wires[:, 1]]]
+
+    # Sort source wires by track, then location, the first wire of each
+    # track is at its canonical location.
+    order = numpy.lexsort(
+        (track_wires[:, 3], track_wires[:, 2], track_wires[:, 0])
+    )
+    track_wires = track_wires[order]
+    first_wire = numpy.ones(len(track_wires), dtype=bool)
+    first_wire[1:] = track_wires[1:, 0] != track_wires[:-1, 0]
+    canon_locs = track_wires[first_wire][:, [4, 0]].tolist()
 
+    write_cur = conn.cursor()
+    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+    write_cur.executemany(
+        "UPDATE track SET canon_phy_tile_pkey = ? WHERE pkey = ?", canon_locs
+    )
     write_cur.execute("""COMMIT TRANSACTION;""")
 
 
@@ -1935,68 +2235,90 @@ def get_segment_length(segment_lengths):
 
 
 def compute_segment_lengths(conn):
-    """ Determine segment lengths used for cost normalization. """
-    cur = conn.cursor()
-    cur2 = conn.cursor()
-    cur3 = conn.cursor()
-    cur4 = conn.cursor()
-
-    write_cur = conn.cursor()
+    """ Determine segment lengths used for cost normalization.
 
-    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
-
-    for (segment_pkey, ) in cur.execute("SELECT pkey FROM segment"):
-
-        segment_lengths = []
+    The length of a track is the largest manhattan distance from the
+    canonical location of the track to the canonical location of the tracks
+    downstream of it, and at least 1.  The length of a segment is the median
+    length of the tracks of the segment with a canonical location.
 
-        # Get all tracks with this segment
-        for (track_pkey, src_phy_tile_pkey) in cur2.execute("""
-SELECT pkey, canon_phy_tile_pkey FROM track
-WHERE
-    canon_phy_tile_pkey IS NOT NULL
-AND
-    segment_pkey = ?
-        """, (segment_pkey, )):
-            segment_length = 1
-            cur4.execute(
-                "SELECT grid_x, grid_y FROM phy_tile WHERE pkey = ?",
-                (src_phy_tile_pkey, )
-            )
-            src_x, src_y = cur4.fetchone()
-
-            # Get tiles downstream of this track.
-            for (dest_phy_tile_pkey, ) in cur3.execute("""
-SELECT DISTINCT canon_phy_tile_pkey FROM track WHERE pkey IN (
-    SELECT track_pkey FROM graph_node WHERE pkey IN (
-        SELECT dest_graph_node_pkey FROM graph_edge WHERE src_graph_node_pkey IN (
-            SELECT pkey FROM graph_node WHERE track_pkey = ?
-        )
-    )
-) AND canon_phy_tile_pkey IS NOT NULL
-            """, (track_pkey, )):
-                if src_phy_tile_pkey == dest_phy_tile_pkey:
-                    continue
-
-                cur4.execute(
-                    "SELECT grid_x, grid_y FROM phy_tile WHERE pkey = ?",
-                    (dest_phy_tile_pkey, )
-                )
-                dest_x, dest_y = cur4.fetchone()
-
-                segment_length = max(
-                    segment_length,
-                    abs(dest_x - src_x) + abs(dest_y - src_y)
-                )
+    """
+    cur = conn.cursor()
 
-            segment_lengths.append(segment_length)
+    edge_index = GraphEdgeIndex(conn)
 
-        write_cur.execute(
-            "UPDATE segment SET length = ? WHERE pkey = ?", (
-                get_segment_length(segment_lengths),
+    node_tracks = numpy.full(edge_index.num_nodes, -1, dtype=numpy.int64)
+    track_nodes = numpy.array(
+        cur.execute(
+            """
+SELECT pkey, track_pkey FROM graph_node WHERE track_pkey IS NOT NULL"""
+        ).fetchall(),
+        dtype=numpy.int64
+    ).reshape(-1, 2)
+    node_tracks[track_nodes[:, 0]] = track_nodes[:, 1]
+
+    # Canonical location of tracks, tracks without a canonical location have
+    # no length and are not downstream of other tracks.
+    canon_tracks = numpy.array(
+        cur.execute(
+            """
+SELECT track.pkey, COALESCE(track.segment_pkey, -1), phy_tile.grid_x,
+    phy_tile.grid_y
+FROM track
+INNER JOIN phy_tile ON phy_tile.pkey = track.canon_phy_tile_pkey"""
+        ).fetchall(),
+        dtype=numpy.int64
+    ).reshape(-1, 4)
+    track_pkeys = canon_tracks[:, 0]
+    track_segments = canon_tracks[:, 1]
+
+    cur.execute("SELECT MAX(pkey) FROM track")
+    max_track_pkey = cur.fetchone()[0]
+    num_tracks = 0 if max_track_pkey is None else max_track_pkey + 1
+
+    has_canon_loc = numpy.zeros(num_tracks, dtype=bool)
+    has_canon_loc[track_pkeys] = True
+    track_x = numpy.zeros(num_tracks, dtype=numpy.int64)
+    track_x[track_pkeys] = canon_tracks[:, 2]
+    track_y = numpy.zeros(num_tracks, dtype=numpy.int64)
+    track_y[track_pkeys] = canon_tracks[:, 3]
+
+    # Distance along every edge between two tracks with a canonical location.
+    src_tracks = node_tracks[numpy.repeat(
+        numpy.arange(edge_index.num_nodes), edge_index.out_degree()
+    )]
+    dest_tracks = node_tracks[edge_index.successors]
+    track_edges = (src_tracks != -1) & (dest_tracks != -1)
+    src_tracks = src_tracks[track_edges]
+    dest_tracks = dest_tracks[track_edges]
+
+    track_edges = has_canon_loc[src_tracks] & has_canon_loc[dest_tracks]
+    src_tracks = src_tracks[track_edges]
+    dest_tracks = dest_tracks[track_edges]
+
+    distances = numpy.abs(
+        track_x[dest_tracks] - track_x[src_tracks]
+    ) + numpy.abs(track_y[dest_tracks] - track_y[src_tracks])
+
+    track_lengths = numpy.ones(num_tracks, dtype=numpy.int64)
+    numpy.maximum.at(track_lengths, src_tracks, distances)
+
+    segment_lengths = []
+    for (segment_pkey, ) in cur.execute("SELECT pkey FROM segment").fetchall():
+        segment_lengths.append(
+            (
+                get_segment_length(
+                    track_lengths[track_pkeys[track_segments == segment_pkey]]
+                ),
                 segment_pkey,
             )
         )
 
+    write_cur = conn.cursor()
+    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+    write_cur.executemany(
+        "UPDATE segment SET length = ? WHERE pkey = ?", segment_lengths
+    )
     write_cur.execute("""COMMIT TRANSACTION;""")
 
 
@@ -2062,9 +2384,20 @@ def create_edge_indices(conn):
     print('{} Indices created, marking track liveness'.format(now()))
 
 
-def create_and_insert_edges(
-        db, grid, conn, use_roi, roi, input_only_nodes, output_only_nodes
+def create_make_tile_edges(
+        conn, input_only_nodes, output_only_nodes, defer_site_pin_nodes=False
 ):
+    """ Returns a function that creates the edges for the pips of one tile.
+
+    Args:
+        conn: Database connection
+        input_only_nodes (set of node_pkey): See make_connection.
+        output_only_nodes (set of node_pkey): See make_connection.
+        defer_site_pin_nodes (bool): See Connector.
+
+    Returns:
+        Function.  See make_tile_edges below for signature.
+    """
     write_cur = conn.cursor()
 
     write_cur.execute(
@@ -2076,29 +2409,32 @@ def create_and_insert_edges(
 
     find_pip = create_find_pip(conn)
     find_wire = create_find_wire(conn)
-    find_connector = create_find_connector(conn)
+    find_connector = create_find_connector(
+        conn, defer_site_pin_nodes=defer_site_pin_nodes
+    )
     get_tile_loc = create_get_tile_loc(conn)
 
-    const_connectors = create_const_connectors(conn)
+    const_connectors = create_const_connectors(
+        conn, defer_site_pin_nodes=defer_site_pin_nodes
+    )
 
     sorted_pips = {}
 
-    num_edges = 0
-    edges = []
-    for loc in progressbar_utils.progressbar(grid.tile_locations()):
-        edge_set = set()
+    def make_tile_edges(db, tile_name, tile_type):
+        """ Yields edges for the pips in tile, see make_connection.
 
-        gridinfo = grid.gridinfo_at_loc(loc)
-        tile_name = grid.tilename_at_loc(loc)
+        Duplicate edges are not removed, see dedup_tile_edges.
 
-        # Not a synth node, check if in ROI.
-        if use_roi and not roi.tile_in_roi(loc):
-            continue
-
-        tile_type = db.get_tile_type(gridinfo.tile_type)
+        Args:
+            db (prjxray.db.Database): Project X-Ray database.
+            tile_name (str): Name of tile.
+            tile_type (str): Tile type of tile.
 
+        """
         if tile_type not in sorted_pips:
-            sorted_pips[tile_type] = make_sorted_pips(tile_type.get_pips())
+            sorted_pips[tile_type] = make_sorted_pips(
+                db.get_tile_type(tile_type).get_pips()
+            )
 
         for forward, pip in sorted_pips[tile_type]:
             # FIXME: The PADOUT0/1 connections do not work.
@@ -2139,7 +2475,7 @@ def create_and_insert_edges(
                 find_connector=find_connector,
                 get_tile_loc=get_tile_loc,
                 tile_name=tile_name,
-                tile_type=gridinfo.tile_type,
+                tile_type=tile_type,
                 pip=pip,
                 delayless_switch=delayless_switch,
                 const_connectors=const_connectors,
@@ -2148,12 +2484,195 @@ def create_and_insert_edges(
 
             if connections:
                 for connection in connections:
-                    key = tuple(connection[0:3])
-                    if key in edge_set:
-                        continue
+                    yield connection
+
+    return make_tile_edges
 
-                    edge_set.add(key)
-                    edges.append(connection)
+
+def dedup_tile_edges(edges):
+    """ Yields edges, skipping repeated (src, dest, switch) connections. """
+    edge_set = set()
+    for connection in edges:
+        key = tuple(connection[0:3])
+        if key in edge_set:
+            continue
+
+        edge_set.add(key)
+        yield connection
+
+
+# Per process state of edge creation workers, see init_edge_worker.
+EDGE_WORKER = None
+
+
+def init_edge_worker(
+        db_root, part, connection_database, input_only_nodes, output_only_nodes
+):
+    """ Initializes an edge creation worker process.
+
+    Workers only read the connection database, site pin wire nodes are
+    returned as SitePinNodeRequest's for the parent to create.
+
+    """
+    global EDGE_WORKER
+
+    db = load_database(db_root, part)
+    conn = sqlite3.connect(
+        'file:{}?mode=ro'.format(connection_database), uri=True
+    )
+
+    EDGE_WORKER = (
+        db,
+        create_make_tile_edges(
+            conn=conn,
+            input_only_nodes=input_only_nodes,
+            output_only_nodes=output_only_nodes,
+            defer_site_pin_nodes=True
+        )
+    )
+
+
+def make_shard_edges(shard_tiles):
+    """ Creates the edges of a shard of tiles in an edge creation worker.
+
+    Args:
+        shard_tiles (tuple of (int, list of (tile_name, tile_type))): Shard
+            index and tiles in the shard.
+
+    Returns:
+        Tuple of (shard index, list of edge lists, one per tile).
+
+    """
+    shard, tiles = shard_tiles
+    db, make_tile_edges = EDGE_WORKER
+
+    return shard, [
+        list(make_tile_edges(db, tile_name, tile_type))
+        for tile_name, tile_type in tiles
+    ]
+
+
+def create_and_insert_edges_parallel(
+        conn, tiles, db_root, part, input_only_nodes, output_only_nodes, jobs,
+        scratch_dir
+):
+    """ Creates edges for tiles using a pool of worker processes.
+
+    The tiles are split into contiguous shards.  Workers resolve pips into
+    edges against a read-only snapshot of conn, and the parent merges the
+    shards back in tile order.  Site pin wire nodes are created during the
+    merge, so the resulting graph_node, track and graph_edge tables are
+    identical to the serial path.
+
+    Returns:
+        Number of edges inserted.
+
+    """
+    num_shards = min(len(tiles), jobs * 8)
+    shard_size = (len(tiles) + num_shards - 1) // max(num_shards, 1)
+    shards = [
+        tiles[idx:idx + shard_size]
+        for idx in range(0, len(tiles), max(shard_size, 1))
+    ]
+
+    resolve_site_pin_nodes = create_resolve_site_pin_nodes(conn)
+
+    edges = []
+    with tempfile.TemporaryDirectory(dir=scratch_dir) as tmp_dir:
+        snapshot = os.path.join(tmp_dir, 'connection_database_snapshot.db')
+        print('{} Writing database snapshot for workers'.format(now()))
+        snapshot_conn = sqlite3.connect(snapshot)
+        conn.backup(snapshot_conn)
+        snapshot_conn.close()
+
+        with multiprocessing.Pool(
+                processes=jobs,
+                initializer=init_edge_worker,
+                initargs=(
+                    db_root,
+                    part,
+                    snapshot,
+                    input_only_nodes,
+                    output_only_nodes,
+                ),
+        ) as pool:
+            for shard, tile_edges in progressbar_utils.progressbar(
+                    pool.imap(make_shard_edges,
+                              enumerate(shards)), max_value=len(shards)):
+                for shard_edges in tile_edges:
+                    edges.extend(
+                        dedup_tile_edges(
+                            resolve_site_pin_nodes(shard, shard_edges)
+                        )
+                    )
+
+    commit_edges(conn.cursor(), edges)
+
+    return len(edges)
+
+
+def create_and_insert_edges(
+        db,
+        grid,
+        conn,
+        use_roi,
+        roi,
+        input_only_nodes,
+        output_only_nodes,
+        jobs=1,
+        db_root=None,
+        part=None,
+        scratch_dir=None
+):
+    """ Creates graph_edge rows for the pips in every tile in the grid.
+
+    Args:
+        jobs (int): Number of worker processes.  If greater than 1, db_root
+            and part are required to open the Project X-Ray database in each
+            worker, and a snapshot of conn is written to scratch_dir.
+
+    """
+    tiles = []
+    for loc in grid.tile_locations():
+        # Not a synth node, check if in ROI.
+        if use_roi and not roi.tile_in_roi(loc):
+            continue
+
+        gridinfo = grid.gridinfo_at_loc(loc)
+        tiles.append((grid.tilename_at_loc(loc), gridinfo.tile_type))
+
+    if jobs > 1:
+        assert db_root is not None
+        assert part is not None
+
+        num_edges = create_and_insert_edges_parallel(
+            conn=conn,
+            tiles=tiles,
+            db_root=db_root,
+            part=part,
+            input_only_nodes=input_only_nodes,
+            output_only_nodes=output_only_nodes,
+            jobs=jobs,
+            scratch_dir=scratch_dir,
+        )
+
+        print('{} Created {} edges, inserted'.format(now(), num_edges))
+        return
+
+    write_cur = conn.cursor()
+
+    make_tile_edges = create_make_tile_edges(
+        conn=conn,
+        input_only_nodes=input_only_nodes,
+        output_only_nodes=output_only_nodes,
+    )
+
+    num_edges = 0
+    edges = []
+    for tile_name, tile_type in progressbar_utils.progressbar(tiles):
+        edges.extend(
+            dedup_tile_edges(make_tile_edges(db, tile_name, tile_type))
+        )
 
         if len(edges) > 1000:
             commit_edges(write_cur, edges)
@@ -2161,6 +2680,10 @@ def create_and_insert_edges(
             num_edges += len(edges)
             edges = []
 
+    if edges:
+        commit_edges(write_cur, edges)
+        num_edges += len(edges)
+
     print('{} Created {} edges, inserted'.format(now(), num_edges))
 
 
@@ -2178,8 +2701,8 @@ def get_ccio_sites(grid):
     return ccio_sites
 
 
-def create_edges(args):
-    db = prjxray.db.Database(args.db_root, args.part)
+def create_edges(args, jobs=1):
+    db = load_database(args.db_root, args.part)
     grid = db.grid()
 
     with DatabaseCache(args.connection_database) as conn:
@@ -2304,7 +2827,13 @@ def create_edges(args):
             use_roi=use_roi,
             roi=roi if use_roi else None,
             input_only_nodes=input_only_nodes,
-            output_only_nodes=output_only_nodes
+            output_only_nodes=output_only_nodes,
+            jobs=jobs,
+            db_root=args.db_root,
+            part=args.part,
+            scratch_dir=os.path.dirname(
+                os.path.abspath(args.connection_database)
+            ),
         )
 
         create_edge_indices(conn)
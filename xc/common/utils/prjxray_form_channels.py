@@ -33,6 +33,7 @@ prjxray_assign_tile_pin_direction.
 
 import argparse
 import csv
+import glob
 import prjxray.db
 import prjxray.tile
 from prjxray.timing import PvtCorner
@@ -42,12 +43,22 @@ from lib.rr_graph import points
 from lib.rr_graph import tracks
 from lib.rr_graph import graph2
 import datetime
+import itertools
+import numpy as np
 import os
 import os.path
-from lib.connection_database import NodeClassification, create_tables
+from lib.connection_database import (
+    CONNECTION_DATABASE_SQL_FILE, NodeClassification, create_tables,
+    fingerprint_inputs, get_code_sources, read_stage_fingerprint,
+    set_stage_fingerprint
+)
 
 from prjxray_db_cache import DatabaseCache
 from prjxray_define_segments import SegmentWireMap
+from prjxray_vpr_grid_map import (
+    GRID_MAP_FIELDS, get_binary_grid_map_name, write_binary_grid_map
+)
+from lib.prjxray_database import load_database
 
 SINGLE_PRECISION_FLOAT_MIN = 2**-126
 VCC_NET = 'VCC_NET'
@@ -574,104 +585,143 @@ AND
 
 
 def import_nodes(db, grid, conn):
-    # Some nodes are just 1 wire, so start by enumerating all wires.
+    """ Create a wire for each tile wire and form nodes from the connections.
 
-    cur = conn.cursor()
-    write_cur = conn.cursor()
-    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+    Wires of a tile are numbered by their position within the tile type, so
+    a (tile, wire) is found from the index of the first wire in the tile and
+    the offset of the wire within the tile type.  Nodes are formed with a
+    union-find over wire indices, where the root of each node is its lowest
+    wire index.  Wire and node pkeys are assigned in the order of the first
+    wire of each node, and both tables are written with one bulk insert.
 
-    tile_wire_map = {}
-    wires = {}
-    for tile in progressbar_utils.progressbar(grid.tiles()):
-        gridinfo = grid.gridinfo_at_tilename(tile)
-        tile_type = db.get_tile_type(gridinfo.tile_type)
+    """
 
-        cur.execute(
-            """SELECT pkey, tile_type_pkey FROM phy_tile WHERE name = ?;""",
-            (tile, )
-        )
-        phy_tile_pkey, tile_type_pkey = cur.fetchone()
+    cur = conn.cursor()
+    write_cur = conn.cursor()
 
-        for wire in tile_type.get_wires():
-            # pkey node_pkey tile_pkey wire_in_tile_pkey
-            cur.execute(
-                """
-SELECT pkey FROM wire_in_tile WHERE name = ? and tile_type_pkey = ?;""",
-                (wire, tile_type_pkey)
-            )
+    # Map of tile_type_pkey to map of wire name to wire_in_tile_pkey.
+    wire_in_tile_pkeys = {}
+    for wire_in_tile_pkey, name, tile_type_pkey in cur.execute("""
+SELECT pkey, name, tile_type_pkey FROM wire_in_tile ORDER BY pkey;"""):
+        wire_in_tile_pkeys.setdefault(tile_type_pkey,
+                                      {}).setdefault(name, wire_in_tile_pkey)
 
-            wire_in_tile_pkey = cur.fetchone()
-            if wire_in_tile_pkey is None:
-                continue
-            wire_in_tile_pkey = wire_in_tile_pkey[0]
+    phy_tiles = {}
+    for name, phy_tile_pkey, tile_type_pkey in cur.execute(
+            """SELECT name, pkey, tile_type_pkey FROM phy_tile;"""):
+        phy_tiles[name] = (phy_tile_pkey, tile_type_pkey)
 
-            write_cur.execute(
-                """
-INSERT INTO wire(phy_tile_pkey, wire_in_tile_pkey)
-VALUES
-  (?, ?);""", (phy_tile_pkey, wire_in_tile_pkey)
-            )
+    # Some nodes are just 1 wire, so start by enumerating all wires.
+    #
+    # Map of tile_type_pkey to (map of wire name to offset within tile,
+    # list of wire_in_tile_pkey).
+    tile_type_wires = {}
 
-            assert (tile, wire) not in tile_wire_map
-            wire_pkey = write_cur.lastrowid
-            tile_wire_map[(tile, wire)] = wire_pkey
-            wires[wire_pkey] = None
+    # Map of tile name to (index of first wire, map of wire name to offset).
+    tile_wires = {}
 
-    write_cur.execute("""COMMIT TRANSACTION;""")
+    # List of (phy_tile_pkey, list of wire_in_tile_pkey), in wire order.
+    tile_wire_pkeys = []
 
-    connections = db.connections()
+    num_wires = 0
+    for tile in progressbar_utils.progressbar(grid.tiles()):
+        phy_tile_pkey, tile_type_pkey = phy_tiles[tile]
 
-    for connection in progressbar_utils.progressbar(
-            connections.get_connections()):
-        a_pkey = tile_wire_map[
-            (connection.wire_a.tile, connection.wire_a.wire)]
-        b_pkey = tile_wire_map[
-            (connection.wire_b.tile, connection.wire_b.wire)]
+        if tile_type_pkey not in tile_type_wires:
+            gridinfo = grid.gridinfo_at_tilename(tile)
+            tile_type = db.get_tile_type(gridinfo.tile_type)
+            wire_pkeys = wire_in_tile_pkeys.get(tile_type_pkey, {})
 
-        a_node = wires[a_pkey]
-        b_node = wires[b_pkey]
+            wire_offsets = {}
+            pkeys = []
+            for wire in tile_type.get_wires():
+                if wire not in wire_pkeys:
+                    continue
 
-        if a_node is None:
-            a_node = set((a_pkey, ))
+                assert wire not in wire_offsets, (tile, wire)
+                wire_offsets[wire] = len(pkeys)
+                pkeys.append(wire_pkeys[wire])
 
-        if b_node is None:
-            b_node = set((b_pkey, ))
+            tile_type_wires[tile_type_pkey] = (wire_offsets, pkeys)
 
-        if a_node is not b_node:
-            a_node |= b_node
+        wire_offsets, pkeys = tile_type_wires[tile_type_pkey]
+        tile_wires[tile] = (num_wires, wire_offsets)
+        tile_wire_pkeys.append((phy_tile_pkey, pkeys))
+        num_wires += len(pkeys)
 
-            for wire in a_node:
-                wires[wire] = a_node
+    parent = list(range(num_wires))
 
-    nodes = {}
-    for wire_pkey, node in wires.items():
-        if node is None:
-            node = set((wire_pkey, ))
+    def find(idx):
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
 
-        assert wire_pkey in node
+        return idx
 
-        nodes[id(node)] = node
+    connections = db.connections()
 
-    wires_assigned = set()
-    for node in progressbar_utils.progressbar(nodes.values()):
-        write_cur.execute("""INSERT INTO node(number_pips) VALUES (0);""")
-        node_pkey = write_cur.lastrowid
+    for connection in progressbar_utils.progressbar(
+            connections.get_connections()):
+        a_first_wire, a_wire_offsets = tile_wires[connection.wire_a.tile]
+        b_first_wire, b_wire_offsets = tile_wires[connection.wire_b.tile]
+
+        a_root = find(a_first_wire + a_wire_offsets[connection.wire_a.wire])
+        b_root = find(b_first_wire + b_wire_offsets[connection.wire_b.wire])
+
+        # Keep the lowest wire index as the root.
+        if a_root < b_root:
+            parent[b_root] = a_root
+        elif b_root < a_root:
+            parent[a_root] = b_root
+
+    del tile_wires
+
+    roots = np.array(parent, dtype=np.int64)
+    while True:
+        next_roots = roots[roots]
+        if np.array_equal(next_roots, roots):
+            break
+        roots = next_roots
+
+    # Number nodes in order of their lowest wire index.
+    is_root = roots == np.arange(num_wires)
+    node_of_root = np.cumsum(is_root) - 1
+    wire_nodes = node_of_root[roots]
+    num_nodes = int(is_root.sum())
+    del roots, is_root, node_of_root
+
+    cur.execute("SELECT MAX(pkey) FROM wire;")
+    first_wire_pkey = (cur.fetchone()[0] or 0) + 1
+    cur.execute("SELECT MAX(pkey) FROM node;")
+    first_node_pkey = (cur.fetchone()[0] or 0) + 1
 
-        for wire_pkey in node:
-            wires_assigned.add(wire_pkey)
-            write_cur.execute(
-                """
-            UPDATE wire
-                SET node_pkey = ?
-                WHERE pkey = ?
-            ;""", (node_pkey, wire_pkey)
-            )
+    write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
+    write_cur.executemany(
+        """INSERT INTO node(pkey, number_pips) VALUES (?, 0);""",
+        ((first_node_pkey + idx, ) for idx in range(num_nodes))
+    )
+
+    def yield_wires():
+        wire_node_pkeys = (wire_nodes + first_node_pkey).tolist()
+        wire_idx = 0
+        for phy_tile_pkey, pkeys in progressbar_utils.progressbar(
+                tile_wire_pkeys):
+            for wire_in_tile_pkey in pkeys:
+                yield (
+                    first_wire_pkey + wire_idx, phy_tile_pkey,
+                    wire_in_tile_pkey, wire_node_pkeys[wire_idx]
+                )
+                wire_idx += 1
 
-    assert len(set(wires.keys()) ^ wires_assigned) == 0
+        assert wire_idx == num_wires
 
-    del tile_wire_map
-    del nodes
-    del wires
+    write_cur.executemany(
+        """
+INSERT INTO wire(pkey, phy_tile_pkey, wire_in_tile_pkey, node_pkey)
+VALUES
+  (?, ?, ?, ?);""", yield_wires()
+    )
+    write_cur.execute("""COMMIT TRANSACTION;""")
 
     write_cur.execute(
         "CREATE INDEX wire_in_tile_index ON wire(wire_in_tile_pkey);"
@@ -1344,10 +1394,155 @@ def create_track(node, unique_pos):
     return [node, tracks_list, track_connections, tracks_model]
 
 
+def get_channel_positions(conn):
+    """ Returns map of CHANNEL node pkey to set of VPR grid locations.
+
+    The grid locations of a CHANNEL node are the locations of its wires, the
+    locations of wires connected to the node through a pip, and the locations
+    of the site pins of EDGES_TO_CHANNEL nodes connected to the node through
+    a pip.
+
+    Each of these is computed for all CHANNEL nodes with one query.
+
+    """
+    cur = conn.cursor()
+
+    channel_positions = {}
+
+    def add_positions(query, params):
+        for node_pkey, grid_x, grid_y in progressbar_utils.progressbar(
+                cur.execute(query, params)):
+            if node_pkey not in channel_positions:
+                channel_positions[node_pkey] = set()
+
+            channel_positions[node_pkey].add((grid_x, grid_y))
+
+    # Get coordinates for all wires in each node.
+    add_positions(
+        """
+SELECT DISTINCT wire.node_pkey, tile.grid_x, tile.grid_y
+FROM wire
+INNER JOIN node ON wire.node_pkey = node.pkey
+INNER JOIN tile ON wire.tile_pkey = tile.pkey
+WHERE node.classification = ?;""", (NodeClassification.CHANNEL.value, )
+    )
+
+    # Find the VPR grid locations that each channel connects to.
+    #
+    # Algorithm:
+    #  1. Identify all pips that connect to or from this node
+    #  2. Traverse each pip, and determine if the connected node is a
+    #     EDGES_TO_CHANNEL.  NULL nodes are uninteresting, and CHANNEL
+    #     nodes are already covered in the earlier loop getting
+    #     locations of the
+    #     discarded.
+    #  3a. For CHANNEL to CHANNEL connections, use the pip location.
+    #  3b. For CHANNEL to EDGES_TO_CHANNEL (e.g. site pin connections)
+    #      use location of site in VPR grid.
+    other_wires = """
+-- Get wires from each channel node
+WITH wires_from_node(node_pkey, wire_in_tile_pkey, phy_tile_pkey) AS (
+  SELECT
+    wire.node_pkey,
+    wire.wire_in_tile_pkey,
+    wire.phy_tile_pkey
+  FROM
+    wire
+  INNER JOIN node ON wire.node_pkey = node.pkey
+  WHERE
+    node.classification = ? AND wire.tile_pkey IS NOT NULL
+),
+  other_wires(node_pkey, phy_tile_pkey, wire_in_tile_pkey) AS (
+    SELECT
+        wires_from_node.node_pkey,
+        wires_from_node.phy_tile_pkey,
+        undirected_pips.other_wire_in_tile_pkey
+    FROM wires_from_node
+    CROSS JOIN undirected_pips ON
+        undirected_pips.wire_in_tile_pkey = wires_from_node.wire_in_tile_pkey)
+"""
+
+    # Note: CROSS JOIN forces SQLite to join in the order written.  Otherwise
+    # SQLite may look up wires by phy_tile_pkey alone.
+
+    # 3a
+    add_positions(
+        other_wires + """
+SELECT DISTINCT other_wires.node_pkey, tile.grid_x, tile.grid_y
+FROM other_wires
+CROSS JOIN wire ON
+    wire.wire_in_tile_pkey = other_wires.wire_in_tile_pkey
+AND
+    wire.phy_tile_pkey = other_wires.phy_tile_pkey
+INNER JOIN tile ON wire.tile_pkey = tile.pkey;""",
+        (NodeClassification.CHANNEL.value, )
+    )
+
+    # 3b
+    add_positions(
+        other_wires + """,
+  other_nodes(node_pkey, other_node_pkey) AS (
+    SELECT DISTINCT other_wires.node_pkey, wire.node_pkey FROM other_wires
+    CROSS JOIN wire ON
+        wire.wire_in_tile_pkey = other_wires.wire_in_tile_pkey
+    AND
+        wire.phy_tile_pkey = other_wires.phy_tile_pkey)
+SELECT DISTINCT other_nodes.node_pkey, tile.grid_x, tile.grid_y
+FROM other_nodes
+INNER JOIN node ON other_nodes.other_node_pkey = node.pkey
+INNER JOIN wire ON node.site_wire_pkey = wire.pkey
+INNER JOIN tile ON wire.tile_pkey = tile.pkey
+WHERE node.classification = ?;""", (
+            NodeClassification.CHANNEL.value,
+            NodeClassification.EDGES_TO_CHANNEL.value
+        )
+    )
+
+    return channel_positions
+
+
+def get_channel_segments(conn, segments):
+    """ Returns map of CHANNEL node pkey to segment pkey.
+
+    Same as get_segment_for_node, but for all CHANNEL nodes at once.
+
+    """
+    cur = conn.cursor()
+
+    segment_pkeys = {}
+    for segment_pkey, name in cur.execute("SELECT pkey, name FROM segment;"):
+        segment_pkeys[name] = segment_pkey
+
+    node_wires = cur.execute(
+        """
+SELECT DISTINCT wire.node_pkey, wire_in_tile.pkey, wire_in_tile.name
+FROM wire
+INNER JOIN node ON wire.node_pkey = node.pkey
+INNER JOIN wire_in_tile ON wire.wire_in_tile_pkey = wire_in_tile.pkey
+WHERE node.classification = ?
+ORDER BY wire.node_pkey;""", (NodeClassification.CHANNEL.value, )
+    )
+
+    channel_segments = {}
+    for node_pkey, wires in itertools.groupby(node_wires,
+                                              key=lambda row: row[0]):
+        segment_name = segments.get_segment_for_wires(
+            wire for (_, _, wire) in wires
+        )
+        channel_segments[node_pkey] = segment_pkeys[segment_name]
+
+    return channel_segments
+
+
 def form_tracks(conn, segments):
     cur = conn.cursor()
     cur2 = conn.cursor()
 
+    print("{}: Finding channel locations".format(datetime.datetime.now()))
+    channel_positions = get_channel_positions(conn)
+    print("{}: Finding channel segments".format(datetime.datetime.now()))
+    channel_segments = get_channel_segments(conn, segments)
+
     cur.execute(
         'SELECT count(pkey) FROM node WHERE classification == ?;',
         (NodeClassification.CHANNEL.value, )
@@ -1362,104 +1557,12 @@ SELECT pkey FROM node WHERE classification == ?;
 """, (NodeClassification.CHANNEL.value, ))):
             bar.update(idx)
 
-            unique_pos = set()
-
-            # Get coordinates for all wires in this node.
-            for grid_x, grid_y in cur2.execute("""
-SELECT DISTINCT grid_x, grid_y FROM tile WHERE pkey IN (
-    SELECT tile_pkey FROM wire WHERE node_pkey = ? AND tile_pkey IS NOT NULL
-    )""", (node_pkey, )):
-                unique_pos.add((grid_x, grid_y))
-
-            # Find the VPR grid locations that this channel connects to.
-            #
-            # Algorithm:
-            #  1. Identify all pips that connect to or from this node
-            #  2. Traverse each pip, and determine if the connected node is a
-            #     EDGES_TO_CHANNEL.  NULL nodes are uninteresting, and CHANNEL
-            #     nodes are already covered in the earlier loop getting
-            #     locations of the
-            #     discarded.
-            #  3a. For CHANNEL to CHANNEL connections, use the pip location.
-            #  3b. For CHANNEL to EDGES_TO_CHANNEL (e.g. site pin connections)
-            #      use location of site in VPR grid.
-
-            # 3a loop
-            for grid_x, grid_y in cur2.execute("""
--- Get wires from this node
-WITH wires_from_node(wire_in_tile_pkey, phy_tile_pkey) AS (
-  SELECT
-    wire_in_tile_pkey,
-    phy_tile_pkey
-  FROM
-    wire
-  WHERE
-    node_pkey = ? AND tile_pkey IS NOT NULL
-),
-  other_wires(phy_tile_pkey, wire_in_tile_pkey) AS (
-    SELECT
-        wires_from_node.phy_tile_pkey,
-        undirected_pips.other_wire_in_tile_pkey
-    FROM undirected_pips
-    INNER JOIN wires_from_node ON
-        undirected_pips.wire_in_tile_pkey = wires_from_node.wire_in_tile_pkey)
-SELECT tile.grid_x, tile.grid_y
-FROM tile
-WHERE pkey IN (
-    SELECT wire.tile_pkey FROM wire
-    INNER JOIN other_wires ON
-        wire.wire_in_tile_pkey = other_wires.wire_in_tile_pkey
-    AND
-        wire.phy_tile_pkey = other_wires.phy_tile_pkey
-        );""", (node_pkey, )):
-                unique_pos.add((grid_x, grid_y))
-
-            # 3b loop
-            for grid_x, grid_y in cur2.execute("""
--- Get wires from this node
-WITH wires_from_node(wire_in_tile_pkey, phy_tile_pkey) AS (
-  SELECT
-    wire_in_tile_pkey,
-    phy_tile_pkey
-  FROM
-    wire
-  WHERE
-    node_pkey = ? AND tile_pkey IS NOT NULL
-),
-  other_wires(phy_tile_pkey, wire_in_tile_pkey) AS (
-    SELECT
-        wires_from_node.phy_tile_pkey,
-        undirected_pips.other_wire_in_tile_pkey
-    FROM undirected_pips
-    INNER JOIN wires_from_node ON
-        undirected_pips.wire_in_tile_pkey = wires_from_node.wire_in_tile_pkey),
-  other_nodes(other_node_pkey) AS (
-    SELECT wire.node_pkey FROM wire
-    INNER JOIN other_wires ON
-        wire.wire_in_tile_pkey = other_wires.wire_in_tile_pkey
-    AND
-        wire.phy_tile_pkey = other_wires.phy_tile_pkey),
-  other_tiles(site_wire_pkey) AS (
-    SELECT node.site_wire_pkey FROM node
-    WHERE
-        pkey IN (SELECT other_node_pkey FROM other_nodes)
-    AND
-        classification = ?
-  )
-SELECT tile.grid_x, tile.grid_y
-FROM tile
-WHERE pkey IN (
-    SELECT DISTINCT tile_pkey
-    FROM wire
-    WHERE pkey IN (
-        SELECT other_tiles.site_wire_pkey FROM other_tiles
-        )
-    );
-  """, (node_pkey, NodeClassification.EDGES_TO_CHANNEL.value)):
-                unique_pos.add((grid_x, grid_y))
+            unique_pos = channel_positions.pop(node_pkey, set())
 
             # Determine segment for each routing resource.
-            segment_pkey = get_segment_for_node(cur2, segments, node_pkey)
+            segment_pkey = channel_segments.get(node_pkey)
+            if segment_pkey is None:
+                segment_pkey = get_segment_for_node(cur2, segments, node_pkey)
 
             tracks_to_insert.append(
                 create_track(node_pkey, unique_pos) + [segment_pkey]
@@ -1684,8 +1787,13 @@ def update_wire_in_tile_types(
     )
 
 
-def create_vpr_grid(conn, grid_map_output):
-    """ Create VPR grid from prjxray grid. """
+def create_vpr_grid(conn, grid_map_output, binary_grid_map_output=None):
+    """ Create VPR grid from prjxray grid.
+
+    The grid map is written as CSV to grid_map_output, and if
+    binary_grid_map_output is given, also as binary grid map to it.
+
+    """
     cur = conn.cursor()
     cur2 = conn.cursor()
 
@@ -1908,18 +2016,22 @@ SELECT site_pkey FROM wire_in_tile WHERE tile_type_pkey = ? AND site_pkey IS NOT
 
     new_grid = shifted_grid
 
-    fieldnames = [
-        "site_name",
-        "site_type",
-        "physical_tile",
-        "vpr_x",
-        "vpr_y",
-        "canon_x",
-        "canon_y",
-        "clock_region",
-    ]
-    csv_writer = csv.DictWriter(grid_map_output, fieldnames=fieldnames)
-    csv_writer.writeheader()
+    # Names and locations of all site instances, for the grid map.
+    site_instances = {}
+    for site_pkey, phy_tile_pkey, site_name, phy_tile_name, clock_region, \
+            canon_x, canon_y in cur.execute("""
+SELECT site_instance.site_pkey, site_instance.phy_tile_pkey,
+    site_instance.name, phy_tile.name, phy_tile.clock_region_pkey,
+    phy_tile.grid_x, phy_tile.grid_y
+FROM site_instance
+INNER JOIN phy_tile ON phy_tile.pkey = site_instance.phy_tile_pkey"""):
+        site_instances[
+            (site_pkey, phy_tile_pkey)
+        ] = (site_name, phy_tile_name, clock_region, canon_x, canon_y)
+
+    site_type_names = dict(cur.execute("SELECT pkey, name FROM site_type"))
+
+    grid_map = []
 
     write_cur.execute("""BEGIN EXCLUSIVE TRANSACTION;""")
 
@@ -1982,34 +2094,13 @@ INSERT INTO tile_map(tile_pkey, phy_tile_pkey) VALUES (?, ?)
             )
 
         for site in tile.sites:
-            cur.execute(
-                "SELECT name FROM site_instance WHERE site_pkey = ? AND phy_tile_pkey = ?",
-                (
-                    site.site_pkey,
-                    site.phy_tile_pkey,
-                )
-            )
-
-            site_name = cur.fetchone()[0]
-
-            cur.execute(
-                "SELECT name, clock_region_pkey, grid_x, grid_y FROM phy_tile WHERE pkey = ?",
-                (site.phy_tile_pkey, )
-            )
-
-            phy_tile_name, clock_region, canon_x, canon_y = cur.fetchone()
-
-            cur.execute(
-                "SELECT name FROM site_type WHERE pkey = ?",
-                (site.site_type_pkey, )
-            )
-
-            site_type = cur.fetchone()[0]
+            site_name, phy_tile_name, clock_region, canon_x, canon_y = \
+                site_instances[(site.site_pkey, site.phy_tile_pkey)]
 
-            csv_writer.writerow(
+            grid_map.append(
                 {
                     "site_name": site_name,
-                    "site_type": site_type,
+                    "site_type": site_type_names[site.site_type_pkey],
                     "physical_tile": phy_tile_name,
                     "vpr_x": grid_x,
                     "vpr_y": grid_y,
@@ -2035,6 +2126,13 @@ WHERE
     ;""", (tile_pkey, root_phy_tile_pkey)
             )
 
+    csv_writer = csv.DictWriter(grid_map_output, fieldnames=GRID_MAP_FIELDS)
+    csv_writer.writeheader()
+    csv_writer.writerows(grid_map)
+
+    if binary_grid_map_output is not None:
+        write_binary_grid_map(binary_grid_map_output, grid_map)
+
     write_cur.execute(
         "CREATE INDEX tile_location_index ON tile(grid_x, grid_y);"
     )
@@ -2243,6 +2341,28 @@ INSERT INTO segment(name) VALUES (?)
     return segments
 
 
+def get_inputs_fingerprint(db_root, part):
+    """ Returns fingerprint of the inputs of prjxray_form_channels.
+
+    The inputs are the prjxray database JSON files, the prjxray python
+    library, the connection database schema, and the code of the stage and
+    the lib modules it uses.
+
+    """
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+
+    paths = glob.glob(os.path.join(db_root, '*.json'))
+    paths += glob.glob(os.path.join(db_root, part, '*.json'))
+    paths += glob.glob(
+        os.path.join(os.path.dirname(prjxray.db.__file__), '*.py')
+    )
+    paths += glob.glob(os.path.join(utils_dir, 'prjxray_*.py'))
+    paths += get_code_sources(os.path.join(utils_dir, '..', '..', '..'))
+    paths.append(CONNECTION_DATABASE_SQL_FILE)
+
+    return fingerprint_inputs(paths, values=(part, ))
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -2259,6 +2379,28 @@ def main():
     )
 
     args = parser.parse_args()
+
+    # Skip rebuilding the connection database if none of the inputs changed
+    # since it was formed.
+    binary_grid_map_output = get_binary_grid_map_name(args.grid_map_output)
+    fingerprint = get_inputs_fingerprint(args.db_root, args.part)
+    unchanged = (
+        os.path.exists(args.grid_map_output)
+        and os.path.exists(binary_grid_map_output)
+        and read_stage_fingerprint(args.connection_database,
+                                   'form_channels') == fingerprint
+    )
+    if unchanged:
+        print(
+            "{}: Inputs unchanged, keeping {}".format(
+                datetime.datetime.now(), args.connection_database
+            )
+        )
+        os.utime(args.connection_database)
+        os.utime(args.grid_map_output)
+        os.utime(binary_grid_map_output)
+        return
+
     if os.path.exists(args.connection_database):
         os.remove(args.connection_database)
 
@@ -2266,7 +2408,7 @@ def main():
         create_tables(conn)
 
         print("{}: About to load database".format(datetime.datetime.now()))
-        db = prjxray.db.Database(args.db_root, args.part)
+        db = load_database(args.db_root, args.part)
         grid = db.grid()
         get_switch, get_switch_timing = create_get_switch(conn)
         import_phy_grid(db, grid, conn, get_switch, get_switch_timing)
@@ -2280,12 +2422,17 @@ def main():
         print("{}: Counted sites and pips".format(datetime.datetime.now()))
         classify_nodes(conn, get_switch_timing)
         print("{}: Create VPR grid".format(datetime.datetime.now()))
-        with open(args.grid_map_output, 'w') as f:
-            create_vpr_grid(conn, f)
+        # The binary grid map is closed last, so it is not older than the CSV
+        # grid map.
+        with open(binary_grid_map_output, 'wb') as binary_f:
+            with open(args.grid_map_output, 'w') as f:
+                create_vpr_grid(conn, f, binary_f)
         print("{}: Nodes classified".format(datetime.datetime.now()))
         form_tracks(conn, segments)
         print("{}: Tracks formed".format(datetime.datetime.now()))
 
+        set_stage_fingerprint(conn, 'form_channels', fingerprint)
+
         print(
             '{} Flushing database back to file "{}"'.format(
                 datetime.datetime.now(), args.connection_database
@@ -4,11 +4,11 @@ Generates a dummy pb_type model for a site type.
 """
 
 import argparse
-import prjxray.db
 import prjxray.site_type
 import sys
 
 import lxml.etree as ET
+from lib.prjxray_database import load_database
 
 
 def main():
@@ -40,7 +40,7 @@ def main():
 
     args = parser.parse_args()
 
-    db = prjxray.db.Database(args.db_root, args.part)
+    db = load_database(args.db_root, args.part)
 
     site_type = db.get_site_type(args.site_type.upper())
 
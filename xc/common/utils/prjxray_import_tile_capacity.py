@@ -1,10 +1,10 @@
 """ Generates project xray. """
 import argparse
 import json
-import prjxray.db
 from prjxray.site_type import SitePinDirection
 from lib.pb_type_xml import start_heterogeneous_tile, add_switchblock_locations
 import lxml.etree as ET
+from lib.prjxray_database import load_database
 
 
 def get_wires(site, site_type):
@@ -41,7 +41,7 @@ def main():
     with open(args.pin_assignments) as f:
         pin_assignments = json.load(f)
 
-    db = prjxray.db.Database(args.db_root, args.part)
+    db = load_database(args.db_root, args.part)
     tile_type = db.get_tile_type(args.tile_type)
 
     sites = {}
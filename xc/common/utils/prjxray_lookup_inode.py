@@ -5,9 +5,9 @@ inode from?
 
 """
 import argparse
-import pickle
 import sqlite3
 from lib.rr_graph.graph2 import NodeType
+from lib.rr_node_map import RrNodeMap
 
 
 def main():
@@ -18,19 +18,14 @@ def main():
 
     args = parser.parse_args()
 
-    with open(args.rrgraph_node_map, 'rb') as f:
-        node_map = pickle.load(f)
-
-    inode_to_graph_map = {}
-    for graph_node_pkey, rr_inode in node_map.items():
-        assert rr_inode not in inode_to_graph_map
-        inode_to_graph_map[rr_inode] = graph_node_pkey
+    node_map = RrNodeMap(args.rrgraph_node_map)
 
     conn = sqlite3.connect(
         'file:{}?mode=ro'.format(args.connection_database), uri=True
     )
 
-    graph_node_pkey = inode_to_graph_map[args.inode]
+    graph_node_pkey = node_map.get_graph_node_pkey(args.inode)
+    assert graph_node_pkey is not None, args.inode
 
     cur = conn.cursor()
     cur2 = conn.cursor()
@@ -12,7 +12,8 @@ should already be present from the input rr_graph.
 Create a mapping between database graph_nodes and IPIN, OPIN, CHANX and CHANY
 rr_node ids in the rr_graph.
 
-Add rr_edge for each row in the graph_edge table.
+Add rr_edge for each row in the graph_edge table.  The table is scanned once,
+and surviving edges are buffered in a graph2.EdgeArrays for serialization.
 
 Import channel XML node from connection database and serialize output to
 rr_graph XML.
@@ -21,16 +22,20 @@ rr_graph XML.
 
 import argparse
 import os.path
-from hilbertcurve.hilbertcurve import HilbertCurve
 import math
-import prjxray.db
+import numpy as np
 from prjxray.roi import Roi
 from prjxray.overlay import Overlay
 import prjxray.grid as grid
 from lib.rr_graph import graph2
 from lib.rr_graph import tracks
+from lib.rr_graph import hilbert
 from lib.connection_database import get_wire_pkey, get_track_model
+from lib.rr_node_map import (
+    RrNodeMap, inode_names_from_database, write_inode_names, write_rr_node_map
+)
 import lib.rr_graph_capnp.graph2 as capnp_graph2
+from lib.rr_graph_capnp import bulk_writer
 from prjxray_constant_site_pins import feature_when_routed
 from prjxray_tile_import import remove_vpr_tile_prefix
 import simplejson as json
@@ -38,9 +43,9 @@ from lib import progressbar_utils
 import datetime
 import re
 import functools
-import pickle
 
 import sqlite3
+from lib.prjxray_database import load_database
 
 now = datetime.datetime.now
 
@@ -931,54 +936,24 @@ def create_get_pip_wire_names(conn):
     return get_pip_wire_names
 
 
-def get_number_graph_edges(conn, graph, node_mapping):
-    num_edges = len(graph.edges)
-
-    print('{} Counting edges.'.format(now()))
-    cur = conn.cursor()
-    cur.execute("SELECT count() FROM graph_edge;" "")
-
-    nodes_set = set()
-
-    for src_graph_node, dest_graph_node in cur.execute("""
-SELECT
-  src_graph_node_pkey,
-  dest_graph_node_pkey
-FROM
-  graph_edge;
-                """):
-        if src_graph_node not in node_mapping:
-            continue
-
-        if dest_graph_node not in node_mapping:
-            continue
-
-        src_node, src_node_type = node_mapping[src_graph_node]
-        sink_node, sink_node_type = node_mapping[dest_graph_node]
-
-        pin_node_types = [graph2.NodeType.IPIN, graph2.NodeType.OPIN]
-
-        src_node_is_site_pin = src_node_type in pin_node_types
-        sink_node_is_site_pin = sink_node_type in pin_node_types
-
-        if src_node_is_site_pin ^ sink_node_is_site_pin:
-            if (src_node, sink_node) in nodes_set:
-                continue
-            else:
-                nodes_set.add((src_node, sink_node))
+def import_graph_edges(conn, graph, extra_features, node_mapping):
+    """ Collect edges to be serialized into the rr graph.
 
-        num_edges += 1
+    The graph_edge table is scanned once.  Edges between nodes that are not
+    in node_mapping are dropped, as are duplicate CHAN <-> PIN edges.
 
-    return num_edges
+    Returns:
+        graph2.EdgeArrays of existing graph edges followed by database edges.
 
+    """
+    edges = graph2.EdgeArrays()
 
-def import_graph_edges(conn, graph, extra_features, node_mapping):
-    # First yield existing edges
+    # First add existing edges
     print('{} Importing existing edges.'.format(now()))
     for edge in graph.edges:
-        yield (edge.src_node, edge.sink_node, edge.switch_id, None)
+        edges.append(edge.src_node, edge.sink_node, edge.switch_id)
 
-    # Then yield edges from database.
+    # Then add edges from database.
     cur = conn.cursor()
 
     cur.execute("SELECT count() FROM graph_edge;" "")
@@ -991,6 +966,8 @@ def import_graph_edges(conn, graph, extra_features, node_mapping):
 
     nodes_set = set()
 
+    pin_node_types = (graph2.NodeType.IPIN, graph2.NodeType.OPIN)
+
     print('{} Importing edges from database.'.format(now()))
     with progressbar_utils.ProgressBar(max_value=num_edges) as bar:
         for idx, (src_graph_node, dest_graph_node, switch_pkey, phy_tile_pkey,
@@ -1005,6 +982,9 @@ SELECT
 FROM
   graph_edge;
                 """)):
+            if idx % 1024 == 0:
+                bar.update(idx)
+
             if src_graph_node not in node_mapping:
                 continue
 
@@ -1014,8 +994,6 @@ FROM
             src_node, src_node_type = node_mapping[src_graph_node]
             sink_node, sink_node_type = node_mapping[dest_graph_node]
 
-            pin_node_types = [graph2.NodeType.IPIN, graph2.NodeType.OPIN]
-
             src_node_is_site_pin = src_node_type in pin_node_types
             sink_node_is_site_pin = sink_node_type in pin_node_types
 
@@ -1029,6 +1007,11 @@ FROM
                 else:
                     nodes_set.add((src_node, sink_node))
 
+            switch_id = get_switch_name(
+                conn, graph, switch_name_map, switch_pkey
+            )
+
+            feature = None
             if pip_pkey is not None:
                 tile_name = get_tile_name(phy_tile_pkey)
                 src_net, dest_net = get_pip_wire_names(pip_pkey)
@@ -1037,27 +1020,18 @@ FROM
                     pip_name = '{}.{}.{}'.format(tile_name, dest_net, src_net)
                 else:
                     pip_name = '{}.{}.{}'.format(tile_name, src_net, dest_net)
-            else:
-                pip_name = None
 
-            switch_id = get_switch_name(
-                conn, graph, switch_name_map, switch_pkey
-            )
-
-            if pip_name is not None:
                 feature = check_feature(extra_features, pip_name)
-                if feature:
-                    yield (
-                        src_node, sink_node, switch_id,
-                        (('fasm_features', feature), )
-                    )
-                else:
-                    yield (src_node, sink_node, switch_id, ())
+
+            if feature:
+                edges.append(
+                    src_node, sink_node, switch_id,
+                    (('fasm_features', feature), )
+                )
             else:
-                yield (src_node, sink_node, switch_id, ())
+                edges.append(src_node, sink_node, switch_id)
 
-            if idx % 1024 == 0:
-                bar.update(idx)
+    return edges
 
 
 def create_channels(conn):
@@ -1090,15 +1064,6 @@ def create_channels(conn):
     )
 
 
-def yield_nodes(nodes):
-    with progressbar_utils.ProgressBar(max_value=len(nodes)) as bar:
-        for idx, node in enumerate(nodes):
-            yield node
-
-            if idx % 1024 == 0:
-                bar.update(idx)
-
-
 def phy_grid_dims(conn):
     """ Returns physical grid dimensions. """
     cur = conn.cursor()
@@ -1181,37 +1146,31 @@ def find_constant_network(graph):
 
 
 def create_node_remap(nodes, channels_obj):
-    N = 2
-    p = math.ceil(math.log2(max(channels_obj.x_max, channels_obj.y_max)))
+    """ Returns a NodeRemap that orders graph2.NodeArrays along a Hilbert curve.
 
-    point_map = {}
+    Nodes are ordered by the Hilbert distance of their low corner, nodes at
+    the same location keep their original order.
 
-    for node in nodes:
-        x = node.loc.x_low
-        y = node.loc.y_low
-
-        if (x, y) not in point_map:
-            point_map[(x, y)] = []
-
-        point_map[(x, y)].append(node.id)
-
-    hilbert_curve = HilbertCurve(p, N)
-
-    idx = 0
-    id_map = {}
-    for h in range(hilbert_curve.max_h + 1):
-        coord = tuple(hilbert_curve.coordinates_from_distance(h))
+    """
+    p = math.ceil(math.log2(max(channels_obj.x_max, channels_obj.y_max)))
 
-        if coord not in point_map:
-            continue
+    node_ids = nodes.column('id').astype(np.int64)
+    x = nodes.column('x_low').astype(np.int64)
+    y = nodes.column('y_low').astype(np.int64)
 
-        for old_id in point_map[coord]:
-            id_map[old_id] = idx
-            idx += 1
+    # Node ids must be 0 to len(nodes) - 1, each used once.
+    assert np.array_equal(
+        np.bincount(node_ids, minlength=len(node_ids)),
+        np.ones(len(node_ids), dtype=np.int64)
+    )
 
-        del point_map[coord]
+    # Nodes outside of the channel bounds still need a place on the curve.
+    p = max(p, 1)
+    if len(node_ids) > 0:
+        p = max(p, int(max(x.max(), y.max())).bit_length())
 
-    return lambda x: id_map[x]
+    order = hilbert.hilbert_order(x, y, p)
+    return hilbert.NodeRemap.from_order(node_ids[order])
 
 
 def main():
@@ -1231,6 +1190,10 @@ def main():
         required=True,
         help='Output map of graph_node_pkey to rr inode file'
     )
+    parser.add_argument(
+        '--write_rr_inode_names',
+        help='Output table of rr inode to tile/wire name, for annotate_vpr_log'
+    )
     parser.add_argument(
         '--connection_database',
         help='Database of fabric connectivity',
@@ -1258,7 +1221,7 @@ def main():
     print('{} Starting routing import'.format(now()))
     args = parser.parse_args()
 
-    db = prjxray.db.Database(args.db_root, args.part)
+    db = load_database(args.db_root, args.part)
     populate_hclk_cmt_tiles(db)
 
     synth_tiles = None
@@ -1400,29 +1363,43 @@ FROM
 
         node_remap = create_node_remap(capnp_graph.graph.nodes, channels_obj)
 
-        num_edges = get_number_graph_edges(conn, graph, node_mapping)
+        edges = import_graph_edges(conn, graph, extra_features, node_mapping)
         print('{} Serializing to disk.'.format(now()))
 
-        capnp_graph.serialize_to_capnp(
+        capnp_graph.serialize_to_capnp_bulk(
             channels_obj=channels_obj,
-            num_nodes=len(capnp_graph.graph.nodes),
-            nodes_obj=yield_nodes(capnp_graph.graph.nodes),
-            num_edges=num_edges,
-            edges_obj=import_graph_edges(
-                conn, graph, extra_features, node_mapping
-            ),
+            edges=edges,
+            node_columns=bulk_writer.node_columns(capnp_graph.graph.nodes),
             node_remap=node_remap,
         )
 
-        for k in node_mapping:
-            node_id, node_type = node_mapping[k]
-            node_mapping[k] = (node_remap(node_id), node_type)
-
         print('{} Writing node map.'.format(now()))
+        graph_node_pkeys = np.fromiter(node_mapping.keys(), dtype=np.int64)
+        node_ids = np.fromiter(
+            (node_id for node_id, _ in node_mapping.values()), dtype=np.int64
+        )
+        node_types = np.fromiter(
+            (node_type.value for _, node_type in node_mapping.values()),
+            dtype=np.int64
+        )
         with open(args.write_rr_node_map, 'wb') as f:
-            pickle.dump(node_mapping, f)
+            write_rr_node_map(
+                f,
+                graph_node_pkeys=graph_node_pkeys,
+                inodes=node_remap[node_ids],
+                node_types=node_types,
+            )
         print('{} Done writing node map.'.format(now()))
 
+        if args.write_rr_inode_names:
+            print('{} Writing inode names.'.format(now()))
+            with RrNodeMap(args.write_rr_node_map) as rr_node_map:
+                inode_names = inode_names_from_database(conn, rr_node_map)
+
+            with open(args.write_rr_inode_names, 'wb') as f:
+                write_inode_names(f, inode_names)
+            print('{} Done writing inode names.'.format(now()))
+
 
 if __name__ == '__main__':
     main()
@@ -13,12 +13,12 @@ connects those tile pins to each site within the tile.
 from __future__ import print_function
 import argparse
 import sys
-import prjxray.db
 import prjxray.site_type
 import re
 import sqlite3
 
 import lxml.etree as ET
+from lib.prjxray_database import load_database
 
 XI_URL = "http://www.w3.org/2001/XInclude"
 XI_INCLUDE = "{%s}include" % XI_URL
@@ -1412,7 +1412,7 @@ connection database in lue of Project X-Ray."""
 
     args = parser.parse_args()
 
-    db = prjxray.db.Database(args.db_root, args.part)
+    db = load_database(args.db_root, args.part)
 
     ET.register_namespace('xi', XI_URL)
     if args.site_as_tile:
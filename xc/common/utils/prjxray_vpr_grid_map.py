@@ -0,0 +1,312 @@
+""" Binary VPR grid map, emitted alongside vpr_grid_map.csv.
+
+The VPR grid map lists every site of the VPR grid with its site type,
+physical tile, VPR and canonical locations and clock region.  The CSV version
+has to be parsed completely before it can be used, which is slow on large
+parts.  The binary version stores each column as a typed array, and names as
+string tables, so it can be memory-mapped and only the parts that are needed
+are decoded.
+
+File layout:
+
+    MAGIC
+    uint64 little endian length of the JSON header
+    JSON header: {array name: [dtype, shape, offset from first array]}
+    arrays, each aligned to ARRAY_ALIGNMENT bytes
+
+"""
+import bisect
+import json
+import os.path
+import struct
+
+import numpy as np
+
+MAGIC = b'VPRGRID1'
+ARRAY_ALIGNMENT = 64
+
+GRID_MAP_FIELDS = [
+    "site_name",
+    "site_type",
+    "physical_tile",
+    "vpr_x",
+    "vpr_y",
+    "canon_x",
+    "canon_y",
+    "clock_region",
+]
+
+# Value of clock_region for sites without a clock region.
+NO_CLOCK_REGION = -1
+
+
+def get_binary_grid_map_name(grid_map):
+    """ Returns name of the binary grid map stored alongside CSV grid map.
+
+    >>> get_binary_grid_map_name('channels/xc7a50t/vpr_grid_map.csv')
+    'channels/xc7a50t/vpr_grid_map.bin'
+    """
+    return os.path.splitext(grid_map)[0] + '.bin'
+
+
+def get_data_offset(header_length):
+    """ Returns offset of the first array in a file with given header length.
+
+    >>> get_data_offset(10)
+    64
+    """
+    offset = len(MAGIC) + 8 + header_length
+    return offset + (-offset % ARRAY_ALIGNMENT)
+
+
+def write_arrays(f, arrays):
+    """ Writes dictionary of numpy arrays to binary file object f. """
+    header = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset += -offset % ARRAY_ALIGNMENT
+        header[name] = [array.dtype.str, array.shape, offset]
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode()
+    data_offset = get_data_offset(len(header_bytes))
+
+    f.write(MAGIC)
+    f.write(struct.pack('<Q', len(header_bytes)))
+    f.write(header_bytes)
+
+    position = len(MAGIC) + 8 + len(header_bytes)
+    for name, array in arrays.items():
+        start = data_offset + header[name][2]
+        f.write(b'\0' * (start - position))
+        f.write(np.ascontiguousarray(array).tobytes())
+        position = start + array.nbytes
+
+
+def read_arrays(file_name):
+    """ Returns dictionary of read-only memory-mapped numpy arrays. """
+    with open(file_name, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        assert magic == MAGIC, (file_name, magic)
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length).decode())
+
+    data_offset = get_data_offset(header_length)
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header.items():
+        shape = tuple(shape)
+        if np.prod(shape) == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(
+                file_name,
+                dtype=dtype,
+                mode='r',
+                offset=data_offset + offset,
+                shape=shape
+            )
+
+    return arrays
+
+
+def make_string_table(strings):
+    """ Returns (offsets, data) arrays storing list of strings.
+
+    >>> offsets, data = make_string_table(['A', 'BC', ''])
+    >>> offsets.tolist()
+    [0, 1, 3, 3]
+    >>> StringTable(offsets, data)[1]
+    'BC'
+    """
+    encoded = [s.encode() for s in strings]
+
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    return offsets, data
+
+
+class StringTable(object):
+    """ Sequence of strings decoded on access from a string table. """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        start = int(self.offsets[idx])
+        end = int(self.offsets[idx + 1])
+        return self.data[start:end].tobytes().decode()
+
+
+class SortedStringTable(object):
+    """ Sequence of strings of a StringTable in sorted order. """
+
+    def __init__(self, strings, order):
+        self.strings = strings
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, idx):
+        return self.strings[int(self.order[idx])]
+
+    def index(self, string):
+        """ Returns index in strings of string, or None if not present. """
+        idx = bisect.bisect_left(self, string)
+        if idx < len(self) and self[idx] == string:
+            return int(self.order[idx])
+        else:
+            return None
+
+
+def write_binary_grid_map(f, rows):
+    """ Writes binary grid map to file object f.
+
+    Arguments
+    ---------
+    f : file object
+        Binary file to write the grid map to.
+    rows : list of dict
+        Rows of the grid map, with the keys in GRID_MAP_FIELDS.
+
+    """
+    site_names = [row['site_name'] for row in rows]
+
+    site_types = sorted(set(row['site_type'] for row in rows))
+    site_type_ids = {
+        site_type: idx
+        for idx, site_type in enumerate(site_types)
+    }
+
+    tiles = sorted(set(row['physical_tile'] for row in rows))
+    tile_ids = {tile: idx for idx, tile in enumerate(tiles)}
+
+    arrays = {}
+
+    for name, strings in (
+        ('site_name', site_names),
+        ('site_type_name', site_types),
+        ('physical_tile_name', tiles),
+    ):
+        offsets, data = make_string_table(strings)
+        arrays[name + '_offsets'] = offsets
+        arrays[name + '_data'] = data
+
+    # Tables of site types and tiles are sorted, only the site names need a
+    # sort order for lookups.
+    arrays['site_name_order'] = np.array(
+        sorted(range(len(site_names)), key=lambda idx: site_names[idx]),
+        dtype=np.uint32
+    )
+
+    arrays['site_type'] = np.array(
+        [site_type_ids[row['site_type']] for row in rows], dtype=np.uint16
+    )
+    arrays['physical_tile'] = np.array(
+        [tile_ids[row['physical_tile']] for row in rows], dtype=np.uint32
+    )
+
+    for field in ['vpr_x', 'vpr_y', 'canon_x', 'canon_y']:
+        arrays[field] = np.array([row[field] for row in rows], dtype=np.int32)
+
+    arrays['clock_region'] = np.array(
+        [
+            NO_CLOCK_REGION
+            if row['clock_region'] is None else row['clock_region']
+            for row in rows
+        ],
+        dtype=np.int32
+    )
+
+    write_arrays(f, arrays)
+
+
+class BinaryGridMap(object):
+    """ Memory-mapped binary grid map.
+
+    Sites are identified by their row in the grid map.  Columns are numpy
+    arrays indexed by row, string columns are decoded on access.
+
+    """
+
+    def __init__(self, file_name):
+        self.arrays = read_arrays(file_name)
+
+        def string_table(name):
+            return StringTable(
+                self.arrays[name + '_offsets'], self.arrays[name + '_data']
+            )
+
+        self.site_names = string_table('site_name')
+        self.site_type_names = string_table('site_type_name')
+        self.physical_tile_names = string_table('physical_tile_name')
+
+        self.sorted_site_names = SortedStringTable(
+            self.site_names, self.arrays['site_name_order']
+        )
+        self.sorted_physical_tile_names = SortedStringTable(
+            self.physical_tile_names, np.arange(len(self.physical_tile_names))
+        )
+        self.sorted_site_type_names = SortedStringTable(
+            self.site_type_names, np.arange(len(self.site_type_names))
+        )
+
+        self.site_type = self.arrays['site_type']
+        self.physical_tile = self.arrays['physical_tile']
+        self.vpr_x = self.arrays['vpr_x']
+        self.vpr_y = self.arrays['vpr_y']
+        self.canon_x = self.arrays['canon_x']
+        self.canon_y = self.arrays['canon_y']
+        self.clock_region = self.arrays['clock_region']
+
+    def __len__(self):
+        return len(self.site_names)
+
+    def find_site(self, site_name):
+        """ Returns row of site, or None if not present. """
+        return self.sorted_site_names.index(site_name)
+
+    def find_site_type(self, site_type):
+        """ Returns id of site type, or None if not present. """
+        return self.sorted_site_type_names.index(site_type)
+
+    def find_physical_tile(self, physical_tile):
+        """ Returns id of physical tile, or None if not present. """
+        return self.sorted_physical_tile_names.index(physical_tile)
+
+    def get_clock_region(self, row):
+        """ Returns clock region of site in row, or None. """
+        clock_region = int(self.clock_region[row])
+        if clock_region == NO_CLOCK_REGION:
+            return None
+        else:
+            return clock_region
+
+    def get_row(self, row):
+        """ Returns dictionary with the GRID_MAP_FIELDS of site in row. """
+        return {
+            'site_name':
+                self.site_names[row],
+            'site_type':
+                self.site_type_names[int(self.site_type[row])],
+            'physical_tile':
+                self.physical_tile_names[int(self.physical_tile[row])],
+            'vpr_x':
+                int(self.vpr_x[row]),
+            'vpr_y':
+                int(self.vpr_y[row]),
+            'canon_x':
+                int(self.canon_x[row]),
+            'canon_y':
+                int(self.canon_y[row]),
+            'clock_region':
+                self.get_clock_region(row),
+        }
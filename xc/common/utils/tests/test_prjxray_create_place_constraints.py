@@ -0,0 +1,145 @@
+import csv
+import os
+import random
+import tempfile
+import unittest
+
+from prjxray_create_place_constraints import VprGrid
+from prjxray_vpr_grid_map import GRID_MAP_FIELDS, write_binary_grid_map
+
+SITE_TYPES = ['SLICEL', 'SLICEM', 'IOB33', 'PLLE2_ADV', 'BUFGCTRL']
+
+
+def random_grid_map(seed, num_tiles):
+    rand = random.Random(seed)
+
+    rows = []
+    for tile in range(num_tiles):
+        canon_x = rand.randrange(20)
+        canon_y = rand.randrange(20)
+        for site in range(rand.randrange(1, 4)):
+            rows.append(
+                {
+                    'site_name': 'SITE_{}_{}'.format(tile, site),
+                    'site_type': rand.choice(SITE_TYPES),
+                    'physical_tile': 'TILE_X{}Y{}'.format(canon_x, canon_y),
+                    # Sites share VPR locations, the last one sets the clock
+                    # region of a location.
+                    'vpr_x': rand.randrange(10),
+                    'vpr_y': rand.randrange(10),
+                    'canon_x': canon_x,
+                    'canon_y': canon_y,
+                    'clock_region': rand.choice([None, 0, 1, 2]),
+                }
+            )
+
+    rand.shuffle(rows)
+    return rows
+
+
+def grid_dicts(vpr_grid):
+    return {
+        'site_dict': vpr_grid.get_site_dict(),
+        'site_type_dict': vpr_grid.get_site_type_dict(),
+        'tile_dict': vpr_grid.get_tile_dict(),
+        'vpr_loc_cmt': vpr_grid.get_vpr_loc_cmt(),
+        'cmt_dict': vpr_grid.get_cmt_dict(),
+    }
+
+
+class TestBinaryGridMap(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv_grid_map = os.path.join(self.tmp_dir.name, 'vpr_grid_map.csv')
+        self.binary_grid_map = os.path.join(
+            self.tmp_dir.name, 'vpr_grid_map.bin'
+        )
+
+        self.rows = random_grid_map(seed=0, num_tiles=200)
+
+        with open(self.csv_grid_map, 'w') as f:
+            writer = csv.DictWriter(f, fieldnames=GRID_MAP_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+        with open(self.binary_grid_map, 'wb') as f:
+            write_binary_grid_map(f, self.rows)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def load_grids(self, graph_limit):
+        """ Returns VprGrid's loaded from the CSV and binary grid map. """
+        csv_mtime = os.path.getmtime(self.csv_grid_map)
+
+        # A binary grid map older than the CSV grid map is ignored.
+        os.utime(self.binary_grid_map, (csv_mtime - 10, csv_mtime - 10))
+        csv_grid = VprGrid(self.csv_grid_map, graph_limit)
+        self.assertFalse(hasattr(csv_grid, 'grid_map'))
+
+        os.utime(self.binary_grid_map, (csv_mtime, csv_mtime))
+        binary_grid = VprGrid(self.csv_grid_map, graph_limit)
+        self.assertTrue(hasattr(binary_grid, 'grid_map'))
+
+        return csv_grid, binary_grid
+
+    def test_binary_grid_map_matches_csv(self):
+        for graph_limit in [None, '5,3,14,16']:
+            with self.subTest(graph_limit=graph_limit):
+                csv_grid, binary_grid = self.load_grids(graph_limit)
+
+                csv_dicts = grid_dicts(csv_grid)
+                binary_dicts = grid_dicts(binary_grid)
+                for name, csv_dict in csv_dicts.items():
+                    binary_dict = binary_dicts[name]
+
+                    # Same items, in the same order.
+                    self.assertEqual(
+                        list(binary_dict.items()), list(csv_dict.items()), name
+                    )
+                    self.assertEqual(len(binary_dict), len(csv_dict), name)
+
+                if graph_limit is None:
+                    self.assertEqual(
+                        len(csv_dicts['site_dict']), len(self.rows)
+                    )
+                else:
+                    self.assertLess(
+                        len(csv_dicts['site_dict']), len(self.rows)
+                    )
+
+    def test_lookup(self):
+        for graph_limit in [None, '5,3,14,16']:
+            with self.subTest(graph_limit=graph_limit):
+                csv_grid, binary_grid = self.load_grids(graph_limit)
+
+                csv_dicts = grid_dicts(csv_grid)
+                binary_dicts = grid_dicts(binary_grid)
+
+                site_names = [row['site_name'] for row in self.rows]
+                tiles = [row['physical_tile'] for row in self.rows]
+                vpr_locs = [(x, y) for x in range(10) for y in range(10)]
+                for name, keys in (
+                    ('site_dict', site_names + ['NO_SITE']),
+                    ('site_type_dict', SITE_TYPES + ['NO_SITE_TYPE']),
+                    ('tile_dict', tiles + ['NO_TILE']),
+                    ('vpr_loc_cmt', vpr_locs + [(-1, -1)]),
+                ):
+                    csv_dict = csv_dicts[name]
+                    binary_dict = binary_dicts[name]
+                    for key in keys:
+                        self.assertEqual(
+                            key in binary_dict, key in csv_dict, (name, key)
+                        )
+                        self.assertEqual(
+                            binary_dict.get(key), csv_dict.get(key),
+                            (name, key)
+                        )
+
+                        if key not in csv_dict:
+                            with self.assertRaises(KeyError):
+                                binary_dict[key]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import os.path
+import sqlite3
+import tempfile
+import unittest
+
+from prjxray_db_cache import DatabaseCache
+
+
+def create_database(file_name):
+    conn = sqlite3.connect(file_name)
+    c = conn.cursor()
+    c.execute("CREATE TABLE tile(pkey INTEGER PRIMARY KEY, name TEXT);")
+    c.execute("CREATE INDEX tile_name_index ON tile(name);")
+    c.execute("CREATE TABLE wire(pkey INTEGER PRIMARY KEY, tile_pkey INT);")
+    c.execute("CREATE TABLE node(pkey INTEGER PRIMARY KEY, name TEXT);")
+    c.execute("CREATE INDEX node_name_index ON node(name);")
+    c.executemany(
+        "INSERT INTO tile(pkey, name) VALUES (?, ?);",
+        [(idx, 'TILE_{}'.format(idx)) for idx in range(10)]
+    )
+    c.executemany(
+        "INSERT INTO wire(pkey, tile_pkey) VALUES (?, ?);",
+        [(idx, idx % 10) for idx in range(100)]
+    )
+    c.executemany(
+        "INSERT INTO node(pkey, name) VALUES (?, ?);",
+        [(idx, 'NODE_{}'.format(idx)) for idx in range(50)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_master(conn):
+    return sorted(
+        conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master;"
+                     ).fetchall()
+    )
+
+
+def read_table_page(file_name, table):
+    """ Returns the raw bytes of the root page of table in file_name. """
+    conn = sqlite3.connect(file_name)
+    page_size = conn.execute("PRAGMA page_size;").fetchone()[0]
+    rootpage = conn.execute(
+        "SELECT rootpage FROM sqlite_master WHERE name = ?;", (table, )
+    ).fetchone()[0]
+    conn.close()
+
+    with open(file_name, 'rb') as f:
+        f.seek((rootpage - 1) * page_size)
+        return f.read(page_size)
+
+
+class TestDatabaseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp_dir.name, 'channels.db')
+        create_database(self.file_name)
+
+        conn = sqlite3.connect(self.file_name)
+        self.master = get_master(conn)
+        conn.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_file(self):
+        with open(self.file_name, 'rb') as f:
+            return f.read()
+
+    def test_load_all(self):
+        with DatabaseCache(self.file_name, read_only=True) as conn:
+            self.assertEqual(get_master(conn), self.master)
+            self.assertEqual(
+                conn.execute("SELECT COUNT(*) FROM wire;").fetchone()[0], 100
+            )
+
+    def test_load_tables(self):
+        with DatabaseCache(self.file_name, read_only=True,
+                           tables=['tile', 'wire']) as conn:
+            self.assertEqual(
+                get_master(conn),
+                [row for row in self.master if row[2] in ['tile', 'wire']]
+            )
+            self.assertEqual(
+                conn.execute("SELECT name FROM tile WHERE pkey = 3;"
+                             ).fetchone()[0], 'TILE_3'
+            )
+            self.assertEqual(
+                conn.execute("SELECT COUNT(*) FROM wire;").fetchone()[0], 100
+            )
+
+            # The index on tile.name is loaded with its table.
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT pkey FROM tile WHERE name = ?;",
+                ('TILE_3', )
+            ).fetchall()
+            self.assertIn('tile_name_index', ' '.join(row[-1] for row in plan))
+
+    def test_load_missing_table(self):
+        with self.assertRaises(AssertionError):
+            with DatabaseCache(self.file_name, read_only=True, tables=['tile',
+                                                                       'pip']):
+                pass
+
+    def test_read_only(self):
+        before = self.read_file()
+        mtime = os.path.getmtime(self.file_name)
+
+        for tables in [None, ['tile']]:
+            with DatabaseCache(self.file_name, read_only=True,
+                               tables=tables) as conn:
+                conn.execute("DELETE FROM tile WHERE pkey < 5;")
+                conn.execute("CREATE TABLE extra(pkey INTEGER PRIMARY KEY);")
+                conn.commit()
+
+        self.assertEqual(self.read_file(), before)
+        self.assertEqual(os.path.getmtime(self.file_name), mtime)
+
+    def test_no_modifications(self):
+        before = self.read_file()
+
+        for tables in [None, ['tile', 'node']]:
+            with DatabaseCache(self.file_name, tables=tables) as conn:
+                conn.execute("SELECT * FROM tile;").fetchall()
+
+        self.assertEqual(self.read_file(), before)
+
+    def test_write_back(self):
+        for tables in [None, ['tile', 'wire']]:
+            with self.subTest(tables=tables):
+                create_database(self.file_name + '.tmp')
+                os.replace(self.file_name + '.tmp', self.file_name)
+                self.check_write_back(tables)
+
+    def check_write_back(self, tables):
+        node_page = read_table_page(self.file_name, 'node')
+        node_index_page = read_table_page(self.file_name, 'node_name_index')
+
+        with DatabaseCache(self.file_name, tables=tables) as conn:
+            c = conn.cursor()
+            c.execute("UPDATE tile SET name = 'CHANGED' WHERE pkey = 3;")
+            c.execute("DROP TABLE wire;")
+            c.execute(
+                "CREATE TABLE track(pkey INTEGER PRIMARY KEY, tile_pkey INT);"
+            )
+            c.execute("CREATE INDEX track_tile_index ON track(tile_pkey);")
+            c.executemany(
+                "INSERT INTO track(tile_pkey) VALUES (?);",
+                [(idx, ) for idx in range(5)]
+            )
+            conn.commit()
+
+        conn = sqlite3.connect(self.file_name)
+        master = get_master(conn)
+
+        # Modified table is written with its index.
+        self.assertEqual(
+            conn.execute("SELECT name FROM tile WHERE pkey = 3;").fetchone(),
+            ('CHANGED', )
+        )
+        self.assertEqual(
+            conn.execute("SELECT COUNT(*) FROM tile;").fetchone()[0], 10
+        )
+        self.assertIn(
+            [row for row in self.master if row[1] == 'tile_name_index'][0],
+            master
+        )
+
+        # Dropped table is removed.
+        self.assertNotIn('wire', [row[1] for row in master])
+
+        # New table is written with its index.
+        self.assertEqual(
+            conn.execute("SELECT tile_pkey FROM track ORDER BY pkey;"
+                         ).fetchall(), [(idx, ) for idx in range(5)]
+        )
+        self.assertIn('track_tile_index', [row[1] for row in master])
+
+        # Untouched table and its index are not rewritten.
+        self.assertEqual(
+            [row for row in master if row[2] == 'node'],
+            [row for row in self.master if row[2] == 'node'],
+        )
+        conn.close()
+
+        self.assertEqual(read_table_page(self.file_name, 'node'), node_page)
+        self.assertEqual(
+            read_table_page(self.file_name, 'node_name_index'), node_index_page
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
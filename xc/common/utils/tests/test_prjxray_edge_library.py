@@ -0,0 +1,314 @@
+import multiprocessing
+import sqlite3
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+from prjxray import grid_types
+
+from lib.connection_database import create_tables
+from lib.rr_graph.graph2 import NodeType
+import prjxray_edge_library
+
+GRID_WIDTH = 12
+GRID_HEIGHT = 10
+
+TILE_TYPE = 'INT'
+
+# Switch pkeys, after the switches added by create_tables.
+ROUTING_SWITCH = 3
+SITE_PIN_SWITCH = 4
+BACKWARD_SWITCH = 5
+
+# Wire names in tile, and the site pin switch of site pin wires.
+WIRES = {
+    'OUT': SITE_PIN_SWITCH,
+    'IN': SITE_PIN_SWITCH,
+    'ROW': None,
+    'COL': None,
+    'DEAD': None,
+}
+
+Pip = namedtuple('Pip', 'name net_from net_to is_directional is_pseudo')
+
+
+def make_pip(net_from, net_to, is_directional=True):
+    name = '{}.{}{}{}'.format(
+        TILE_TYPE, net_from, '->>' if is_directional else '<<->>', net_to
+    )
+    return Pip(
+        name=name,
+        net_from=net_from,
+        net_to=net_to,
+        is_directional=is_directional,
+        is_pseudo=False
+    )
+
+
+PIPS = [
+    make_pip('OUT', 'ROW'),
+    make_pip('OUT', 'COL'),
+    make_pip('ROW', 'IN'),
+    make_pip('COL', 'IN'),
+    make_pip('ROW', 'COL', is_directional=False),
+    # Disconnected wire, no edges.
+    make_pip('ROW', 'DEAD'),
+    # Repeated pip, edges are deduplicated.
+    make_pip('OUT', 'ROW'),
+]
+
+# Edges created for the pips of each tile.  Each site pin pip creates an edge
+# to and from the site pin wire node.
+EDGES_PER_TILE = 10
+
+
+class FakeTileType(object):
+    def get_pips(self):
+        return PIPS
+
+
+class FakeGridInfo(object):
+    tile_type = TILE_TYPE
+
+
+class FakeGrid(object):
+    def tile_locations(self):
+        for x in range(GRID_WIDTH):
+            for y in range(GRID_HEIGHT):
+                yield grid_types.GridLoc(x, y)
+
+    def gridinfo_at_loc(self, loc):
+        return FakeGridInfo()
+
+    def tilename_at_loc(self, loc):
+        return 'INT_X{}Y{}'.format(loc.grid_x, loc.grid_y)
+
+
+class FakeDatabase(object):
+    def get_tile_type(self, tile_type):
+        assert tile_type == TILE_TYPE
+        return FakeTileType()
+
+    def grid(self):
+        return FakeGrid()
+
+
+def create_connection_database():
+    """ Returns a connection database of a GRID_WIDTH x GRID_HEIGHT grid.
+
+    Every tile has an OPIN and an IPIN site pin, a CHANX track along its row, a
+    CHANY track along its column and a wire without graph nodes.
+
+    """
+    conn = sqlite3.connect(':memory:')
+    create_tables(conn)
+    c = conn.cursor()
+
+    c.execute(
+        "INSERT INTO tile_type(pkey, name) VALUES (1, ?);", (TILE_TYPE, )
+    )
+    c.executemany(
+        "INSERT INTO switch(pkey, name) VALUES (?, ?);", [
+            (ROUTING_SWITCH, 'routing'),
+            (SITE_PIN_SWITCH, 'site_pin'),
+            (BACKWARD_SWITCH, 'backward'),
+        ]
+    )
+
+    wire_in_tile_pkeys = {}
+    for name, site_pin_switch_pkey in WIRES.items():
+        c.execute(
+            """
+INSERT INTO wire_in_tile(
+    name, phy_tile_type_pkey, tile_type_pkey, capacitance, resistance,
+    site_pin_switch_pkey)
+VALUES (?, 1, 1, 1e-15, 10.0, ?);""", (name, site_pin_switch_pkey)
+        )
+        wire_in_tile_pkeys[name] = c.lastrowid
+
+    for pip in set(PIPS):
+        c.execute(
+            """
+INSERT INTO pip_in_tile(
+    name, tile_type_pkey, src_wire_in_tile_pkey, dest_wire_in_tile_pkey,
+    can_invert, is_directional, is_pseudo, is_pass_transistor, switch_pkey,
+    backward_switch_pkey)
+VALUES (?, 1, ?, ?, 0, ?, 0, 0, ?, ?);""", (
+                pip.name, wire_in_tile_pkeys[pip.net_from
+                                             ], wire_in_tile_pkeys[pip.net_to],
+                pip.is_directional, ROUTING_SWITCH,
+                ROUTING_SWITCH if pip.is_directional else BACKWARD_SWITCH
+            )
+        )
+
+    def add_track_node(node_type, x_low, x_high, y_low, y_high):
+        c.execute("INSERT INTO track(alive) VALUES (0);")
+        track_pkey = c.lastrowid
+        c.execute("INSERT INTO node(track_pkey) VALUES (?);", (track_pkey, ))
+        node_pkey = c.lastrowid
+        c.execute(
+            """
+INSERT INTO graph_node(
+    graph_node_type, track_pkey, node_pkey, x_low, x_high, y_low, y_high,
+    capacity)
+VALUES (?, ?, ?, ?, ?, ?, ?, 1);""", (
+                node_type.value, track_pkey, node_pkey, x_low, x_high, y_low,
+                y_high
+            )
+        )
+        return track_pkey, node_pkey
+
+    vcc_track_pkey, _ = add_track_node(NodeType.CHANX, 0, GRID_WIDTH - 1, 0, 0)
+    gnd_track_pkey, _ = add_track_node(NodeType.CHANX, 0, GRID_WIDTH - 1, 0, 0)
+    c.execute(
+        """
+INSERT INTO constant_sources(vcc_track_pkey, gnd_track_pkey)
+VALUES (?, ?);""", (vcc_track_pkey, gnd_track_pkey)
+    )
+
+    row_nodes = [
+        add_track_node(NodeType.CHANX, 0, GRID_WIDTH - 1, y, y)[1]
+        for y in range(GRID_HEIGHT)
+    ]
+    col_nodes = [
+        add_track_node(NodeType.CHANY, x, x, 0, GRID_HEIGHT - 1)[1]
+        for x in range(GRID_WIDTH)
+    ]
+
+    for loc in FakeGrid().tile_locations():
+        x, y = loc
+        c.execute(
+            """
+INSERT INTO phy_tile(name, tile_type_pkey, grid_x, grid_y)
+VALUES (?, 1, ?, ?);""", (FakeGrid().tilename_at_loc(loc), x, y)
+        )
+        phy_tile_pkey = c.lastrowid
+        c.execute(
+            """
+INSERT INTO tile(pkey, phy_tile_pkey, tile_type_pkey, grid_x, grid_y)
+VALUES (?, ?, 1, ?, ?);""", (phy_tile_pkey, phy_tile_pkey, x, y)
+        )
+
+        def add_wire(name, node_pkey):
+            c.execute(
+                """
+INSERT INTO wire(node_pkey, phy_tile_pkey, tile_pkey, wire_in_tile_pkey)
+VALUES (?, ?, ?, ?);""", (
+                    node_pkey, phy_tile_pkey, phy_tile_pkey,
+                    wire_in_tile_pkeys[name]
+                )
+            )
+            return c.lastrowid
+
+        add_wire('ROW', row_nodes[y])
+        add_wire('COL', col_nodes[x])
+
+        c.execute("INSERT INTO node DEFAULT VALUES;")
+        add_wire('DEAD', c.lastrowid)
+
+        for name, node_type in (('OUT', NodeType.OPIN), ('IN', NodeType.IPIN)):
+            c.execute("INSERT INTO node DEFAULT VALUES;")
+            node_pkey = c.lastrowid
+            wire_pkey = add_wire(name, node_pkey)
+            c.execute(
+                "UPDATE node SET site_wire_pkey = ? WHERE pkey = ?;",
+                (wire_pkey, node_pkey)
+            )
+
+            # Pins on the top connect to the row track, pins on the right to
+            # the column track.
+            pin_graph_nodes = []
+            for _ in range(2):
+                c.execute(
+                    """
+INSERT INTO graph_node(
+    graph_node_type, node_pkey, x_low, x_high, y_low, y_high, capacity)
+VALUES (?, ?, ?, ?, ?, ?, 1);""", (node_type.value, node_pkey, x, x, y, y)
+                )
+                pin_graph_nodes.append(c.lastrowid)
+
+            c.execute(
+                """
+UPDATE wire SET top_graph_node_pkey = ?, right_graph_node_pkey = ?
+WHERE pkey = ?;""", pin_graph_nodes + [wire_pkey]
+            )
+
+    conn.commit()
+    return conn
+
+
+def dump_tables(conn):
+    return {
+        table: conn.execute("SELECT * FROM {} ORDER BY rowid;".format(table)
+                            ).fetchall()
+        for table in ('graph_edge', 'graph_node', 'track', 'wire')
+    }
+
+
+class TestCreateAndInsertEdges(unittest.TestCase):
+    def create_edges(self, jobs):
+        conn = create_connection_database()
+        db = FakeDatabase()
+
+        with tempfile.TemporaryDirectory() as scratch_dir, mock.patch.object(
+                prjxray_edge_library, 'load_database',
+                return_value=db) as load_database:
+            prjxray_edge_library.create_and_insert_edges(
+                db=db,
+                grid=db.grid(),
+                conn=conn,
+                use_roi=False,
+                roi=None,
+                input_only_nodes=set(),
+                output_only_nodes=set(),
+                jobs=jobs,
+                db_root='db_root',
+                part='part',
+                scratch_dir=scratch_dir,
+            )
+
+        if jobs == 1:
+            load_database.assert_not_called()
+
+        tables = dump_tables(conn)
+        conn.close()
+        return tables
+
+    def test_serial(self):
+        tables = self.create_edges(jobs=1)
+
+        # The last batch of edges, after the last full batch, is inserted.
+        num_tiles = GRID_WIDTH * GRID_HEIGHT
+        self.assertGreater(num_tiles * EDGES_PER_TILE, 1000)
+        self.assertNotEqual(num_tiles * EDGES_PER_TILE % 1000, 0)
+        self.assertEqual(len(tables['graph_edge']), num_tiles * EDGES_PER_TILE)
+
+        # One site pin wire node per site pin wire.
+        self.assertEqual(
+            len(tables['graph_node']),
+            2 + GRID_WIDTH + GRID_HEIGHT + num_tiles * 2 * 3
+        )
+
+        edges = set(edge[0:3] for edge in tables['graph_edge'])
+        self.assertEqual(len(edges), len(tables['graph_edge']))
+
+        backward = [edge for edge in tables['graph_edge'] if edge[6]]
+        self.assertEqual(len(backward), num_tiles)
+        for edge in backward:
+            self.assertEqual(edge[2], BACKWARD_SWITCH)
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == 'fork',
+        'Workers load the database patched in the parent process'
+    )
+    def test_parallel_matches_serial(self):
+        serial = self.create_edges(jobs=1)
+
+        for jobs in [2, 3]:
+            with self.subTest(jobs=jobs):
+                self.assertEqual(self.create_edges(jobs=jobs), serial)
+
+
+if __name__ == '__main__':
+    unittest.main()